@@ -1,13 +1,37 @@
 import boto3
 import os
 import json
-import email
+import csv
+import codecs
+import base64
+import quopri
 from email import policy
+from email.parser import BytesHeaderParser
 from email.mime.text import MIMEText
+from concurrent.futures import ThreadPoolExecutor
 
 from shared.utils import load_credentials
-from shared.database import get_dynamodb_resource, add_entities_to_table, delete_entities_from_table, list_entities_from_table
-from shared.email_helpers import send_confirmation_email, send_list_email
+from shared import profiling
+from shared.database import (
+    add_or_queue_entities, bulk_add_or_queue_entities, delete_entities_from_table, list_entities_from_table, find_parent_entity_for_sender,
+    claim_processed_email, complete_processed_email, release_processed_email
+)
+from shared.email_helpers import send_confirmation_email, send_list_email, get_s3_client
+
+# Emails processed in parallel when S3 batches several into one event
+EMAIL_RECORD_CONCURRENCY = int(os.environ.get('EMAIL_RECORD_CONCURRENCY', '8'))
+
+# Inbound email limits: emails over EMAIL_MAX_BYTES are rejected unread, and at most
+# EMAIL_MAX_TEXT_BYTES of headers or command text are kept in memory
+EMAIL_MAX_BYTES = int(os.environ.get('EMAIL_MAX_BYTES', str(25 * 1024 * 1024)))
+EMAIL_MAX_TEXT_BYTES = int(os.environ.get('EMAIL_MAX_TEXT_BYTES', str(256 * 1024)))
+EMAIL_READ_CHUNK_BYTES = 64 * 1024
+
+# Attached entity lists (CSV or one name per line) and the most unique names imported from one email
+ENTITY_FILE_TYPES = ('text/csv', 'text/plain', 'application/csv', 'application/vnd.ms-excel')
+EMAIL_MAX_IMPORT_ENTITIES = int(os.environ.get('EMAIL_MAX_IMPORT_ENTITIES', '50000'))
+
+_header_parser = BytesHeaderParser(policy=policy.default)
 
 def get_authorized_sender_info(sender_email: str) -> dict:
     """
@@ -20,25 +44,13 @@ def get_authorized_sender_info(sender_email: str) -> dict:
         dict: Contains authorization status and parent entity if authorized
     """
     try:
-        dynamodb = get_dynamodb_resource()
-        table = dynamodb.Table('EmailList')
-        
-        # Scan table to find which parent entity this email belongs to
-        response = table.scan()
-        items = response['Items']
-        
-        # Handle pagination if needed
-        while 'LastEvaluatedKey' in response:
-            response = table.scan(ExclusiveStartKey=response['LastEvaluatedKey'])
-            items.extend(response['Items'])
-        
-        # Check each parent entity's email list
-        for item in items:
-            if sender_email in item['email_list']:
-                return {
-                    'authorized': True,
-                    'parent_entity': item['parent_entity']
-                }
+        # Served from the in-process EmailList cache on warm invocations
+        parent_entity = find_parent_entity_for_sender(sender_email)
+        if parent_entity:
+            return {
+                'authorized': True,
+                'parent_entity': parent_entity
+            }
         
         return {
             'authorized': False,
@@ -84,111 +96,566 @@ def parse_commands(email_content: str) -> dict:
         print(f"Error parsing email commands: {str(e)}")
         return {'add': [], 'delete': [], 'list': False}
 
-def process_email(event, context):
+def iter_email_lines(stream, max_bytes: int = EMAIL_MAX_BYTES, chunk_size: int = EMAIL_READ_CHUNK_BYTES):
+    """
+    Yield lines (with line endings) from a binary stream, reading it in chunks.
+    
+    Lines longer than chunk_size are yielded in pieces, so memory stays bounded by the
+    chunk size whatever the stream contains.
+    
+    Raises:
+        Exception: If more than max_bytes are read
+    """
+    buffer = b''
+    total = 0
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        total += len(chunk)
+        if total > max_bytes:
+            raise Exception(f"Email exceeds {max_bytes} bytes")
+        
+        lines = (buffer + chunk).splitlines(keepends=True)
+        # Keep a trailing partial line (including a CR whose LF is in the next chunk)
+        buffer = lines.pop() if lines and not lines[-1].endswith(b'\n') else b''
+        yield from lines
+        
+        if len(buffer) > chunk_size:
+            yield buffer
+            buffer = b''
+    if buffer:
+        yield buffer
+
+def _read_headers(lines):
+    """Consume header lines up to the blank separator line and parse them"""
+    header_bytes = []
+    size = 0
+    for line in lines:
+        if line in (b'\r\n', b'\n', b'\r'):
+            break
+        size += len(line)
+        if size > EMAIL_MAX_TEXT_BYTES:
+            raise Exception(f"Email headers exceed {EMAIL_MAX_TEXT_BYTES} bytes")
+        header_bytes.append(line)
+    return _header_parser.parsebytes(b''.join(header_bytes))
+
+def _match_boundary(line: bytes, boundaries: list):
+    """Return (depth, closing) if line is a delimiter for one of the open boundaries, else None"""
+    if not line.startswith(b'--'):
+        return None
+    marker = line.rstrip()[2:]
+    for depth in range(len(boundaries) - 1, -1, -1):
+        if marker == boundaries[depth]:
+            return depth, False
+        if marker == boundaries[depth] + b'--':
+            return depth, True
+    return None
+
+def _decode_text(payload: bytes, headers) -> str:
+    """Undo the transfer encoding and decode the part's charset"""
+    encoding = str(headers.get('content-transfer-encoding', '')).strip().lower()
+    if encoding == 'base64':
+        payload = base64.b64decode(b''.join(payload.split()), validate=False)
+    elif encoding == 'quoted-printable':
+        payload = quopri.decodestring(payload)
+    
+    charset = headers.get_content_charset() or 'utf-8'
     try:
-        # Initialize S3 client
-        s3 = boto3.client('s3', region_name=os.getenv('REGION', 'us-west-1'))
+        return payload.decode(charset, errors='replace')
+    except LookupError:
+        # Unknown charset label
+        return payload.decode('utf-8', errors='replace')
 
-        # Initialize Lambda client
-        lambda_client = boto3.client('lambda', region_name=os.getenv('REGION', 'us-west-1'))
+def _is_command_text(headers) -> bool:
+    """Whether a part holds the command text (plain text and not an attachment)"""
+    return headers.get_content_type() == 'text/plain' and headers.get_content_disposition() != 'attachment'
 
-        # Get S3 info from event
-        bucket = event['Records'][0]['s3']['bucket']['name']
-        key = event['Records'][0]['s3']['object']['key']
-        
-        # Get email from S3
-        email_obj = s3.get_object(Bucket=bucket, Key=key)
-        email_content = email_obj['Body'].read().decode('utf-8')
+def _is_entity_file(headers) -> bool:
+    """Whether a part is an attached CSV or newline-separated entity list"""
+    if headers.get_content_disposition() != 'attachment':
+        return False
+    filename = (headers.get_filename() or '').lower()
+    return headers.get_content_type() in ENTITY_FILE_TYPES or filename.endswith(('.csv', '.txt'))
+
+class _PartReader:
+    """Iterates one MIME part's raw lines, stopping at (and keeping) the next boundary line"""
+
+    def __init__(self, lines, boundaries: list = None):
+        self.lines = lines
+        self.boundaries = boundaries
+        self.boundary_line = None
+        self.done = False
+
+    def __iter__(self):
+        if self.done:
+            return
+        for line in self.lines:
+            if self.boundaries and _match_boundary(line, self.boundaries):
+                self.boundary_line = line
+                break
+            yield line
+        self.done = True
+
+    def drain(self):
+        """Skip what the consumer left unread and return the boundary line that ended the part"""
+        for _ in self:
+            pass
+        return self.boundary_line
+
+def _read_text(reader: _PartReader) -> bytes:
+    """Collect a text part, capped at EMAIL_MAX_TEXT_BYTES"""
+    parts = []
+    size = 0
+    for line in reader:
+        if size + len(line) > EMAIL_MAX_TEXT_BYTES:
+            print(f"⚠️ Email text truncated at {EMAIL_MAX_TEXT_BYTES} bytes")
+            break
+        size += len(line)
+        parts.append(line)
+    return b''.join(parts)
+
+def iter_decoded_lines(raw_lines, headers):
+    """
+    Incrementally undo a part's transfer encoding and charset, yielding text lines.
+    
+    Args:
+        raw_lines: Iterable of the part's raw payload lines
+        headers: The part's headers
+    """
+    encoding = str(headers.get('content-transfer-encoding', '')).strip().lower()
+    charset = headers.get_content_charset() or 'utf-8'
+    try:
+        decoder = codecs.getincrementaldecoder(charset)(errors='replace')
+    except LookupError:
+        # Unknown charset label
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    
+    remainder = b''
+    text = ''
+    for line in raw_lines:
+        if encoding == 'base64':
+            # Decode whole 4-character groups; carry the rest into the next line
+            data = remainder + b''.join(line.split())
+            cut = len(data) - len(data) % 4
+            chunk, remainder = base64.b64decode(data[:cut]), data[cut:]
+        elif encoding == 'quoted-printable':
+            chunk = quopri.decodestring(line)
+        else:
+            chunk = line
         
-        # Parse email
-        msg = email.message_from_string(email_content, policy=policy.default)
+        text += decoder.decode(chunk)
+        lines = text.splitlines(keepends=True)
+        text = lines.pop() if lines and not lines[-1].endswith(('\n', '\r')) else ''
+        if len(text) > EMAIL_MAX_TEXT_BYTES:
+            # Newline-free payload: hand it over in bounded pieces
+            lines.append(text)
+            text = ''
+        yield from lines
+    
+    text += decoder.decode(b'', final=True)
+    if text:
+        yield text
+
+def normalize_entity_name(name: str) -> str:
+    """Normalize an entity name the way ADD commands are: trimmed, single-spaced, upper-case"""
+    return ' '.join(name.replace('\ufeff', '').split()).upper()
+
+def read_entity_file(text_lines, entities: dict = None, max_entities: int = None) -> dict:
+    """
+    Read entity names from a CSV or newline-separated file.
+    
+    The first column of each row is the entity name; a leading header row
+    (entity, entity_name or name) is skipped. Names are normalized and deduped.
+    
+    Args:
+        text_lines: Iterable of decoded text lines
+        entities (dict, optional): Names collected so far, extended in place
+        max_entities (int, optional): Stop collecting after this many unique names.
+            Defaults to EMAIL_MAX_IMPORT_ENTITIES.
         
-        # Get sender
-        sender = msg.get('from')
-        if not sender:
-            print("No sender found in email")
-            return {
-                'statusCode': 400,
-                'body': json.dumps({'error': 'No sender found in email'})
-            }
+    Returns:
+        dict: {"entities": {name: None, ...} in file order, "rows": count, "duplicates": count,
+        "skipped": count over max_entities}
+    """
+    if entities is None:
+        entities = {}
+    if max_entities is None:
+        max_entities = EMAIL_MAX_IMPORT_ENTITIES
+    
+    rows = duplicates = skipped = 0
+    for row in csv.reader(text_lines):
+        if not row:
+            continue
+        name = normalize_entity_name(row[0])
+        if not name:
+            continue
+        if rows == 0 and name.lower() in ('entity', 'entity_name', 'name'):
+            continue
         
-        # Extract email address from sender field
-        if '<' in sender and '>' in sender:
-            sender_email = sender.split('<')[1].split('>')[0]
+        rows += 1
+        if name in entities:
+            duplicates += 1
+        elif len(entities) >= max_entities:
+            skipped += 1
         else:
-            sender_email = sender.strip()
+            entities[name] = None
+    
+    return {
+        'entities': entities,
+        'rows': rows,
+        'duplicates': duplicates,
+        'skipped': skipped
+    }
+
+def read_email_headers(stream, max_bytes: int = EMAIL_MAX_BYTES) -> tuple:
+    """
+    Read only the top-level headers of an inbound email.
+    
+    Lets the sender be checked before any of the body is read.
+    
+    Args:
+        stream: Binary file-like object (e.g. the S3 StreamingBody)
+        max_bytes (int, optional): Maximum number of bytes read from the stream
         
-        print(f"Processing email from: {sender_email}")
+    Returns:
+        tuple: (headers, lines) where lines yields the rest of the email; pass both to read_command_body
         
-        # Check if sender is authorized
-        auth_info = get_authorized_sender_info(sender_email)
-        if not auth_info['authorized']:
-            print(f"Unauthorized sender: {sender_email}")
+    Raises:
+        Exception: If the headers are oversized
+    """
+    lines = iter_email_lines(stream, max_bytes)
+    return _read_headers(lines), lines
+
+def read_command_body(headers, lines, on_entity_file=None) -> str:
+    """
+    Stream-parse the body of an email whose headers read_email_headers returned.
+    
+    Reading stops as soon as the first text/plain part has been read, unless on_entity_file
+    is given, in which case the rest of the email is scanned for attached entity lists.
+    Other parts (HTML alternatives, attachments, nested messages) are scanned line by line
+    for MIME boundaries without being buffered, so memory does not grow with the email's size.
+    
+    Args:
+        headers: Top-level headers from read_email_headers
+        lines: Line iterator from read_email_headers
+        on_entity_file (callable, optional): Called as on_entity_file(filename, text_lines)
+            for each attached CSV or newline file; text_lines are decoded lazily
+        
+    Returns:
+        str: The decoded command text ('' if there is none)
+        
+    Raises:
+        Exception: If the email is larger than the max_bytes given to read_email_headers
+    """
+    if headers.get_content_maintype() != 'multipart':
+        if headers.get_content_maintype() != 'text':
+            return ''
+        return _decode_text(_read_text(_PartReader(lines)), headers)
+    
+    boundary = headers.get_param('boundary')
+    if not boundary:
+        return ''
+    boundaries = [str(boundary).encode('utf-8')]
+    
+    body = None
+    pending = None
+    while boundaries:
+        line = pending if pending is not None else next(lines, None)
+        pending = None
+        if line is None:
+            break
+        
+        match = _match_boundary(line, boundaries)
+        if not match:
+            # Preamble, or the payload of a part we are skipping
+            continue
+        
+        depth, closing = match
+        del boundaries[depth + (0 if closing else 1):]
+        if closing:
+            continue
+        
+        part_headers = _read_headers(lines)
+        if part_headers.get_content_maintype() == 'multipart' and part_headers.get_param('boundary'):
+            boundaries.append(str(part_headers.get_param('boundary')).encode('utf-8'))
+        elif body is None and _is_command_text(part_headers):
+            reader = _PartReader(lines, boundaries)
+            body = _decode_text(_read_text(reader), part_headers).strip()
+            if on_entity_file is None:
+                break
+            pending = reader.drain()
+        elif on_entity_file is not None and _is_entity_file(part_headers):
+            reader = _PartReader(lines, boundaries)
+            on_entity_file(part_headers.get_filename(), iter_decoded_lines(reader, part_headers))
+            pending = reader.drain()
+    
+    return body or ''
+
+def parse_command_email(stream, max_bytes: int = EMAIL_MAX_BYTES, on_entity_file=None) -> tuple:
+    """
+    Stream-parse an inbound email for its headers and command text.
+    
+    read_email_headers followed by read_command_body; see those for the details.
+    
+    Returns:
+        tuple: (headers, body) where headers is an email.message.EmailMessage holding the
+        top-level headers and body is the decoded command text ('' if there is none)
+        
+    Raises:
+        Exception: If the email is larger than max_bytes or its headers are oversized
+    """
+    headers, lines = read_email_headers(stream, max_bytes)
+    return headers, read_command_body(headers, lines, on_entity_file)
+
+def execute_commands(parent_entity: str, sender_email: str, msg, body: str, imported: dict) -> dict:
+    """
+    Run an authorized email's commands and attached imports, and send the replies.
+    
+    ADD commands and imports never reset entities that are already tracked, so their
+    existing analysis is kept.
+    
+    Args:
+        parent_entity (str): Parent entity the sender belongs to
+        sender_email (str): Address replies are sent to
+        msg: Headers of the inbound email (for reply threading)
+        body (str): Command text
+        imported (dict): Entity names and counts collected from attached files
+        
+    Returns:
+        dict: Response with the results of each command
+    """
+    # Parse commands
+    commands = parse_commands(body)
+    print(f"Parsed commands: {commands}")
+    
+    # Process commands
+    add_results = None
+    delete_results = None
+    list_entities_result = None
+    import_summary = None
+    
+    # Handle attached entity lists with batched writes
+    if imported['files']:
+        print(f"Importing {len(imported['entities'])} entities from {', '.join(map(str, imported['files']))}")
+        import_results = bulk_add_or_queue_entities(parent_entity, imported['entities'], only_if_absent=True)
+        import_summary = {
+            'files': imported['files'],
+            'rows': imported['rows'],
+            'duplicates': imported['duplicates'],
+            'skipped': imported['skipped'],
+            'added_count': import_results['added_count'],
+            'existing_count': import_results['existing_count'],
+            'queued_count': import_results['queued_count'],
+            'failed_count': len(import_results['failed_entities']),
+            'failed_entities': import_results['failed_entities'][:20]
+        }
+    
+    # Handle ADD commands
+    if commands['add']:
+        print(f"Adding entities: {commands['add']}")
+        add_results = add_or_queue_entities(parent_entity, commands['add'], only_if_absent=True)
+    
+    # Handle DELETE commands
+    if commands['delete']:
+        print(f"Deleting entities: {commands['delete']}")
+        delete_results = delete_entities_from_table(parent_entity, commands['delete'])
+    
+    # Handle LIST command
+    if commands['list']:
+        print("Listing entities")
+        entities_data = list_entities_from_table(parent_entity)
+        list_entities_result = [entity['entity_name'] for entity in entities_data]
+    
+    # Send confirmation email
+    if add_results or delete_results or import_summary:
+        send_confirmation_email(sender_email, msg, add_results, delete_results, import_summary)
+    
+    # Send list email if requested
+    if list_entities_result is not None:
+        send_list_email(sender_email, msg, list_entities_result)
+    
+    return {
+        'statusCode': 200,
+        'body': json.dumps({
+            'message': 'Email processed successfully',
+            'add_results': add_results,
+            'delete_results': delete_results,
+            'list_entities': list_entities_result,
+            'import_summary': import_summary
+        })
+    }
+
+def process_record(s3, record: dict) -> dict:
+    """
+    Process one inbound email from an S3 event record.
+    
+    Args:
+        s3: Shared S3 client
+        record (dict): One entry of the S3 event's Records list
+        
+    Returns:
+        dict: Response for this email (statusCode and JSON body)
+    """
+    try:
+        # Get S3 info from record
+        bucket = record['s3']['bucket']['name']
+        key = record['s3']['object']['key']
+        
+        # Get email from S3
+        email_obj = s3.get_object(Bucket=bucket, Key=key)
+        if email_obj.get('ContentLength', 0) > EMAIL_MAX_BYTES:
+            email_obj['Body'].close()
+            print(f"Email too large: {email_obj['ContentLength']} bytes")
             return {
-                'statusCode': 403,
-                'body': json.dumps({'error': 'Unauthorized sender'})
+                'statusCode': 413,
+                'body': json.dumps({'error': f"Email exceeds {EMAIL_MAX_BYTES} bytes"})
             }
         
-        parent_entity = auth_info['parent_entity']
-        print(f"Authorized sender for parent entity: {parent_entity}")
-        
-        # Get email body
-        body = ""
-        if msg.is_multipart():
-            for part in msg.walk():
-                if part.get_content_type() == "text/plain":
-                    body = part.get_content()
-                    break
-        else:
-            body = msg.get_content()
+        try:
+            # Headers first, so unauthorized email is rejected before any of its body is read
+            msg, lines = read_email_headers(email_obj['Body'])
+            
+            # Get sender
+            sender = msg.get('from')
+            if not sender:
+                print("No sender found in email")
+                return {
+                    'statusCode': 400,
+                    'body': json.dumps({'error': 'No sender found in email'})
+                }
+            
+            # Extract email address from sender field
+            if '<' in sender and '>' in sender:
+                sender_email = sender.split('<')[1].split('>')[0]
+            else:
+                sender_email = sender.strip()
+            
+            print(f"Processing email from: {sender_email}")
+            
+            # Check if sender is authorized
+            auth_info = get_authorized_sender_info(sender_email)
+            if not auth_info['authorized']:
+                print(f"Unauthorized sender: {sender_email}")
+                return {
+                    'statusCode': 403,
+                    'body': json.dumps({'error': 'Unauthorized sender'})
+                }
+            
+            parent_entity = auth_info['parent_entity']
+            print(f"Authorized sender for parent entity: {parent_entity}")
+            
+            # Redelivered notifications for an already processed email are no-ops; claimed
+            # before the body is read, so a redelivery never downloads or imports it again
+            message_id = str(msg.get('message-id') or '').strip() or f"s3://{bucket}/{key}"
+            if not claim_processed_email(message_id, {'parent_entity': parent_entity, 's3_object': f"s3://{bucket}/{key}"}):
+                print(f"Duplicate email ignored: {message_id}")
+                return {
+                    'statusCode': 200,
+                    'body': json.dumps({'message': 'Duplicate email ignored', 'duplicate': True})
+                }
+            
+            # Stream-parse the command text and any attached entity lists
+            imported = {'entities': {}, 'files': [], 'rows': 0, 'duplicates': 0, 'skipped': 0}
+            
+            def on_entity_file(filename, text_lines):
+                result = read_entity_file(text_lines, imported['entities'])
+                imported['files'].append(filename)
+                for count in ('rows', 'duplicates', 'skipped'):
+                    imported[count] += result[count]
+            
+            try:
+                body = read_command_body(msg, lines, on_entity_file=on_entity_file)
+            except Exception:
+                # Let a redelivery try again
+                release_processed_email(message_id)
+                raise
+        finally:
+            email_obj['Body'].close()
         
-        if not body:
+        if not body and not imported['files']:
             print("No text content found in email")
+            complete_processed_email(message_id, 400)
             return {
                 'statusCode': 400,
                 'body': json.dumps({'error': 'No text content found in email'})
             }
         
-        # Parse commands
-        commands = parse_commands(body)
-        print(f"Parsed commands: {commands}")
+        try:
+            response = execute_commands(parent_entity, sender_email, msg, body, imported)
+        except Exception:
+            # Let a redelivery try again
+            release_processed_email(message_id)
+            raise
+        
+        complete_processed_email(message_id, response['statusCode'])
+        return response
+        
+    except Exception as e:
+        error_message = f"Error processing email: {str(e)}"
+        print(f"❌ {error_message}")
+        
+        return {
+            'statusCode': 500,
+            'body': json.dumps({'error': error_message})
+        }
+
+@profiling.profiled
+def process_email(event, context):
+    """
+    Process every inbound email in an S3 event.
+    
+    S3 can batch several objects into one notification, so all records are processed
+    concurrently with a shared S3 client and the shared sender authorization cache.
+    A failing record does not affect the others.
+    
+    Args:
+        event (dict): S3 event notification
+        context: Lambda context
+        
+    Returns:
+        dict: The email's response for a single record; otherwise 200 if every email was
+        processed, 207 if some were and 500 if none were, with a per-record result list
+    """
+    try:
+        records = event['Records']
         
-        # Process commands
-        add_results = None
-        delete_results = None
-        list_entities_result = None
+        # Initialize S3 client, shared by all records
+        s3 = get_s3_client()
         
-        # Handle ADD commands
-        if commands['add']:
-            print(f"Adding entities: {commands['add']}")
-            add_results = add_entities_to_table(parent_entity, commands['add'])
+        if len(records) == 1:
+            return process_record(s3, records[0])
         
-        # Handle DELETE commands
-        if commands['delete']:
-            print(f"Deleting entities: {commands['delete']}")
-            delete_results = delete_entities_from_table(parent_entity, commands['delete'])
+        max_workers = max(1, min(EMAIL_RECORD_CONCURRENCY, len(records)))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            responses = list(executor.map(lambda record: process_record(s3, record), records))
         
-        # Handle LIST command
-        if commands['list']:
-            print("Listing entities")
-            entities_data = list_entities_from_table(parent_entity)
-            list_entities_result = [entity['entity_name'] for entity in entities_data]
+        results = []
+        for record, response in zip(records, responses):
+            results.append({
+                'bucket': record.get('s3', {}).get('bucket', {}).get('name'),
+                'key': record.get('s3', {}).get('object', {}).get('key'),
+                'statusCode': response['statusCode'],
+                'body': json.loads(response['body'])
+            })
         
-        # Send confirmation email
-        if add_results or delete_results:
-            send_confirmation_email(sender_email, msg, add_results, delete_results)
+        processed = sum(1 for result in results if result['statusCode'] == 200)
+        print(f"📬 Processed {processed} of {len(results)} emails")
         
-        # Send list email if requested
-        if list_entities_result is not None:
-            send_list_email(sender_email, msg, list_entities_result)
+        if processed == len(results):
+            status_code = 200
+        elif processed > 0:
+            status_code = 207
+        else:
+            status_code = 500
         
         return {
-            'statusCode': 200,
+            'statusCode': status_code,
             'body': json.dumps({
-                'message': 'Email processed successfully',
-                'add_results': add_results,
-                'delete_results': delete_results,
-                'list_entities': list_entities_result
+                'message': f"Processed {processed} of {len(results)} emails",
+                'processed': processed,
+                'failed': len(results) - processed,
+                'results': results
             })
         }
         
@@ -199,4 +666,4 @@ def process_email(event, context):
         return {
             'statusCode': 500,
             'body': json.dumps({'error': error_message})
-        } 
\ No newline at end of file
+        }
\ No newline at end of file
@@ -1,23 +1,44 @@
 import boto3
 import os
 import json
+from decimal import Decimal
 
 from shared.utils import load_credentials
+from shared import profiling
 from shared.database import (
     create_tracked_entities_table,
-    add_entities_to_table,
+    add_or_queue_entities,
+    ensure_table_ready,
+    get_pending_entities,
     delete_entities_from_table,
     list_entities_from_table,
     setup_email_list_table,
     get_email_list as shared_get_email_list,
-    update_entity_analysis
+    update_entity_analysis,
+    bulk_update_entity_analysis,
+    adjust_run_totals,
+    get_article_history,
+    get_run_status,
+    reconcile_run_status,
+    summarize_run,
+    finalize_run_summary,
+    get_run_summaries
 )
+from shared.email_helpers import get_s3_client
+from shared.table_transfer import export_table, import_table
+
+# Failed and invalid updates listed in a bulk_update response; the rest are only counted,
+# so the response stays well under Lambda's 6 MB limit
+BULK_UPDATE_MAX_ERRORS = int(os.environ.get('BULK_UPDATE_MAX_ERRORS', '100'))
 
 def setup(parent_entity: str):
     """
     Create empty DynamoDB table for tracking entities and their analysis status.
     Fails if table already exists.
     
+    Returns as soon as the table is being created; use setup_status to check when it is
+    ready. Entities added in the meantime are queued and written once it is active.
+    
     Table name format: ParentEntity_TrackedEntities (e.g., Stanford_TrackedEntities)
     
     Schema:
@@ -26,14 +47,15 @@ def setup(parent_entity: str):
         - completed (Boolean) - Processing status flag
     """
     try:
-        # Create table
-        response = create_tracked_entities_table(parent_entity)
+        # Create table without waiting for it to become active
+        response = create_tracked_entities_table(parent_entity, wait=False)
         
-        print(f"✅ Table {parent_entity}_TrackedEntities created successfully!")
+        print(f"⏳ Table {parent_entity}_TrackedEntities is being created")
         
         return {
-            "message": f"Table {parent_entity}_TrackedEntities created successfully",
+            "message": f"Table {parent_entity}_TrackedEntities is being created",
             "table_name": f"{parent_entity}_TrackedEntities",
+            "status": response['TableDescription']['TableStatus'],
             "schema": {
                 "entity_name": "String (Partition Key)",
                 "analysis": "Map (JSON)",
@@ -63,8 +85,11 @@ def add_entities(parent_entity: str, entities: list, analysis: dict = None, comp
         Exception: If table doesn't exist or other errors occur
     """
     try:
-        # Add entities to table
-        result = add_entities_to_table(parent_entity, entities, analysis, completed)
+        # Add entities to table, or queue them while it is being created
+        result = add_or_queue_entities(parent_entity, entities, analysis, completed)
+        
+        # Keep checkCompleted right without recounting the table (queued entities are not in it yet)
+        adjust_run_totals(parent_entity, result['created_count'], result['completed_change'])
         
         # Prepare response
         response = {
@@ -73,6 +98,11 @@ def add_entities(parent_entity: str, entities: list, analysis: dict = None, comp
             "added_entities": result['added_entities']
         }
         
+        # Include queued entities if the table is not active yet
+        if result['queued_entities']:
+            response["message"] = f"Queued {len(result['queued_entities'])} entities until {parent_entity}_TrackedEntities is active"
+            response["queued_entities"] = result['queued_entities']
+        
         # Include failures in response if any occurred
         if result['failed_entities']:
             response["failed_entities"] = result['failed_entities']
@@ -83,6 +113,44 @@ def add_entities(parent_entity: str, entities: list, analysis: dict = None, comp
         print(f"Error: {str(e)}")
         raise
 
+def setup_status(parent_entity: str):
+    """
+    Check whether a parent entity's tracking table is ready.
+    
+    When the table is active, entities queued while it was being created are added.
+    
+    Args:
+        parent_entity (str): Name of the parent entity (e.g., "Stanford")
+        
+    Returns:
+        dict: Table status, readiness and queued/flushed entity counts
+        
+    Raises:
+        Exception: If the status check fails
+    """
+    try:
+        status = ensure_table_ready(parent_entity)
+        pending = get_pending_entities(parent_entity)
+        
+        if status is None:
+            message = f"Table {parent_entity}_TrackedEntities does not exist"
+        elif status == 'ACTIVE':
+            message = f"Table {parent_entity}_TrackedEntities is ready"
+        else:
+            message = f"Table {parent_entity}_TrackedEntities is {status.lower()}"
+        
+        return {
+            "message": message,
+            "table_name": f"{parent_entity}_TrackedEntities",
+            "status": status or 'NOT_FOUND',
+            "ready": status == 'ACTIVE',
+            "pending_entities": len(pending)
+        }
+        
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        raise
+
 def delete_entities(parent_entity: str, entities: list):
     """
     Delete specified entities from the tracking table.
@@ -101,6 +169,9 @@ def delete_entities(parent_entity: str, entities: list):
         # Delete entities from table
         result = delete_entities_from_table(parent_entity, entities)
         
+        # Keep checkCompleted right without recounting the table
+        adjust_run_totals(parent_entity, -len(result['deleted_entities']), -result['completed_count'])
+        
         # Prepare response
         response = {
             "message": f"Deleted {len(result['deleted_entities'])} entities from {parent_entity}_TrackedEntities",
@@ -181,6 +252,9 @@ def clear_attributes(parent_entity: str):
             except Exception as e:
                 print(f"Failed to clear entity {entity['entity_name']}: {str(e)}")
         
+        # Completion counters no longer match the table
+        reconcile_run_status(parent_entity)
+        
         return {
             "message": f"Cleared analysis for {cleared_count} entities in {parent_entity}_TrackedEntities",
             "table_name": f"{parent_entity}_TrackedEntities",
@@ -192,12 +266,17 @@ def clear_attributes(parent_entity: str):
         print(f"Error: {str(e)}")
         raise
 
-def check_completed(parent_entity: str):
+def check_completed(parent_entity: str, reconcile: bool = False):
     """
     Check completion status of all entities in the table.
     
+    Reads the run's completion counters with one GetItem instead of scanning the table.
+    The table is scanned only when no run has been recorded yet, or when reconcile is set,
+    in which case the counters are corrected from the scan.
+    
     Args:
         parent_entity (str): Name of the parent entity (e.g., "Stanford")
+        reconcile (bool, optional): Recount the table and fix the counters first
         
     Returns:
         dict: Completion status information
@@ -206,10 +285,20 @@ def check_completed(parent_entity: str):
         Exception: If table doesn't exist or other errors occur
     """
     try:
-        # Get all entities
-        entities = list_entities_from_table(parent_entity)
+        reconciled = None
+        if reconcile:
+            reconciled = reconcile_run_status(parent_entity)
         
-        if not entities:
+        status = get_run_status(parent_entity)
+        if status is None:
+            # No run recorded yet: count once and keep the counters from here on
+            reconciled = reconcile_run_status(parent_entity)
+            status = get_run_status(parent_entity)
+        
+        completed_count = status['completed_entities']
+        total_count = status['total_entities']
+        
+        if not total_count:
             return {
                 "message": f"No entities found in {parent_entity}_TrackedEntities",
                 "table_name": f"{parent_entity}_TrackedEntities",
@@ -218,18 +307,21 @@ def check_completed(parent_entity: str):
                 "total_entities": 0
             }
         
-        # Count completed entities
-        completed_count = sum(1 for entity in entities if entity.get('completed', False))
-        total_count = len(entities)
-        
-        return {
+        response = {
             "message": f"Completion status for {parent_entity}_TrackedEntities",
             "table_name": f"{parent_entity}_TrackedEntities",
-            "all_completed": completed_count == total_count,
+            "all_completed": completed_count >= total_count,
             "completed_entities": completed_count,
             "total_entities": total_count,
-            "completion_percentage": (completed_count / total_count * 100) if total_count > 0 else 0
+            "completion_percentage": min(completed_count / total_count * 100, 100),
+            "run_id": status['run_id'],
+            "dispatched": status['dispatched'],
+            "failed_entities": status['failed'],
+            "updated_at": status.get('updated_at')
         }
+        if reconciled is not None:
+            response["reconciled"] = reconciled
+        return response
         
     except Exception as e:
         print(f"Error: {str(e)}")
@@ -296,6 +388,222 @@ def get_email_list(parent_entity: str, default_email: str = None) -> list:
         print(f"Error: {str(e)}")
         raise
 
+def entity_history(parent_entity: str, entity_name: str, days: int = 7):
+    """
+    Get per-run article history for an entity over the last N days.
+    
+    Args:
+        parent_entity (str): Name of the parent entity (e.g., "Stanford")
+        entity_name (str): Entity to get history for
+        days (int, optional): Number of days to look back. Defaults to 7.
+        
+    Returns:
+        dict: History runs, newest first
+        
+    Raises:
+        Exception: If the history table doesn't exist or other errors occur
+    """
+    try:
+        runs = get_article_history(parent_entity, entity_name, days)
+        
+        return {
+            "message": f"Found {len(runs)} runs for {entity_name} in the last {days} days",
+            "parent_entity": parent_entity,
+            "entity_name": entity_name,
+            "runs": [
+                {
+                    "run_ts": run['run_ts'],
+                    "article_count": int(run.get('article_count', 0)),
+                    "important_count": int(run.get('important_count', 0)),
+                    "articles": [
+                        {
+                            "url_hash": article['url_hash'],
+                            "sentiment": article['sentiment'],
+                            "important": article['important'],
+                            "cluster_id": article['cluster_id']
+                        }
+                        for article in run.get('articles', [])
+                    ]
+                }
+                for run in runs
+            ]
+        }
+        
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        raise
+
+def run_summary(parent_entity: str, finalize: bool = False, limit: int = 7):
+    """
+    Get the summary of the current run and of the last finalized runs.
+    
+    Args:
+        parent_entity (str): Name of the parent entity (e.g., "Stanford")
+        finalize (bool, optional): Store the current run's summary first. Defaults to False.
+        limit (int, optional): Number of finalized runs to return. Defaults to 7.
+        
+    Returns:
+        dict: The current run's summary (None if no run has started) and the
+        finalized summaries, newest first
+        
+    Raises:
+        Exception: If the run tables don't exist or other errors occur
+    """
+    try:
+        if finalize:
+            current = finalize_run_summary(parent_entity)
+        else:
+            run = get_run_status(parent_entity)
+            current = summarize_run(run) if run else None
+        history = get_run_summaries(parent_entity, limit)
+        
+        return {
+            "message": f"Found {len(history)} finalized runs for {parent_entity}",
+            "parent_entity": parent_entity,
+            "current": current,
+            "history": history
+        }
+        
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        raise
+
+def iter_ndjson_updates(s3_uri: str):
+    """
+    Stream entity updates from an NDJSON file on S3, one JSON object per line.
+    
+    Floats are parsed as Decimal so they can be stored in DynamoDB. Lines that are not
+    valid JSON are yielded as {"error": ...} so they are reported, not fatal.
+    
+    Args:
+        s3_uri (str): Location of the file (s3://bucket/key)
+    """
+    if not s3_uri.startswith('s3://') or '/' not in s3_uri[5:]:
+        raise Exception(f"Invalid S3 URI: {s3_uri}")
+    bucket, key = s3_uri[5:].split('/', 1)
+    
+    body = get_s3_client().get_object(Bucket=bucket, Key=key)['Body']
+    try:
+        for line_number, line in enumerate(body.iter_lines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line, parse_float=Decimal)
+            except ValueError as e:
+                yield {'error': f"Line {line_number}: {str(e)}"}
+    finally:
+        body.close()
+
+def bulk_update(parent_entity: str, updates: list = None, updates_s3: str = None):
+    """
+    Update many entities' analyses in one invocation.
+    
+    Args:
+        parent_entity (str): Name of the parent entity (e.g., "Stanford")
+        updates (list, optional): Updates as {"entity_name", "analysis", "completed"} dicts
+        updates_s3 (str, optional): s3://bucket/key of an NDJSON file of updates, for
+            payloads larger than the invoke limit
+        
+    Returns:
+        dict: Counts, and the first BULK_UPDATE_MAX_ERRORS failed or invalid updates
+        
+    Raises:
+        Exception: If the table doesn't exist, the file can't be read or other errors occur
+    """
+    try:
+        source = iter_ndjson_updates(updates_s3) if updates_s3 else (updates or [])
+        result = bulk_update_entity_analysis(parent_entity, source)
+        
+        # Keep checkCompleted right for entities created or (un)completed by the update
+        adjust_run_totals(parent_entity, result['created_count'], result['completed_change'])
+        
+        errors = result['errors']
+        return {
+            "message": f"Updated {result['updated_count']} entities in {parent_entity}_TrackedEntities",
+            "table_name": f"{parent_entity}_TrackedEntities",
+            "updated_count": result['updated_count'],
+            "failed_count": result['failed_count'] + result['invalid_count'],
+            "invalid_count": result['invalid_count'],
+            "errors": errors[:BULK_UPDATE_MAX_ERRORS],
+            "errors_truncated": len(errors) > BULK_UPDATE_MAX_ERRORS
+        }
+        
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        raise
+
+def export_entities(parent_entity: str, bucket: str = None, prefix: str = None, context=None):
+    """
+    Export a parent entity's tracking table to S3 (see shared.table_transfer.export_table).
+    
+    Args:
+        parent_entity (str): Name of the parent entity (e.g., "Stanford")
+        bucket (str, optional): Destination bucket, defaults to EXPORT_BUCKET
+        prefix (str, optional): Destination prefix; pass a previous export's prefix to resume it
+        context (optional): Lambda context, used to stop before the timeout
+        
+    Returns:
+        dict: Export location, item and part counts, and whether it is complete
+        
+    Raises:
+        Exception: If the table doesn't exist, S3 is not reachable or other errors occur
+    """
+    try:
+        manifest = export_table(parent_entity, bucket, prefix, context=context)
+        
+        return {
+            "message": f"{'Exported' if manifest['complete'] else 'Partially exported'} {manifest['item_count']} items from {manifest['table_name']}",
+            "table_name": manifest['table_name'],
+            "bucket": manifest['bucket'],
+            "prefix": manifest['prefix'],
+            "item_count": manifest['item_count'],
+            "part_count": sum(len(state['parts']) for state in manifest['segments']),
+            "complete": manifest['complete']
+        }
+        
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        raise
+
+def import_entities(parent_entity: str, bucket: str, prefix: str, context=None):
+    """
+    Load an S3 export into a parent entity's tracking table (see shared.table_transfer.import_table).
+    
+    Args:
+        parent_entity (str): Name of the parent entity to load into
+        bucket (str): Bucket holding the export, defaults to EXPORT_BUCKET
+        prefix (str): Prefix of the export; calling again with the same prefix resumes
+        context (optional): Lambda context, used to stop before the timeout
+        
+    Returns:
+        dict: Item, part and failure counts, and whether it is complete
+        
+    Raises:
+        Exception: If the export is incomplete, the table is not active or other errors occur
+    """
+    try:
+        checkpoint = import_table(parent_entity, bucket, prefix, context=context)
+        
+        # Imported items replace whatever was there, so recount once the whole export is in
+        if checkpoint['complete']:
+            reconcile_run_status(parent_entity)
+        
+        return {
+            "message": f"{'Imported' if checkpoint['complete'] else 'Partially imported'} {checkpoint['item_count']} items into {parent_entity}_TrackedEntities",
+            "table_name": f"{parent_entity}_TrackedEntities",
+            "prefix": prefix,
+            "item_count": checkpoint['item_count'],
+            "parts_done": len(checkpoint['parts_done']),
+            "failed_count": checkpoint['failed_count'],
+            "failed_entities": checkpoint['failed_entities'],
+            "complete": checkpoint['complete']
+        }
+        
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        raise
+
+@profiling.profiled
 def lambda_handler(event, context):
     """Lambda handler for table operations"""
     try:
@@ -312,6 +620,12 @@ def lambda_handler(event, context):
                 raise Exception("'parent_entity' is required for setup action")
             result = setup(parent_entity)
             
+        elif action == 'setup_status':
+            parent_entity = event.get('parent_entity')
+            if not parent_entity:
+                raise Exception("'parent_entity' is required for setup_status action")
+            result = setup_status(parent_entity)
+            
         elif action == 'add':
             parent_entity = event.get('parent_entity')
             entities = event.get('entities', [])
@@ -343,7 +657,7 @@ def lambda_handler(event, context):
             parent_entity = event.get('parent_entity')
             if not parent_entity:
                 raise Exception("'parent_entity' is required for checkCompleted action")
-            result = check_completed(parent_entity)
+            result = check_completed(parent_entity, event.get('reconcile', False))
             
         elif action == 'setup_email_list':
             parent_entity = event.get('parent_entity')
@@ -366,7 +680,10 @@ def lambda_handler(event, context):
             completed = event.get('completed', False)
             if not parent_entity or not entity_name:
                 raise Exception("'parent_entity' and 'entity_name' are required for update action")
-            update_entity_analysis(parent_entity, entity_name, analysis, completed)
+            previous = update_entity_analysis(parent_entity, entity_name, analysis, completed, return_previous=True)
+            # Keep checkCompleted right: the update creates entities that are not tracked yet
+            adjust_run_totals(parent_entity, int(previous is None),
+                              int(bool(completed)) - int(bool((previous or {}).get('completed', False))))
             result = {
                 'message': f"Entity {entity_name} updated successfully in {parent_entity}_TrackedEntities",
                 'entity_name': entity_name,
@@ -375,12 +692,48 @@ def lambda_handler(event, context):
                 'completed': completed
             }
             
+        elif action == 'bulk_update':
+            parent_entity = event.get('parent_entity')
+            updates = event.get('updates')
+            updates_s3 = event.get('updates_s3')
+            if not parent_entity or not (updates or updates_s3):
+                raise Exception("'parent_entity' and 'updates' or 'updates_s3' are required for bulk_update action")
+            result = bulk_update(parent_entity, updates, updates_s3)
+            
+        elif action == 'export':
+            parent_entity = event.get('parent_entity')
+            if not parent_entity:
+                raise Exception("'parent_entity' is required for export action")
+            result = export_entities(parent_entity, event.get('bucket'), event.get('prefix'), context)
+            
+        elif action == 'import':
+            parent_entity = event.get('parent_entity')
+            prefix = event.get('prefix')
+            if not parent_entity or not prefix:
+                raise Exception("'parent_entity' and 'prefix' are required for import action")
+            result = import_entities(parent_entity, event.get('bucket'), prefix, context)
+            
+        elif action == 'history':
+            parent_entity = event.get('parent_entity')
+            entity_name = event.get('entity_name')
+            days = int(event.get('days', 7))
+            if not parent_entity or not entity_name:
+                raise Exception("'parent_entity' and 'entity_name' are required for history action")
+            result = entity_history(parent_entity, entity_name, days)
+            
+        elif action == 'run_summary':
+            parent_entity = event.get('parent_entity')
+            if not parent_entity:
+                raise Exception("'parent_entity' is required for run_summary action")
+            result = run_summary(parent_entity, bool(event.get('finalize', False)), int(event.get('limit', 7)))
+            
         else:
             raise Exception(f"Unknown action: {action}")
         
         return {
             'statusCode': 200,
-            'body': json.dumps(result)
+            # default=str: the CreateTable response in setup carries datetimes
+            'body': json.dumps(result, default=str)
         }
         
     except Exception as e:
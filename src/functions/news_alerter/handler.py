@@ -1,15 +1,22 @@
 import os
 import json
-from openai import OpenAI
 import boto3
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from datetime import datetime
 import time
 
-from shared.utils import load_credentials, batch_entities
-from shared.email_helpers import send_email_report, send_error_notification, generate_html_report
-from shared.database import get_dynamodb_client, get_lambda_client, list_entities_from_table
+from shared.utils import load_credentials, get_openai_client, batch_entities, parse_analysis_response
+from shared import metrics, tracing, profiling, cassette
+from shared.email_helpers import (
+    send_error_notification, render_report_digests, normalize_report_view, deliver_report, DEFAULT_REPORT_RECIPIENT,
+    REPORT_RUN_SUMMARY, render_run_summary_section, append_report_section
+)
+from shared.database import (
+    get_dynamodb_client, get_lambda_client, list_entities_from_table, iter_entities_with_important_articles,
+    get_email_list, get_tenant_settings, start_run_status, record_run_progress, ensure_table_ready,
+    finalize_run_summary
+)
 
 # Load credentials from env.json
 def load_credentials():
@@ -25,121 +32,6 @@ def load_credentials():
             'REGION': os.environ.get('REGION', 'us-west-1')
         }
 
-def send_email_report(html_content: str, subject: str = "News Alert", recipient: str = "neilpendyala@gmail.com"):
-    """Send HTML report via SES"""
-    try:
-        credentials = load_credentials()
-        # Check content size
-        content_size_kb = len(html_content.encode('utf-8')) / 1024
-        if content_size_kb > 100:
-            print(f"⚠️ Warning: Email content is {content_size_kb:.1f}KB (recommended max is 100KB)")
-            if content_size_kb > 9500:  # Leave some room for headers
-                raise Exception(f"Email content too large: {content_size_kb:.1f}KB (max 10MB)")
-        
-        # Create SES client
-        ses = boto3.client('ses', region_name=credentials.get('REGION', 'us-west-1'))
-        
-        # Create message container
-        msg = MIMEMultipart('alternative')
-        msg['Subject'] = subject
-        msg['From'] = "reports@gargoylescope.com"
-        msg['To'] = recipient
-        
-        # Add HTML content
-        html_part = MIMEText(html_content, 'html')
-        msg.attach(html_part)
-        
-        # Check final message size
-        message_size_kb = len(msg.as_string().encode('utf-8')) / 1024
-        print(f"📧 Final email size: {message_size_kb:.1f}KB")
-        
-        # Send email
-        response = ses.send_raw_email(
-            Source=msg['From'],
-            Destinations=[recipient],
-            RawMessage={'Data': msg.as_string()}
-        )
-        
-        print(f"✅ Email sent! Message ID: {response['MessageId']}")
-        return True
-        
-    except Exception as e:
-        print(f"❌ Error sending email: {str(e)}")
-        return False
-
-def generate_html_report(entities_with_analysis):
-    """Generate HTML report from analyzed entities, focusing on important articles"""
-    try:
-        # Read email template
-        with open('email_preview.html', 'r') as f:
-            template = f.read()
-            
-        all_analyses_html = ""
-        important_found = False
-        
-        # Process each entity
-        for entity in entities_with_analysis:
-            entity_name = entity['entity_name']
-            analysis_data = entity.get('analysis', {})
-            articles = analysis_data.get('articles', [])
-            
-            # Filter for important articles
-            important_articles = [
-                article for article in articles 
-                if article['analysis'].get('important', False)
-            ]
-            
-            # Skip entity if no important articles
-            if not important_articles:
-                continue
-                
-            important_found = True
-            
-            # Create entity section
-            all_analyses_html += f"""
-            <tr>
-                <td style="padding: 20px;">
-                    <div class="entity-box">
-                        <h2>{entity_name}</h2>
-            """
-            
-            # Add each important article
-            for article in important_articles:
-                all_analyses_html += f"""
-                <div class="article-box">
-                    <h3><a href="{article['url']}">{article['title']}</a></h3>
-                    <p><strong>Summary:</strong> {article['analysis']['summary']}</p>
-                    <p><strong>Sentiment:</strong> {article['analysis']['sentiment']}</p>
-                    <div class="snippet">{article['analysis']['highlighted_text']}</div>
-                </div>
-                """
-            
-            all_analyses_html += """
-                    </div>
-                </td>
-            </tr>
-            """
-        
-        if not important_found:
-            all_analyses_html = """
-            <tr>
-                <td style="padding: 20px;">
-                    <div class="entity-box">
-                        <h2>No Important Updates</h2>
-                        <p>No significant news or updates were found for any tracked entities.</p>
-                    </div>
-                </td>
-            </tr>
-            """
-        
-        # Replace template placeholders
-        html = template.replace('{{article_content}}', all_analyses_html)
-        return html
-        
-    except Exception as e:
-        print(f"Error generating HTML report: {str(e)}")
-        raise
-
 def send_error_notification(error_message: str, recipient: str = "neilpendyala@gmail.com"):
     """Send error notification email"""
     try:
@@ -192,8 +84,6 @@ def analyze_entity(text: str, entity: str, parent_entity: str = "stanford", adva
     """Analyze article text and return analysis with highlighted HTML"""
     try:
         credentials = load_credentials()
-        # Initialize OpenAI client
-        client = OpenAI(api_key=credentials.get('OPENAI_API_KEY'))
         model = os.getenv('OPENAI_MODEL', 'gpt-4o-2024-08-06')
         
         # Create prompt based on response type
@@ -215,20 +105,20 @@ def analyze_entity(text: str, entity: str, parent_entity: str = "stanford", adva
             5. important: boolean, true ONLY if (article is relevant AND (mentions lawsuits OR mentions {parent_entity}))
             """
 
-        # Get response from OpenAI
-        response = client.chat.completions.create(
-            model=model,
-            messages=[
+        request = {
+            'model': model,
+            'messages': [
                 {"role": "system", "content": "You are a helpful assistant that analyzes articles and returns JSON."},
                 {"role": "user", "content": f"Article text: {text}\n\nPrompt: {prompt}"}
             ]
-        )
+        }
+
+        # Get response from OpenAI (pooled client; openai is imported on first use), or from a cassette
+        response = cassette.chat_completion(request, lambda: get_openai_client(credentials.get('OPENAI_API_KEY')).chat.completions.create(**request))
 
         # Parse JSON response
         try:
-            content = response.choices[0].message.content.replace('```json', '').replace('```', '').strip()
-            analysis = json.loads(content)
-            return analysis
+            return parse_analysis_response(response.choices[0].message.content)
             
         except json.JSONDecodeError as e:
             print(f"JSON Parse Error: {str(e)}")
@@ -250,6 +140,96 @@ def analyze_entity(text: str, entity: str, parent_entity: str = "stanford", adva
             'important': False
         }
 
+def merge_delivery_summaries(summaries: list) -> dict:
+    """Combine deliver_report summaries from several recipient groups into one"""
+    return {
+        'sent': sum(summary['sent'] for summary in summaries),
+        'failed': sum(summary['failed'] for summary in summaries),
+        'message_size_kb': max((summary['message_size_kb'] for summary in summaries), default=0),
+        'results': [result for summary in summaries for result in summary['results']]
+    }
+
+def send_report(parent_entity: str, recipient: str = None, include_run_summary: bool = REPORT_RUN_SUMMARY) -> dict:
+    """
+    Stream entities with important articles from DynamoDB into the HTML report and email it
+    to every address on the parent entity's email list.
+    
+    Entities are read page by page and rendered one at a time, so memory grows with the
+    inline digest (capped by REPORT_INLINE_MAX_BYTES) rather than the number of tracked entities.
+    Recipients can narrow their report through the tenant's recipient_views setting
+    (email -> {'entities': [...], 'sentiments': [...]}). Each entity section is rendered once
+    and shared between views, and each view is fanned out to its recipients in parallel.
+    
+    Args:
+        parent_entity (str): Name of the parent entity (e.g., "Stanford")
+        recipient (str, optional): Send only to this address instead of the email list
+        include_run_summary (bool, optional): Append the run summary to the email.
+            Defaults to REPORT_RUN_SUMMARY.
+        
+    Returns:
+        dict: Lambda response with render statistics, the run summary and the delivery summary
+    """
+    print(f"📰 Building report for {parent_entity}...")
+    
+    # The report goes out after the night's workers, so it closes out the run's summary
+    try:
+        run_summary = finalize_run_summary(parent_entity)
+    except Exception as e:
+        print(f"⚠️ Failed to finalize run summary: {str(e)}")
+        run_summary = None
+    
+    recipients = [recipient] if recipient else get_email_list(parent_entity, DEFAULT_REPORT_RECIPIENT)
+    recipient_views = get_tenant_settings(parent_entity).get('recipient_views', {})
+    
+    # Group recipients by view so each distinct report is assembled and serialized once
+    groups = {}
+    for address in recipients:
+        view = normalize_report_view(recipient_views.get(address))
+        groups.setdefault(view, []).append(address)
+    
+    # Inline digests are capped in size; overflow goes to a compressed full report on S3
+    report_key = f"reports/{parent_entity}/{datetime.utcnow().strftime('%Y-%m-%dT%H%M%SZ')}.html.gz"
+    with metrics.stage('report_render', parent_entity=parent_entity) as render:
+        digests, stats = render_report_digests(iter_entities_with_important_articles(parent_entity), groups, report_key)
+        render.add('Entities', stats['entities_rendered'])
+        render.add('ImportantArticles', stats['important_articles'])
+    
+    if include_run_summary and run_summary:
+        section = render_run_summary_section(run_summary)
+        digests = {view: (append_report_section(digest, section), view_stats) for view, (digest, view_stats) in digests.items()}
+    print(f"📝 Rendered {stats['entities_rendered']} entities with {stats['important_articles']} important articles "
+          f"into {len(digests)} report view(s)")
+    
+    with metrics.stage('report_delivery', parent_entity=parent_entity) as send:
+        delivery = merge_delivery_summaries([
+            deliver_report(digests[view][0], f"News Alert: {parent_entity}", addresses)
+            for view, addresses in groups.items()
+        ])
+        send.add('Sent', delivery['sent'])
+        send.add('Failed', delivery['failed'])
+    
+    if delivery['failed'] == 0:
+        status_code = 200
+    elif delivery['sent'] > 0:
+        status_code = 207
+    else:
+        status_code = 500
+    
+    return {
+        'statusCode': status_code,
+        'body': json.dumps({
+            'message': f"Report sent to {delivery['sent']} of {len(delivery['results'])} recipients",
+            'entities_reported': stats['entities_rendered'],
+            'truncated': stats['truncated'],
+            'important_articles': stats['important_articles'],
+            'report_views': len(digests),
+            'full_report_url': stats.get('full_report_url'),
+            'run_summary': run_summary,
+            'delivery': delivery
+        })
+    }
+
+@profiling.profiled
 def lambda_handler(event, context):
     """Lambda handler for article analysis"""
     try:
@@ -265,9 +245,21 @@ def lambda_handler(event, context):
             
         table_name = f"{parent_entity}_TrackedEntities"
         
+        # Report mode: email tonight's results instead of dispatching workers
+        if event.get('action') == 'report':
+            return send_report(parent_entity, event.get('recipient'), event.get('run_summary', REPORT_RUN_SUMMARY))
+        
+        # Write entities that were queued while the table was being created
+        try:
+            ensure_table_ready(parent_entity)
+        except Exception as e:
+            print(f"⚠️ Failed to flush queued entities: {str(e)}")
+        
         # Get all entities from DynamoDB
         print(f"📋 Getting entities from {table_name}...")
-        entities_response = list_entities_from_table(parent_entity)
+        with metrics.stage('list_entities', parent_entity=parent_entity) as listing:
+            entities_response = list_entities_from_table(parent_entity)
+            listing.add('Entities', len(entities_response))
         
         if not entities_response:
             print("❌ No entities found in table")
@@ -289,46 +281,76 @@ def lambda_handler(event, context):
                 'body': json.dumps({'message': 'All entities already processed'})
             }
         
+        # Completion counters for checkCompleted; workers add to them as they finish. Only started
+        # when there is something to dispatch, so the last real run's record is kept
+        try:
+            run_id = start_run_status(parent_entity, len(entities_response), len(entities_response) - len(entities_to_process))
+            print(f"🏁 Started run {run_id}")
+        except Exception as e:
+            print(f"⚠️ Failed to start run status: {str(e)}")
+            run_id = None
+        
         print(f"🔄 Processing {len(entities_to_process)} entities...")
         
-        # Process entities in batches
+        # Process entities in batches, in one trace whose context every worker payload carries
         entity_batches = batch_entities(entities_to_process, batch_size=5)
         
-        for batch in entity_batches:
-            print(f"📦 Processing batch: {batch}")
-            
-            # Invoke worker Lambda for each entity in batch
-            for entity in batch:
-                try:
-                    payload = {
-                        'entity': entity,
-                        'parent_entity': parent_entity,
-                        'table': table_name
-                    }
-                    
-                    print(f"🚀 Invoking worker for entity: {entity}")
-                    response = lambda_client.invoke(
-                        FunctionName='worker',
-                        InvocationType='Event',  # Asynchronous
-                        Payload=json.dumps(payload)
-                    )
-                    
-                    print(f"✅ Worker invoked for {entity}: {response['StatusCode']}")
+        with tracing.start_span('run', parent=tracing.extract(event), kind='SERVER', parent_entity=parent_entity,
+                                run_id=run_id, entities=len(entities_to_process)) as run_span:
+            print(f"🔗 Trace {run_span.trace_id}")
+            for batch in entity_batches:
+                print(f"📦 Processing batch: {batch}")
+                dispatched = 0
+                
+                # Invoke worker Lambda for each entity in batch
+                with metrics.stage('dispatch', parent_entity=parent_entity) as dispatch_stage:
+                    for entity in batch:
+                        try:
+                            payload = {
+                                'entity': entity,
+                                'parent_entity': parent_entity,
+                                'table': table_name,
+                                'run_id': run_id,
+                                # Lets the worker separate time spent queued from processing time
+                                'dispatched_at': int(time.time() * 1000)
+                            }
+                            
+                            print(f"🚀 Invoking worker for entity: {entity}")
+                            with tracing.start_span('dispatch', kind='PRODUCER', entity=entity) as dispatch_span:
+                                response = lambda_client.invoke(
+                                    FunctionName='worker',
+                                    InvocationType='Event',  # Asynchronous
+                                    Payload=json.dumps(tracing.inject(payload, dispatch_span))
+                                )
+                            
+                            print(f"✅ Worker invoked for {entity}: {response['StatusCode']}")
+                            dispatched += 1
+                            
+                        except Exception as e:
+                            print(f"❌ Error invoking worker for {entity}: {str(e)}")
+                            continue
                     
-                except Exception as e:
-                    print(f"❌ Error invoking worker for {entity}: {str(e)}")
-                    continue
+                    dispatch_stage.add('Invocations', dispatched)
+                    dispatch_stage.add('Failures', len(batch) - dispatched)
+                
+                if run_id and dispatched:
+                    try:
+                        record_run_progress(parent_entity, run_id, dispatched=dispatched)
+                    except Exception as e:
+                        print(f"⚠️ Failed to record dispatch progress: {str(e)}")
+                
+                # Wait between batches to avoid overwhelming the system
+                time.sleep(2)
             
-            # Wait between batches to avoid overwhelming the system
-            time.sleep(2)
-        
         print("✅ All entities queued for processing")
         
         return {
             'statusCode': 200,
             'body': json.dumps({
                 'message': f'Queued {len(entities_to_process)} entities for processing',
-                'entities_processed': len(entities_to_process)
+                'entities_processed': len(entities_to_process),
+                'run_id': run_id,
+                'trace_id': run_span.trace_id
             })
         }
         
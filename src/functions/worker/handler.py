@@ -2,14 +2,18 @@
 
 import os
 import json
-from openai import OpenAI
+import time
+from contextlib import nullcontext
 import boto3
-from googleapiclient.discovery import build
 from datetime import datetime, timedelta
 import requests
 
-from shared.utils import load_credentials
-from shared.database import update_entity_analysis
+from shared.utils import load_credentials, get_openai_client, parse_analysis_response
+from shared import metrics, tracing, profiling, cassette
+from shared.database import update_entity_analysis, record_article_history, record_run_progress
+
+# Overridable so benchmarks and local runs can point at a stub search endpoint
+GOOGLE_CSE_ENDPOINT = os.environ.get('GOOGLE_CSE_ENDPOINT', 'https://www.googleapis.com/customsearch/v1')
 
 def search_news_articles(entity: str) -> dict:
     """
@@ -27,7 +31,7 @@ def search_news_articles(entity: str) -> dict:
         api_key = credentials.get('GOOGLE_API_KEY')
         cse_id = credentials.get('GOOGLE_CSE_ID')
         
-        if not api_key or not cse_id:
+        if (not api_key or not cse_id) and not cassette.replaying():
             raise Exception("Google API credentials not found in environment variables")
             
         # Calculate time range (last 48 hours)
@@ -38,7 +42,7 @@ def search_news_articles(entity: str) -> dict:
         date_restrict = f"sort=date:r:{start_time.strftime('%Y%m%d')}"
         
         # Build search URL
-        base_url = "https://www.googleapis.com/customsearch/v1"
+        base_url = GOOGLE_CSE_ENDPOINT
         params = {
             'key': api_key,
             'cx': cse_id,
@@ -49,11 +53,14 @@ def search_news_articles(entity: str) -> dict:
         }
         
         # Make API request
-        response = requests.get(base_url, params=params)
-        response.raise_for_status()
-        
-        # Parse response
-        search_data = response.json()
+        with tracing.start_span('search', kind='CLIENT', entity=entity), metrics.stage('search', entity=entity) as search:
+            # Trace context stays internal: third-party APIs get no traceparent header
+            response = cassette.get(base_url, params=params)
+            response.raise_for_status()
+            
+            # Parse response
+            search_data = response.json()
+            search.add('Results', len(search_data.get('items', [])))
         
         # Extract articles
         articles = []
@@ -81,8 +88,6 @@ def analyze_entity(text: str, entity: str, parent_entity: str = "stanford", adva
     """Analyze article text and return analysis with highlighted HTML"""
     try:
         credentials = load_credentials()
-        # Initialize OpenAI client
-        client = OpenAI(api_key=credentials.get('OPENAI_API_KEY'))
         model = os.getenv('OPENAI_MODEL', 'gpt-4o-2024-08-06')
         
         # Create prompt based on response type
@@ -104,20 +109,26 @@ def analyze_entity(text: str, entity: str, parent_entity: str = "stanford", adva
             5. important: boolean, true ONLY if (article is relevant AND (mentions lawsuits OR mentions {parent_entity}))
             """
 
-        # Get response from OpenAI
-        response = client.chat.completions.create(
-            model=model,
-            messages=[
+        request = {
+            'model': model,
+            'messages': [
                 {"role": "system", "content": "You are a helpful assistant that analyzes articles and returns JSON."},
                 {"role": "user", "content": f"Article text: {text}\n\nPrompt: {prompt}"}
             ]
-        )
+        }
+
+        # Get response from OpenAI (pooled client; openai is imported on first use), or from a cassette
+        with tracing.start_span('llm', kind='CLIENT', entity=entity, model=model), metrics.stage('llm', entity=entity, model=model) as llm:
+            response = cassette.chat_completion(request, lambda: get_openai_client(credentials.get('OPENAI_API_KEY')).chat.completions.create(
+                **request
+            ))
+            usage = getattr(response, 'usage', None)
+            llm.add('PromptTokens', getattr(usage, 'prompt_tokens', None))
+            llm.add('CompletionTokens', getattr(usage, 'completion_tokens', None))
 
         # Parse JSON response
         try:
-            content = response.choices[0].message.content.replace('```json', '').replace('```', '').strip()
-            analysis = json.loads(content)
-            return analysis
+            return parse_analysis_response(response.choices[0].message.content)
             
         except json.JSONDecodeError as e:
             print(f"JSON Parse Error: {str(e)}")
@@ -184,6 +195,12 @@ def process_entity(entity: str, parent_entity: str, table: str = None) -> dict:
         # Update DynamoDB with results
         update_entity_analysis(parent_entity, entity, analysis_data, completed=True)
         
+        # Keep a compact per-run record for trend queries; analysis above is overwritten nightly
+        try:
+            record_article_history(parent_entity, entity, analysis_data['articles'])
+        except Exception as e:
+            print(f"⚠️ Failed to record article history for {entity}: {str(e)}")
+        
         print(f"✅ Completed processing for {entity}")
         return {
             'entity': entity,
@@ -200,8 +217,41 @@ def process_entity(entity: str, parent_entity: str, table: str = None) -> dict:
             'important_articles': 0
         }
 
+def run_stats(records: list) -> dict:
+    """Reduce one entity's metric records to the stats reported into the run summary"""
+    totals = metrics.aggregate(records)
+    entity = totals.get('entity', {})
+    llm = totals.get('llm', {})
+    return {
+        'articles': entity.get('Articles', 0),
+        'important_articles': entity.get('ImportantArticles', 0),
+        'searches': totals.get('search', {}).get('count', 0),
+        'llm_calls': llm.get('count', 0),
+        'prompt_tokens': llm.get('PromptTokens', 0),
+        'completion_tokens': llm.get('CompletionTokens', 0),
+        'latency_ms': entity.get('Duration'),
+        'queue_delay_ms': entity.get('QueueDelay')
+    }
+
+def queue_delay_ms(event: dict, started_ms: float) -> float:
+    """
+    Time between the orchestrator dispatching this invocation and the handler starting.
+    
+    Covers the async invoke queue and any cold start. Clocks are the two functions'
+    system clocks, so small negative skew is clamped to 0.
+    
+    Returns:
+        float: Milliseconds queued, or None if the payload has no dispatch time
+    """
+    dispatched_at = event.get('dispatched_at')
+    if dispatched_at is None:
+        return None
+    return max(0.0, started_ms - float(dispatched_at))
+
+@profiling.profiled
 def lambda_handler(event, context):
     """Lambda handler for processing individual entities"""
+    started_ms = time.time() * 1000
     try:
         # Extract parameters from event
         entity = event.get('entity')
@@ -210,10 +260,39 @@ def lambda_handler(event, context):
         if not entity or not parent_entity:
             raise Exception("Both 'entity' and 'parent_entity' must be provided in event")
         
-        print(f"🚀 Starting processing for entity: {entity}")
+        # Continue the orchestrator's trace; the queued span ends where processing starts
+        run_id = event.get('run_id')
+        parent = tracing.extract(event)
+        queued_ms = queue_delay_ms(event, started_ms)
+        if queued_ms is not None and parent is not None:
+            tracing.start_span('queued', parent=parent, start_ns=int(event['dispatched_at']) * 1000000,
+                               entity=entity).end(int(started_ms * 1000000))
+        
+        with tracing.start_span('process', parent=parent, kind='CONSUMER', entity=entity, parent_entity=parent_entity,
+                                run_id=run_id, queue_delay_ms=queued_ms) as span:
+            print(f"🚀 Starting processing for entity: {entity} (run {run_id}, trace {span.trace_id})")
+            
+            # Process the entity; stages are collected for the run summary when part of a run
+            with (metrics.collect() if run_id else nullcontext([])) as records:
+                with metrics.stage('entity', entity=entity, parent_entity=parent_entity, run_id=run_id,
+                                   trace_id=span.trace_id) as total:
+                    total.add('QueueDelay', queued_ms, 'Milliseconds')
+                    result = process_entity(entity, parent_entity, event.get('table'))
+                    total.add('Articles', result.get('articles_found'))
+                    total.add('ImportantArticles', result.get('important_articles'))
+                    if 'error' in result:
+                        total.add('Errors', 1)
+                        span.set_error(result['error'])
         
-        # Process the entity
-        result = process_entity(entity, parent_entity)
+        # Count this entity towards the run's completion status and summary
+        if run_id:
+            try:
+                if 'error' in result:
+                    record_run_progress(parent_entity, run_id, failed=1, stats=run_stats(records))
+                else:
+                    record_run_progress(parent_entity, run_id, completed=1, stats=run_stats(records))
+            except Exception as e:
+                print(f"⚠️ Failed to record run progress for {entity}: {str(e)}")
         
         print(f"✅ Processing complete for {entity}")
         
@@ -0,0 +1,273 @@
+import os
+import re
+import gzip
+import json
+import time
+import random
+import hashlib
+import threading
+from contextlib import contextmanager
+
+# Record/replay of Google Custom Search and OpenAI calls, so experiments run on the same inputs
+# off: call the APIs; record: call them and append each exchange to CASSETTE_PATH;
+# replay: answer from CASSETTE_PATH without the network (or API keys)
+CASSETTE_MODE = os.environ.get('CASSETTE_MODE', 'off').lower()
+CASSETTE_PATH = os.environ.get('CASSETTE_PATH', '/tmp/cassettes/cassette.jsonl.gz')
+# Replay latency - off: none; recorded: each exchange's own; sampled: drawn from the recorded ones of its kind
+CASSETTE_LATENCY = os.environ.get('CASSETTE_LATENCY', 'off').lower()
+CASSETTE_SEED = int(os.environ.get('CASSETTE_SEED', '0'))
+
+# Request fields never written to a cassette or used to match one
+REDACTED_FIELDS = {'key', 'cx', 'api_key', 'authorization', 'extra_headers', 'headers'}
+REDACTED = '[REDACTED]'
+# Credentials that show up inside text: query strings in request errors, (masked) OpenAI keys, bearer tokens
+SECRET_PATTERNS = [
+    (re.compile(r'(?i)\b(key|cx|api_key)=[^&\s\'"]*'), r'\1=' + REDACTED),
+    (re.compile(r'\bsk-[A-Za-z0-9*_\-]+'), 'sk-' + REDACTED),
+    (re.compile(r'(?i)\bBearer\s+\S+'), 'Bearer ' + REDACTED)
+]
+
+class Cassette:
+    """
+    Recorded API exchanges in a JSON lines file (gzipped if the path ends in .gz).
+
+    Each line is one exchange: kind ('search' or 'llm'), the redacted request, a
+    key hashed from it, the status, latency and response body (or the error).
+    Identical requests are replayed in the order they were recorded, and the
+    last recording is repeated once they run out.
+
+    Args:
+        path (str): Cassette file; recording appends to it
+        mode (str): record or replay
+        latency (str, optional): Replay latency - off, recorded or sampled
+        seed (int, optional): Seed for sampled latency
+    """
+    def __init__(self, path: str, mode: str, latency: str = 'off', seed: int = 0):
+        if mode not in ('record', 'replay'):
+            raise Exception(f"Unknown cassette mode: {mode}")
+        if latency not in ('off', 'recorded', 'sampled'):
+            raise Exception(f"Unknown cassette latency: {latency}")
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+        self.seed = seed
+        self.exchanges = {}
+        self._positions = {}
+        self._lock = threading.Lock()
+        if mode == 'replay':
+            self._load()
+
+    def _open(self, mode: str):
+        if self.path.endswith('.gz'):
+            return gzip.open(self.path, mode + 't', encoding='utf-8')
+        return open(self.path, mode, encoding='utf-8')
+
+    def _load(self):
+        try:
+            with self._open('r') as f:
+                for line in f:
+                    if line.strip():
+                        exchange = json.loads(line)
+                        self.exchanges.setdefault(exchange['key'], []).append(exchange)
+        except FileNotFoundError:
+            raise Exception(f"Cassette not found: {self.path}")
+
+    def record(self, kind: str, request: dict, status: int, latency_ms: float, response=None, error: Exception = None):
+        """Append one exchange to the cassette file; the request, response and error message are redacted"""
+        exchange = {'kind': kind, 'key': request_key(kind, request), 'request': redact(request),
+                    'status': status, 'latency_ms': round(latency_ms, 1)}
+        if error is not None:
+            exchange['error'] = {'type': type(error).__name__, 'message': redact(str(error))}
+        else:
+            exchange['response'] = redact(response)
+        line = json.dumps(exchange, separators=(',', ':'), default=str)
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # Appended gzip members read back as one stream
+            with self._open('a') as f:
+                f.write(line + '\n')
+            self.exchanges.setdefault(exchange['key'], []).append(exchange)
+
+    def play(self, kind: str, request: dict) -> dict:
+        """
+        The next recorded exchange for a request, after the replay latency.
+
+        Raises:
+            Exception: If the cassette has no exchange for the request
+        """
+        key = request_key(kind, request)
+        with self._lock:
+            recorded = self.exchanges.get(key)
+            if not recorded:
+                raise Exception(f"No {kind} exchange in cassette {self.path} for request {key}")
+            position = self._positions.get(key, 0)
+            self._positions[key] = position + 1
+        exchange = recorded[min(position, len(recorded) - 1)]
+
+        delay_ms = self.delay_ms(exchange, position)
+        if delay_ms:
+            time.sleep(delay_ms / 1000)
+        return exchange
+
+    def delay_ms(self, exchange: dict, position: int = 0) -> float:
+        """Replay latency for an exchange; sampling is seeded by the request, so reruns sleep the same"""
+        if self.latency == 'recorded':
+            return exchange.get('latency_ms', 0.0)
+        if self.latency == 'sampled':
+            latencies = self.latencies(exchange['kind'])
+            rng = random.Random(f"{self.seed}:{exchange['key']}:{position}")
+            return rng.choice(latencies) if latencies else 0.0
+        return 0.0
+
+    def latencies(self, kind: str) -> list:
+        """Recorded latencies (ms) of one kind of exchange, in recording order"""
+        return [exchange['latency_ms'] for exchanges in self.exchanges.values() for exchange in exchanges
+                if exchange['kind'] == kind]
+
+    def queries(self) -> list:
+        """Search queries on the cassette, in the order they were first recorded"""
+        queries = {}
+        for exchanges in self.exchanges.values():
+            for exchange in exchanges:
+                if exchange['kind'] == 'search':
+                    queries.setdefault(exchange['request'].get('params', {}).get('q'), None)
+        return [query for query in queries if query is not None]
+
+def redact(value):
+    """
+    Copy of a request, response or message with credentials replaced by [REDACTED].
+
+    Credential fields (REDACTED_FIELDS) are replaced wherever they appear, e.g. the
+    `cx` Custom Search echoes in queries.request; strings are scrubbed of SECRET_PATTERNS.
+    """
+    if isinstance(value, dict):
+        return {key: REDACTED if str(key).lower() in REDACTED_FIELDS else redact(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(item) for item in value]
+    if isinstance(value, str):
+        for pattern, replacement in SECRET_PATTERNS:
+            value = pattern.sub(replacement, value)
+    return value
+
+def request_key(kind: str, request: dict) -> str:
+    """Stable hash of a request without its credentials; what replay matches on"""
+    canonical = json.dumps([kind, redact(request)], sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:24]
+
+_active = None
+_env_cassette = None
+_active_lock = threading.Lock()
+
+def active() -> Cassette:
+    """The cassette of the enclosing use() block, else the one configured by CASSETTE_MODE, else None"""
+    global _env_cassette
+    if _active is not None:
+        return _active
+    if CASSETTE_MODE == 'off':
+        return None
+    if _env_cassette is None:
+        with _active_lock:
+            if _env_cassette is None:
+                _env_cassette = Cassette(CASSETTE_PATH, CASSETTE_MODE, CASSETTE_LATENCY, CASSETTE_SEED)
+    return _env_cassette
+
+def replaying() -> bool:
+    """Whether API calls are answered from a cassette (so no credentials are needed)"""
+    cassette = active()
+    return cassette is not None and cassette.mode == 'replay'
+
+@contextmanager
+def use(path: str, mode: str = 'replay', latency: str = 'off', seed: int = 0):
+    """
+    Record or replay API calls in a block, whatever CASSETTE_MODE says.
+
+    Usage:
+        with cassette.use('tests/cassettes/nightly.jsonl.gz', 'replay', latency='sampled'):
+            worker.process_entity('Nordstrom', 'Stanford')
+    """
+    global _active
+    previous = _active
+    _active = Cassette(path, mode, latency, seed)
+    try:
+        yield _active
+    finally:
+        _active = previous
+
+def get(url: str, params: dict = None, headers: dict = None, kind: str = 'search'):
+    """
+    requests.get through the active cassette.
+
+    Returns:
+        requests.Response: The live response, or one rebuilt from the cassette
+
+    Raises:
+        requests.exceptions.RequestException: As recorded, when replaying a failed request
+    """
+    import requests
+
+    cassette = active()
+    if cassette is None:
+        return requests.get(url, params=params, headers=headers)
+
+    request = {'params': params or {}}
+    if cassette.mode == 'replay':
+        exchange = cassette.play(kind, request)
+        if 'error' in exchange:
+            raise requests.exceptions.RequestException(f"{exchange['error']['type']}: {exchange['error']['message']}")
+        response = requests.models.Response()
+        response.status_code = exchange['status']
+        response.reason = 'Replayed'
+        response.url = url
+        body = exchange['response']
+        response._content = (body if isinstance(body, str) else json.dumps(body)).encode('utf-8')
+        response.headers['Content-Type'] = 'text/plain' if isinstance(body, str) else 'application/json'
+        return response
+
+    start = time.perf_counter()
+    try:
+        response = requests.get(url, params=params, headers=headers)
+    except requests.exceptions.RequestException as e:
+        cassette.record(kind, request, None, (time.perf_counter() - start) * 1000, error=e)
+        raise
+    try:
+        body = response.json()
+    except ValueError:
+        body = response.text
+    cassette.record(kind, request, response.status_code, (time.perf_counter() - start) * 1000, body)
+    return response
+
+def chat_completion(request: dict, send, kind: str = 'llm'):
+    """
+    An OpenAI chat completion through the active cassette.
+
+    Args:
+        request (dict): What identifies the call (model, messages, ...)
+        send (callable): Makes the live call and returns the ChatCompletion; not called when replaying
+
+    Returns:
+        ChatCompletion: Live, or rebuilt from the cassette
+
+    Raises:
+        Exception: As recorded, when replaying a failed call
+    """
+    cassette = active()
+    if cassette is None:
+        return send()
+
+    if cassette.mode == 'replay':
+        exchange = cassette.play(kind, request)
+        if 'error' in exchange:
+            raise Exception(f"{exchange['error']['type']}: {exchange['error']['message']}")
+        from openai.types.chat import ChatCompletion
+        return ChatCompletion.model_validate(exchange['response'])
+
+    start = time.perf_counter()
+    try:
+        response = send()
+    except Exception as e:
+        cassette.record(kind, request, getattr(e, 'status_code', None), (time.perf_counter() - start) * 1000, error=e)
+        raise
+    cassette.record(kind, request, 200, (time.perf_counter() - start) * 1000, response.model_dump(exclude_unset=True))
+    return response
\ No newline at end of file
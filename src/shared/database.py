@@ -1,5 +1,65 @@
+import os
+import calendar
+import uuid
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from decimal import Decimal
 import boto3
-from .utils import load_credentials
+from boto3.dynamodb.conditions import Key
+from boto3.dynamodb.types import TypeDeserializer
+from .utils import load_credentials, TTLCache
+from . import metrics
+
+# In-process cache of EmailList items (recipients + per-tenant settings), shared by warm invocations
+EMAIL_LIST_CACHE_TTL = float(os.environ.get('EMAIL_LIST_CACHE_TTL', '300'))
+_email_list_cache = TTLCache(maxsize=512, ttl=EMAIL_LIST_CACHE_TTL)
+
+# Cache key for the sender email -> parent entity index built from a single EmailList scan
+_SENDER_INDEX_KEY = ('__sender_index__',)
+_sender_index_lock = threading.Lock()
+
+# Append-only per-run article history, expired by DynamoDB TTL
+ARTICLE_HISTORY_TABLE = os.environ.get('ARTICLE_HISTORY_TABLE', 'ArticleHistory')
+ARTICLE_HISTORY_TTL_DAYS = int(os.environ.get('ARTICLE_HISTORY_TTL_DAYS', '90'))
+HISTORY_TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+
+# Ledger of processed inbound emails, so redelivered S3 notifications are no-ops
+PROCESSED_EMAILS_TABLE = os.environ.get('PROCESSED_EMAILS_TABLE', 'ProcessedEmails')
+PROCESSED_EMAIL_TTL_DAYS = int(os.environ.get('PROCESSED_EMAIL_TTL_DAYS', '7'))
+# A claim still 'processing' after this long is treated as abandoned (e.g. the invocation timed out)
+PROCESSED_EMAIL_CLAIM_TIMEOUT = int(os.environ.get('PROCESSED_EMAIL_CLAIM_TIMEOUT', '300'))
+
+# Entity names sent to EmailList in one update while queueing adds for a table that is still CREATING
+PENDING_ENTITIES_CHUNK = 1000
+# Parent entities whose tracking table has been seen ACTIVE with an empty queue in this container;
+# expires so a table that was deleted (or recreated) is looked up again
+ACTIVE_TABLE_CACHE_TTL = float(os.environ.get('ACTIVE_TABLE_CACHE_TTL', '300'))
+_active_parents = TTLCache(maxsize=512, ttl=ACTIVE_TABLE_CACHE_TTL)
+
+# Per-parent record of the current run, with atomic completion counters
+RUN_STATUS_TABLE = os.environ.get('RUN_STATUS_TABLE', 'RunStatus')
+
+# Finalized run summaries keyed (parent_entity, run_id), kept for night-over-night trends
+RUN_SUMMARIES_TABLE = os.environ.get('RUN_SUMMARIES_TABLE', 'RunSummaries')
+RUN_SUMMARY_TTL_DAYS = int(os.environ.get('RUN_SUMMARY_TTL_DAYS', '365'))
+
+# Stats workers add to the run record with their progress; latency goes into a histogram
+RUN_STAT_COUNTERS = ('articles', 'important_articles', 'searches', 'llm_calls', 'prompt_tokens', 'completion_tokens')
+# Upper bounds (ms) of the worker latency buckets; percentiles are reported as bucket bounds
+RUN_LATENCY_BUCKETS_MS = (250, 500, 1000, 2500, 5000, 10000, 25000, 60000, 120000, 300000, 900000)
+
+# Inputs to the run's estimated cost (USD)
+OPENAI_PROMPT_USD_PER_MTOK = float(os.environ.get('OPENAI_PROMPT_USD_PER_MTOK', '2.50'))
+OPENAI_COMPLETION_USD_PER_MTOK = float(os.environ.get('OPENAI_COMPLETION_USD_PER_MTOK', '10.00'))
+CSE_USD_PER_QUERY = float(os.environ.get('CSE_USD_PER_QUERY', '0.005'))
+
+# Batched writes: BatchWriteItem takes at most 25 items; unprocessed items are retried with backoff
+BATCH_WRITE_SIZE = 25
+BATCH_WRITE_RETRIES = int(os.environ.get('BATCH_WRITE_RETRIES', '5'))
+BATCH_WRITE_CONCURRENCY = int(os.environ.get('BATCH_WRITE_CONCURRENCY', '4'))
 
 def get_dynamodb_client():
     """Get DynamoDB client with credentials"""
@@ -30,8 +90,21 @@ def table_exists(table_name: str) -> bool:
     except dynamodb_client.exceptions.ResourceNotFoundException:
         return False
 
-def create_tracked_entities_table(parent_entity: str):
-    """Create DynamoDB table for tracking entities"""
+def get_table_status(table_name: str):
+    """Get a table's status (CREATING, ACTIVE, ...), or None if it does not exist"""
+    dynamodb_client = get_dynamodb_client()
+    try:
+        return dynamodb_client.describe_table(TableName=table_name)['Table']['TableStatus']
+    except dynamodb_client.exceptions.ResourceNotFoundException:
+        return None
+
+def create_tracked_entities_table(parent_entity: str, wait: bool = True):
+    """
+    Create DynamoDB table for tracking entities
+    
+    With wait=False the call returns as soon as CreateTable is accepted, while the table
+    is still CREATING; adds made in the meantime are queued (see add_or_queue_entities).
+    """
     dynamodb_client = get_dynamodb_client()
     table_name = f"{parent_entity}_TrackedEntities"
     
@@ -58,12 +131,22 @@ def create_tracked_entities_table(parent_entity: str):
     )
     
     # Wait for table to be created
-    dynamodb_client.get_waiter('table_exists').wait(TableName=table_name)
+    if wait:
+        dynamodb_client.get_waiter('table_exists').wait(TableName=table_name)
     
     return response
 
-def add_entities_to_table(parent_entity: str, entities: list, analysis: dict = None, completed: bool = False):
-    """Add entities to tracking table"""
+def add_entities_to_table(parent_entity: str, entities: list, analysis: dict = None, completed: bool = False,
+                          only_if_absent: bool = False):
+    """
+    Add entities to tracking table
+    
+    With only_if_absent, entities that are already tracked are left untouched (keeping their
+    analysis) and reported in existing_entities instead of being reset.
+    
+    The result's created_count and completed_change (net change in completed entities) are
+    what the run counters need to be adjusted by.
+    """
     if analysis is None:
         analysis = {}
     
@@ -71,18 +154,39 @@ def add_entities_to_table(parent_entity: str, entities: list, analysis: dict = N
     table = get_table(table_name)
     
     added_entities = []
+    existing_entities = []
     failed_entities = []
     
+    created_count = completed_change = 0
+    
+    put_kwargs = {}
+    if only_if_absent:
+        put_kwargs['ConditionExpression'] = 'attribute_not_exists(entity_name)'
+    else:
+        # Only the completed flag of a replaced entity is needed, but put_item returns all or nothing
+        put_kwargs['ReturnValues'] = 'ALL_OLD'
+    
     for entity in entities:
         try:
-            table.put_item(
+            response = table.put_item(
                 Item={
                     'entity_name': entity,
                     'analysis': analysis,
                     'completed': completed
-                }
+                },
+                **put_kwargs
             )
             added_entities.append(entity)
+            previous = response.get('Attributes')
+            if previous is None:
+                created_count += 1
+            completed_change += int(bool(completed)) - int(bool((previous or {}).get('completed', False)))
+        except table.meta.client.exceptions.ConditionalCheckFailedException:
+            existing_entities.append(entity)
+        except table.meta.client.exceptions.ResourceNotFoundException:
+            # Deleted since it was seen ACTIVE
+            _active_parents.invalidate(parent_entity)
+            raise Exception(f"Table {table_name} does not exist")
         except Exception as e:
             print(f"Failed to add entity {entity}: {str(e)}")
             failed_entities.append({
@@ -90,18 +194,169 @@ def add_entities_to_table(parent_entity: str, entities: list, analysis: dict = N
                 "error": str(e)
             })
     
-    return {
+    result = {
         "added_entities": added_entities,
+        "failed_entities": failed_entities,
+        "created_count": created_count,
+        "completed_change": completed_change
+    }
+    if only_if_absent:
+        result["existing_entities"] = existing_entities
+    return result
+
+def _write_batch(dynamodb_resource, table_name: str, items: list, key_name: str) -> list:
+    """
+    Write up to 25 items with BatchWriteItem, retrying unprocessed items with backoff.
+    
+    Returns:
+        list: Failed items as {"entity": key, "error": message}
+    """
+    requests = [{'PutRequest': {'Item': item}} for item in items]
+    for attempt in range(BATCH_WRITE_RETRIES + 1):
+        try:
+            response = dynamodb_resource.batch_write_item(RequestItems={table_name: requests})
+        except Exception as e:
+            return [{"entity": request['PutRequest']['Item'][key_name], "error": str(e)} for request in requests]
+        
+        requests = response.get('UnprocessedItems', {}).get(table_name, [])
+        if not requests:
+            return []
+        if attempt < BATCH_WRITE_RETRIES:
+            time.sleep(min(0.05 * (2 ** attempt), 2.0))
+    
+    return [{"entity": request['PutRequest']['Item'][key_name], "error": "Unprocessed after retries"} for request in requests]
+
+def batch_put_items(table_name: str, items, key_name: str = 'entity_name', max_workers: int = None) -> dict:
+    """
+    Put many items with BatchWriteItem, a bounded number of batches at a time.
+    
+    Items are consumed lazily, so an iterator of any length is written with at most
+    max_workers batches in memory.
+    
+    Args:
+        table_name (str): DynamoDB table name
+        items: Iterable of items (plain Python values, as for Table.put_item)
+        key_name (str, optional): Partition key, used to report failures
+        max_workers (int, optional): Batches in flight. Defaults to BATCH_WRITE_CONCURRENCY.
+        
+    Returns:
+        dict: {"written": count, "failed_entities": [{"entity", "error"}, ...]}
+    """
+    dynamodb_resource = get_dynamodb_resource()
+    max_workers = max_workers or BATCH_WRITE_CONCURRENCY
+    
+    written = 0
+    failed_entities = []
+    
+    def batches():
+        batch = []
+        for item in items:
+            batch.append(item)
+            if len(batch) == BATCH_WRITE_SIZE:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = []
+        for batch in batches():
+            pending.append((len(batch), executor.submit(_write_batch, dynamodb_resource, table_name, batch, key_name)))
+            if len(pending) >= max_workers:
+                size, future = pending.pop(0)
+                failed = future.result()
+                written += size - len(failed)
+                failed_entities.extend(failed)
+        for size, future in pending:
+            failed = future.result()
+            written += size - len(failed)
+            failed_entities.extend(failed)
+    
+    return {
+        "written": written,
         "failed_entities": failed_entities
     }
 
+def _iter_absent_entities(table_name: str, entities, existing: list):
+    """
+    Yield the entities that are not in the table yet, checking 100 keys per BatchGetItem.
+    
+    Entities that are already tracked are appended to existing.
+    """
+    dynamodb_resource = get_dynamodb_resource()
+    
+    def check(chunk):
+        keys = [{'entity_name': entity} for entity in chunk]
+        found = set()
+        while keys:
+            response = dynamodb_resource.batch_get_item(
+                RequestItems={table_name: {'Keys': keys, 'ProjectionExpression': 'entity_name'}}
+            )
+            found.update(item['entity_name'] for item in response.get('Responses', {}).get(table_name, []))
+            keys = response.get('UnprocessedKeys', {}).get(table_name, {}).get('Keys', [])
+        for entity in chunk:
+            if entity in found:
+                existing.append(entity)
+            else:
+                yield entity
+    
+    chunk = []
+    for entity in entities:
+        chunk.append(entity)
+        if len(chunk) == 100:
+            yield from check(chunk)
+            chunk = []
+    if chunk:
+        yield from check(chunk)
+
+def bulk_add_entities(parent_entity: str, entities, analysis: dict = None, completed: bool = False,
+                      only_if_absent: bool = False) -> dict:
+    """
+    Add many entities to the tracking table with batched writes.
+    
+    BatchWriteItem cannot be conditional, so only_if_absent looks the names up with
+    BatchGetItem first and writes only the missing ones. An entity added concurrently
+    between the two calls can still be overwritten.
+    
+    Args:
+        parent_entity (str): Name of the parent entity (e.g., "Stanford")
+        entities: Iterable of unique entity names
+        analysis (dict, optional): Initial analysis. Defaults to {}.
+        completed (bool, optional): Initial completed flag
+        only_if_absent (bool, optional): Skip entities that are already tracked
+        
+    Returns:
+        dict: {"added_count": count, "existing_count": count, "failed_entities": [{"entity", "error"}, ...]}
+    """
+    if analysis is None:
+        analysis = {}
+    
+    table_name = f"{parent_entity}_TrackedEntities"
+    existing = []
+    if only_if_absent:
+        entities = _iter_absent_entities(table_name, entities, existing)
+    
+    items = ({'entity_name': entity, 'analysis': analysis, 'completed': completed} for entity in entities)
+    result = batch_put_items(table_name, items)
+    
+    return {
+        "added_count": result['written'],
+        "existing_count": len(existing),
+        "failed_entities": result['failed_entities']
+    }
+
 def delete_entities_from_table(parent_entity: str, entities: list):
-    """Delete entities from tracking table"""
+    """
+    Delete entities from tracking table
+    
+    The result's completed_count is how many of the deleted entities were completed.
+    """
     table_name = f"{parent_entity}_TrackedEntities"
     table = get_table(table_name)
     
     deleted_entities = []
     not_found_entities = []
+    completed_count = 0
     
     for entity in entities:
         try:
@@ -111,6 +366,8 @@ def delete_entities_from_table(parent_entity: str, entities: list):
             )
             if 'Attributes' in response:
                 deleted_entities.append(entity)
+                if response['Attributes'].get('completed', False):
+                    completed_count += 1
             else:
                 not_found_entities.append(entity)
         except Exception as e:
@@ -119,24 +376,48 @@ def delete_entities_from_table(parent_entity: str, entities: list):
     
     return {
         "deleted_entities": deleted_entities,
-        "not_found_entities": not_found_entities
+        "not_found_entities": not_found_entities,
+        "completed_count": completed_count
     }
 
+def iter_entity_items(parent_entity: str, attributes: list = None, page_size: int = None):
+    """
+    Yield tracking table items page by page instead of materializing the whole scan.
+    
+    Args:
+        parent_entity (str): Name of the parent entity (e.g., "Stanford")
+        attributes (list, optional): Attribute names to project. Defaults to all attributes.
+        page_size (int, optional): Maximum items per scan page
+    """
+    table = get_table(f"{parent_entity}_TrackedEntities")
+    
+    scan_kwargs = {}
+    if attributes:
+        # Placeholders avoid clashes with DynamoDB reserved words
+        names = {f"#a{i}": attribute for i, attribute in enumerate(attributes)}
+        scan_kwargs['ProjectionExpression'] = ', '.join(names)
+        scan_kwargs['ExpressionAttributeNames'] = names
+    if page_size:
+        scan_kwargs['Limit'] = page_size
+    
+    while True:
+        response = table.scan(**scan_kwargs)
+        for item in response['Items']:
+            yield item
+        
+        # Handle pagination
+        if 'LastEvaluatedKey' not in response:
+            break
+        scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
 def list_entities_from_table(parent_entity: str, include_analysis: bool = False):
     """List entities from tracking table"""
-    table_name = f"{parent_entity}_TrackedEntities"
-    table = get_table(table_name)
+    attributes = ['entity_name', 'completed']
+    if include_analysis:
+        attributes.append('analysis')
     
     entities = []
-    response = table.scan()
-    items = response['Items']
-    
-    # Handle pagination
-    while 'LastEvaluatedKey' in response:
-        response = table.scan(ExclusiveStartKey=response['LastEvaluatedKey'])
-        items.extend(response['Items'])
-    
-    for item in items:
+    for item in iter_entity_items(parent_entity, attributes):
         entity_info = {
             'entity_name': item['entity_name'],
             'completed': item.get('completed', False)
@@ -147,19 +428,620 @@ def list_entities_from_table(parent_entity: str, include_analysis: bool = False)
     
     return entities
 
-def update_entity_analysis(parent_entity: str, entity_name: str, analysis: dict, completed: bool = True):
-    """Update entity analysis in tracking table"""
+def count_important_articles(analysis: dict) -> int:
+    """Count articles flagged important in an analysis map"""
+    return sum(
+        1 for article in analysis.get('articles', [])
+        if article.get('analysis', {}).get('important', False)
+    )
+
+def _raw_item_has_important_article(raw_item: dict) -> bool:
+    """Check a low-level (undeserialized) item for important articles without deserializing it"""
+    if 'important_count' in raw_item:
+        return int(raw_item['important_count']['N']) > 0
+    
+    # Items written before important_count existed: walk the raw analysis map
+    articles = raw_item.get('analysis', {}).get('M', {}).get('articles', {}).get('L', [])
+    for article in articles:
+        flag = article.get('M', {}).get('analysis', {}).get('M', {}).get('important', {})
+        if flag.get('BOOL', False):
+            return True
+    return False
+
+def iter_entities_with_important_articles(parent_entity: str, page_size: int = 100):
+    """
+    Yield entities that have at least one important article, one at a time.
+    
+    Items are read with the low-level client, so entities without important articles
+    are dropped before their analysis is deserialized. DynamoDB also filters on
+    important_count server-side where the worker has recorded it.
+    
+    Args:
+        parent_entity (str): Name of the parent entity (e.g., "Stanford")
+        page_size (int, optional): Maximum items per scan page. Defaults to 100.
+        
+    Yields:
+        dict: entity_name, completed and analysis for each matching entity
+    """
+    dynamodb_client = get_dynamodb_client()
+    paginator = dynamodb_client.get_paginator('scan')
+    pages = paginator.paginate(
+        TableName=f"{parent_entity}_TrackedEntities",
+        FilterExpression='attribute_not_exists(important_count) OR important_count > :zero',
+        ExpressionAttributeValues={':zero': {'N': '0'}},
+        PaginationConfig={'PageSize': page_size}
+    )
+    deserializer = TypeDeserializer()
+    
+    for page in pages:
+        for raw_item in page['Items']:
+            if not _raw_item_has_important_article(raw_item):
+                continue
+            yield {
+                'entity_name': deserializer.deserialize(raw_item['entity_name']),
+                'completed': deserializer.deserialize(raw_item['completed']) if 'completed' in raw_item else False,
+                'analysis': deserializer.deserialize(raw_item['analysis']) if 'analysis' in raw_item else {}
+            }
+
+def update_entity_analysis(parent_entity: str, entity_name: str, analysis: dict, completed: bool = True,
+                           return_previous: bool = False):
+    """
+    Update entity analysis in tracking table
+    
+    The update is an upsert. With return_previous, the item as it was before the update is
+    returned (None if the entity was not tracked), so the run counters can be adjusted.
+    """
     table_name = f"{parent_entity}_TrackedEntities"
     table = get_table(table_name)
     
-    table.update_item(
-        Key={'entity_name': entity_name},
-        UpdateExpression="SET analysis = :analysis, completed = :completed",
-        ExpressionAttributeValues={
-            ':analysis': analysis,
-            ':completed': completed
+    # Consumed capacity is only requested when metrics are being recorded
+    update_kwargs = {'ReturnConsumedCapacity': 'TOTAL'} if metrics.enabled() else {}
+    if return_previous:
+        update_kwargs['ReturnValues'] = 'ALL_OLD'
+    
+    # important_count lets report scans skip entities without deserializing their analysis
+    with metrics.stage('dynamodb_write', table=table_name, entity=entity_name) as write:
+        response = table.update_item(
+            Key={'entity_name': entity_name},
+            UpdateExpression="SET analysis = :analysis, completed = :completed, important_count = :important_count",
+            ExpressionAttributeValues={
+                ':analysis': analysis,
+                ':completed': completed,
+                ':important_count': count_important_articles(analysis)
+            },
+            **update_kwargs
+        )
+        if 'ReturnConsumedCapacity' in update_kwargs:
+            write.add('ConsumedWriteCapacity', (response.get('ConsumedCapacity') or {}).get('CapacityUnits'))
+    
+    if return_previous:
+        return response.get('Attributes')
+
+def _get_completed_flags(dynamodb_resource, table_name: str, names: list) -> dict:
+    """Completed flags of the tracked entities among names (100 at most), with one BatchGetItem"""
+    keys = [{'entity_name': name} for name in names]
+    flags = {}
+    while keys:
+        response = dynamodb_resource.batch_get_item(
+            RequestItems={table_name: {'Keys': keys, 'ProjectionExpression': 'entity_name, completed'}}
+        )
+        for item in response.get('Responses', {}).get(table_name, []):
+            flags[item['entity_name']] = bool(item.get('completed', False))
+        keys = response.get('UnprocessedKeys', {}).get(table_name, {}).get('Keys', [])
+    return flags
+
+def bulk_update_entity_analysis(parent_entity: str, updates, max_workers: int = None) -> dict:
+    """
+    Write many entity analyses with batched writes and bounded parallelism.
+    
+    Each update replaces the entity's item (entity_name, analysis, completed, important_count),
+    which is what update_entity_analysis leaves in the table. Updates are consumed lazily,
+    so an iterator over a large file is never held in memory. The entities' previous completed
+    flags are read 100 at a time first, so the run counters can be adjusted afterwards.
+    
+    Args:
+        parent_entity (str): Name of the parent entity (e.g., "Stanford")
+        updates: Iterable of {"entity_name", "analysis", "completed"} dicts; completed defaults
+            to False as in the handle_table update action. An {"error": ...} dict marks an
+            unparseable update.
+        max_workers (int, optional): Batches in flight. Defaults to BATCH_WRITE_CONCURRENCY.
+        
+    Returns:
+        dict: {"updated_count", "failed_count", "invalid_count", "created_count": entities that
+        were not tracked before, "completed_change": net change in completed entities,
+        "errors": [{"entity_name", "status", "error"}, ...]} where errors lists only the
+        "failed" and "invalid" updates
+    """
+    table_name = f"{parent_entity}_TrackedEntities"
+    dynamodb_resource = get_dynamodb_resource()
+    seen = {}
+    previous = {}
+    invalid = []
+    
+    def with_previous_flags(chunk):
+        flags = _get_completed_flags(dynamodb_resource, table_name, [item['entity_name'] for item in chunk])
+        for item in chunk:
+            previous[item['entity_name']] = flags.get(item['entity_name'])
+        return chunk
+    
+    def items():
+        chunk = []
+        for index, update in enumerate(updates):
+            entity_name = update.get('entity_name') if isinstance(update, dict) else None
+            if not entity_name or 'error' in update:
+                error = update.get('error') if isinstance(update, dict) and 'error' in update else "'entity_name' is required"
+                invalid.append({'entity_name': entity_name, 'index': index, 'status': 'invalid', 'error': error})
+                continue
+            if entity_name in seen:
+                # Batches run in parallel, so a second write could land before the first
+                invalid.append({'entity_name': entity_name, 'index': index, 'status': 'invalid',
+                                'error': 'Duplicate entity in request'})
+                continue
+            
+            analysis = update.get('analysis') or {}
+            completed = bool(update.get('completed', False))
+            seen[entity_name] = completed
+            chunk.append({
+                'entity_name': entity_name,
+                'analysis': analysis,
+                'completed': completed,
+                'important_count': count_important_articles(analysis)
+            })
+            if len(chunk) == 100:
+                yield from with_previous_flags(chunk)
+                chunk = []
+        if chunk:
+            yield from with_previous_flags(chunk)
+    
+    result = batch_put_items(table_name, items(), max_workers=max_workers)
+    failed = {failure['entity']: failure['error'] for failure in result['failed_entities']}
+    
+    created_count = completed_change = 0
+    for name, completed in seen.items():
+        if name in failed:
+            continue
+        was_completed = previous.get(name)
+        if was_completed is None:
+            created_count += 1
+        completed_change += int(completed) - int(bool(was_completed))
+    
+    errors = [{'entity_name': name, 'status': 'failed', 'error': error} for name, error in failed.items()]
+    errors.extend(invalid)
+    
+    return {
+        "updated_count": result['written'],
+        "failed_count": len(failed),
+        "invalid_count": len(invalid),
+        "created_count": created_count,
+        "completed_change": completed_change,
+        "errors": errors
+    }
+
+def history_partition_key(parent_entity: str, entity_name: str) -> str:
+    """Get the ArticleHistory partition key (parent#entity) for an entity"""
+    return f"{parent_entity}#{entity_name}"
+
+def compact_article_record(article: dict) -> dict:
+    """
+    Reduce an analyzed article to the compact record kept in ArticleHistory.
+    
+    Args:
+        article (dict): Article with 'url' and 'analysis' keys, as stored by the worker
+        
+    Returns:
+        dict: url_hash, sentiment, important and cluster_id for the article
+    """
+    analysis = article.get('analysis', {})
+    url_hash = hashlib.sha1(article.get('url', '').encode('utf-8')).hexdigest()[:16]
+    return {
+        'url_hash': url_hash,
+        'sentiment': str(analysis.get('sentiment', 'unknown')).lower(),
+        'important': bool(analysis.get('important', False)),
+        # Articles that were not clustered form a cluster of their own
+        'cluster_id': article.get('cluster_id') or url_hash
+    }
+
+def record_article_history(parent_entity: str, entity_name: str, articles: list, run_timestamp: datetime = None):
+    """
+    Append one run's compact article records for an entity to ArticleHistory.
+    
+    Args:
+        parent_entity (str): Name of the parent entity (e.g., "Stanford")
+        entity_name (str): Entity the articles were found for
+        articles (list): Analyzed articles as stored in the entity's analysis
+        run_timestamp (datetime, optional): UTC time of the run. Defaults to now.
+        
+    Returns:
+        dict: The history item that was written
+    """
+    if run_timestamp is None:
+        run_timestamp = datetime.utcnow()
+    
+    records = [compact_article_record(article) for article in articles]
+    item = {
+        'entity_key': history_partition_key(parent_entity, entity_name),
+        'run_ts': run_timestamp.strftime(HISTORY_TIMESTAMP_FORMAT),
+        'articles': records,
+        'article_count': len(records),
+        'important_count': sum(1 for record in records if record['important']),
+        'expires_at': calendar.timegm((run_timestamp + timedelta(days=ARTICLE_HISTORY_TTL_DAYS)).utctimetuple())
+    }
+    
+    # Append-only: never overwrite an existing run
+    get_table(ARTICLE_HISTORY_TABLE).put_item(
+        Item=item,
+        ConditionExpression='attribute_not_exists(entity_key)'
+    )
+    return item
+
+def get_article_history(parent_entity: str, entity_name: str, days: int = 7) -> list:
+    """
+    Get an entity's history runs from the last N days, newest first.
+    
+    Reads a single partition with a key condition on the run timestamp; no scan.
+    
+    Args:
+        parent_entity (str): Name of the parent entity (e.g., "Stanford")
+        entity_name (str): Entity to get history for
+        days (int, optional): Number of days to look back. Defaults to 7.
+        
+    Returns:
+        list: History items with run_ts, articles, article_count and important_count
+    """
+    table = get_table(ARTICLE_HISTORY_TABLE)
+    cutoff = (datetime.utcnow() - timedelta(days=days)).strftime(HISTORY_TIMESTAMP_FORMAT)
+    query_kwargs = {
+        'KeyConditionExpression': Key('entity_key').eq(history_partition_key(parent_entity, entity_name)) & Key('run_ts').gte(cutoff),
+        'ScanIndexForward': False
+    }
+    
+    response = table.query(**query_kwargs)
+    items = response['Items']
+    
+    # Handle pagination
+    while 'LastEvaluatedKey' in response:
+        response = table.query(ExclusiveStartKey=response['LastEvaluatedKey'], **query_kwargs)
+        items.extend(response['Items'])
+    
+    return items
+
+def claim_processed_email(message_id: str, details: dict = None) -> bool:
+    """
+    Claim an inbound email for processing in the ProcessedEmails ledger.
+    
+    The conditional write succeeds only for the first delivery of a Message-ID (or when an
+    earlier claim was abandoned mid-processing), so redelivered notifications can be skipped.
+    
+    Args:
+        message_id (str): The email's Message-ID (or another stable delivery key)
+        details (dict, optional): Extra attributes to store, e.g. the S3 location
+        
+    Returns:
+        bool: True if this caller should process the email, False if it is a duplicate
+    """
+    now = datetime.utcnow()
+    item = dict(details or {})
+    item.update({
+        'message_id': message_id,
+        'status': 'processing',
+        'claimed_at': calendar.timegm(now.utctimetuple()),
+        'expires_at': calendar.timegm((now + timedelta(days=PROCESSED_EMAIL_TTL_DAYS)).utctimetuple())
+    })
+    
+    table = get_table(PROCESSED_EMAILS_TABLE)
+    try:
+        table.put_item(
+            Item=item,
+            ConditionExpression='attribute_not_exists(message_id) OR (#status = :processing AND claimed_at < :stale)',
+            ExpressionAttributeNames={'#status': 'status'},
+            ExpressionAttributeValues={
+                ':processing': 'processing',
+                ':stale': item['claimed_at'] - PROCESSED_EMAIL_CLAIM_TIMEOUT
+            }
+        )
+        return True
+    except table.meta.client.exceptions.ConditionalCheckFailedException:
+        return False
+
+def complete_processed_email(message_id: str, status_code: int):
+    """Mark a claimed email as processed, keeping the response status for auditing"""
+    get_table(PROCESSED_EMAILS_TABLE).update_item(
+        Key={'message_id': message_id},
+        UpdateExpression='SET #status = :done, status_code = :status_code',
+        ExpressionAttributeNames={'#status': 'status'},
+        ExpressionAttributeValues={':done': 'done', ':status_code': status_code}
+    )
+
+def release_processed_email(message_id: str):
+    """Drop a claim after a failure so a redelivery can process the email again"""
+    get_table(PROCESSED_EMAILS_TABLE).delete_item(Key={'message_id': message_id})
+
+def start_run_status(parent_entity: str, total_entities: int, completed_entities: int = 0, run_id: str = None) -> str:
+    """
+    Start a new run record for a parent entity, replacing the previous run's counters.
+    
+    Args:
+        parent_entity (str): Name of the parent entity (e.g., "Stanford")
+        total_entities (int): Entities in the table when the run started
+        completed_entities (int, optional): Entities already completed before dispatch
+        run_id (str, optional): Run identifier. Defaults to a new timestamped ID.
+        
+    Returns:
+        str: The run ID that workers report progress against
+    """
+    now = datetime.utcnow()
+    if run_id is None:
+        run_id = f"{now.strftime('%Y%m%dT%H%M%SZ')}-{uuid.uuid4().hex[:8]}"
+    
+    get_table(RUN_STATUS_TABLE).put_item(
+        Item={
+            'parent_entity': parent_entity,
+            'run_id': run_id,
+            'started_at': now.strftime(HISTORY_TIMESTAMP_FORMAT),
+            'updated_at': now.strftime(HISTORY_TIMESTAMP_FORMAT),
+            'total_entities': total_entities,
+            'completed_entities': completed_entities,
+            'dispatched': 0,
+            'failed': 0,
+            'latency_buckets': {}
         }
     )
+    return run_id
+
+def adjust_run_totals(parent_entity: str, total: int = 0, completed: int = 0) -> bool:
+    """
+    Atomically add to the current run's entity totals after entities were changed outside a run.
+    
+    Used when entities are added, deleted, imported or bulk-updated, so checkCompleted stays
+    right without recounting the table. Unlike record_run_progress this applies to whichever
+    run is current. Nothing is written before the first run; checkCompleted counts the table then.
+    
+    Args:
+        parent_entity (str): Name of the parent entity (e.g., "Stanford")
+        total (int, optional): Change in total_entities
+        completed (int, optional): Change in completed_entities
+        
+    Returns:
+        bool: True if the totals were adjusted, False if there was nothing to adjust
+    """
+    if not total and not completed:
+        return False
+    
+    table = get_table(RUN_STATUS_TABLE)
+    try:
+        table.update_item(
+            Key={'parent_entity': parent_entity},
+            UpdateExpression='ADD total_entities :total, completed_entities :completed SET updated_at = :now',
+            ConditionExpression='attribute_exists(parent_entity)',
+            ExpressionAttributeValues={
+                ':total': total,
+                ':completed': completed,
+                ':now': datetime.utcnow().strftime(HISTORY_TIMESTAMP_FORMAT)
+            }
+        )
+        return True
+    except table.meta.client.exceptions.ConditionalCheckFailedException:
+        return False
+
+def latency_bucket(latency_ms: float) -> str:
+    """Name of the RUN_LATENCY_BUCKETS_MS bucket a worker latency falls in"""
+    for bound in RUN_LATENCY_BUCKETS_MS:
+        if latency_ms <= bound:
+            return str(bound)
+    return 'inf'
+
+def record_run_progress(parent_entity: str, run_id: str, dispatched: int = 0, completed: int = 0, failed: int = 0,
+                        stats: dict = None) -> bool:
+    """
+    Atomically add to the current run's counters.
+    
+    The write is conditional on run_id, so a late worker from an earlier run cannot
+    change the counters of the current one.
+    
+    Args:
+        stats (dict, optional): A worker's RUN_STAT_COUNTERS, latency_ms and queue_delay_ms
+            for the run summary
+        
+    Returns:
+        bool: True if the counters were updated, False if run_id is not the current run
+    """
+    table = get_table(RUN_STATUS_TABLE)
+    adds = ['dispatched :dispatched', 'completed_entities :completed', 'failed :failed']
+    sets = ['updated_at = :now']
+    names = {}
+    values = {
+        ':dispatched': dispatched,
+        ':completed': completed,
+        ':failed': failed,
+        ':now': datetime.utcnow().strftime(HISTORY_TIMESTAMP_FORMAT),
+        ':run_id': run_id
+    }
+    
+    if stats:
+        for counter in RUN_STAT_COUNTERS:
+            if stats.get(counter):
+                adds.append(f"{counter} :{counter}")
+                values[f":{counter}"] = int(stats[counter])
+        if stats.get('latency_ms') is not None:
+            adds.extend(['latency_total_ms :latency_ms', 'latency_count :one'])
+            sets.append('latency_buckets.#bucket = if_not_exists(latency_buckets.#bucket, :zero) + :one')
+            names['#bucket'] = latency_bucket(stats['latency_ms'])
+            values.update({':latency_ms': int(round(stats['latency_ms'])), ':one': 1, ':zero': 0})
+        if stats.get('queue_delay_ms') is not None:
+            adds.extend(['queue_delay_total_ms :queue_delay_ms', 'queue_delay_count :one'])
+            values.update({':queue_delay_ms': int(round(stats['queue_delay_ms'])), ':one': 1})
+    
+    update_kwargs = {'ExpressionAttributeNames': names} if names else {}
+    try:
+        table.update_item(
+            Key={'parent_entity': parent_entity},
+            UpdateExpression=f"ADD {', '.join(adds)} SET {', '.join(sets)}",
+            ConditionExpression='run_id = :run_id',
+            ExpressionAttributeValues=values,
+            **update_kwargs
+        )
+        return True
+    except table.meta.client.exceptions.ConditionalCheckFailedException:
+        return False
+
+def get_run_status(parent_entity: str) -> dict:
+    """
+    Get the current run record for a parent entity with a single GetItem.
+    
+    Returns:
+        dict: Run record with int counters, or None if no run has started yet
+    """
+    item = get_table(RUN_STATUS_TABLE).get_item(Key={'parent_entity': parent_entity}).get('Item')
+    if item is None:
+        return None
+    for counter in ('total_entities', 'completed_entities', 'dispatched', 'failed', 'latency_total_ms', 'latency_count',
+                    'queue_delay_total_ms', 'queue_delay_count') + RUN_STAT_COUNTERS:
+        item[counter] = int(item.get(counter, 0))
+    item['latency_buckets'] = {bucket: int(count) for bucket, count in (item.get('latency_buckets') or {}).items()}
+    return item
+
+def _latency_percentile(buckets: dict, fraction: float):
+    """Upper bound (ms) of the bucket holding the given fraction of latencies, or None without samples"""
+    samples = sum(buckets.values())
+    if not samples:
+        return None
+    seen = 0
+    for bound in RUN_LATENCY_BUCKETS_MS:
+        seen += buckets.get(str(bound), 0)
+        if seen >= fraction * samples:
+            return bound
+    # Slower than the last bound; report the last bound as a floor
+    return RUN_LATENCY_BUCKETS_MS[-1]
+
+def summarize_run(run: dict) -> dict:
+    """
+    Derive a run summary from a run record (see get_run_status).
+    
+    Latency percentiles are the upper bounds of RUN_LATENCY_BUCKETS_MS buckets, and
+    the cost is an estimate from token and search counts at the configured prices.
+    
+    Returns:
+        dict: Entity counts, articles, tokens, estimated_cost_usd, latency p50/p95/mean,
+        mean queueing delay (dispatch to worker start) and the run's time span
+    """
+    started_at = datetime.strptime(run['started_at'], HISTORY_TIMESTAMP_FORMAT)
+    updated_at = datetime.strptime(run.get('updated_at', run['started_at']), HISTORY_TIMESTAMP_FORMAT)
+    estimated_cost = (run['prompt_tokens'] * OPENAI_PROMPT_USD_PER_MTOK / 1e6
+                      + run['completion_tokens'] * OPENAI_COMPLETION_USD_PER_MTOK / 1e6
+                      + run['searches'] * CSE_USD_PER_QUERY)
+    
+    return {
+        'parent_entity': run['parent_entity'],
+        'run_id': run['run_id'],
+        'started_at': run['started_at'],
+        'updated_at': run.get('updated_at', run['started_at']),
+        'duration_seconds': int((updated_at - started_at).total_seconds()),
+        'entities_total': run['total_entities'],
+        'entities_dispatched': run['dispatched'],
+        'entities_processed': run['latency_count'],
+        'entities_completed': run['completed_entities'],
+        'entities_failed': run['failed'],
+        'articles_analyzed': run['articles'],
+        'important_articles': run['important_articles'],
+        'searches': run['searches'],
+        'llm_calls': run['llm_calls'],
+        'prompt_tokens': run['prompt_tokens'],
+        'completion_tokens': run['completion_tokens'],
+        'total_tokens': run['prompt_tokens'] + run['completion_tokens'],
+        'estimated_cost_usd': round(estimated_cost, 4),
+        'latency_p50_ms': _latency_percentile(run['latency_buckets'], 0.50),
+        'latency_p95_ms': _latency_percentile(run['latency_buckets'], 0.95),
+        'latency_mean_ms': round(run['latency_total_ms'] / run['latency_count']) if run['latency_count'] else None,
+        'queue_delay_mean_ms': round(run['queue_delay_total_ms'] / run['queue_delay_count']) if run['queue_delay_count'] else None
+    }
+
+def finalize_run_summary(parent_entity: str, run_id: str = None) -> dict:
+    """
+    Store the summary of a parent entity's current run in RUN_SUMMARIES_TABLE.
+    
+    Finalizing again (e.g. after late workers) overwrites the stored summary.
+    
+    Args:
+        parent_entity (str): Name of the parent entity (e.g., "Stanford")
+        run_id (str, optional): Only finalize if this is still the current run
+        
+    Returns:
+        dict: The summary with finalized_at, or None if there is no (matching) run
+    """
+    run = get_run_status(parent_entity)
+    if run is None or (run_id and run['run_id'] != run_id):
+        return None
+    
+    now = datetime.utcnow()
+    summary = summarize_run(run)
+    summary['finalized_at'] = now.strftime(HISTORY_TIMESTAMP_FORMAT)
+    
+    item = {key: Decimal(str(value)) if isinstance(value, float) else value
+            for key, value in summary.items() if value is not None}
+    item['expires_at'] = calendar.timegm((now + timedelta(days=RUN_SUMMARY_TTL_DAYS)).utctimetuple())
+    get_table(RUN_SUMMARIES_TABLE).put_item(Item=item)
+    return summary
+
+def _plain_number(value):
+    """Decimal from DynamoDB as int or float"""
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    return value
+
+def get_run_summaries(parent_entity: str, limit: int = 7) -> list:
+    """
+    Get a parent entity's most recent finalized run summaries, newest first.
+    
+    Run IDs start with the run's UTC start time, so sort order is chronological.
+    """
+    response = get_table(RUN_SUMMARIES_TABLE).query(
+        KeyConditionExpression=Key('parent_entity').eq(parent_entity),
+        ScanIndexForward=False,
+        Limit=limit
+    )
+    return [
+        {key: _plain_number(value) for key, value in item.items() if key != 'expires_at'}
+        for item in response['Items']
+    ]
+
+def reconcile_run_status(parent_entity: str) -> dict:
+    """
+    Recount the tracking table and correct the run counters.
+    
+    Scans only the completed flag. Use after entities were added, deleted or cleared
+    outside a run, or to check the counters against the table.
+    
+    Returns:
+        dict: {"total_entities", "completed_entities", "previous": counters before reconciling}
+    """
+    total = completed = 0
+    for item in iter_entity_items(parent_entity, attributes=['completed']):
+        total += 1
+        if item.get('completed', False):
+            completed += 1
+    
+    previous = get_run_status(parent_entity)
+    if previous is None:
+        start_run_status(parent_entity, total, completed)
+    else:
+        get_table(RUN_STATUS_TABLE).update_item(
+            Key={'parent_entity': parent_entity},
+            UpdateExpression='SET total_entities = :total, completed_entities = :completed, updated_at = :now',
+            ExpressionAttributeValues={
+                ':total': total,
+                ':completed': completed,
+                ':now': datetime.utcnow().strftime(HISTORY_TIMESTAMP_FORMAT)
+            }
+        )
+    
+    return {
+        "total_entities": total,
+        "completed_entities": completed,
+        "previous": {
+            "total_entities": previous['total_entities'],
+            "completed_entities": previous['completed_entities']
+        } if previous else None
+    }
 
 def get_email_list_table():
     """Get email list table"""
@@ -170,29 +1052,235 @@ def setup_email_list_table(parent_entity: str, initial_emails: list):
     table = get_email_list_table()
     
     try:
-        table.put_item(
-            Item={
-                'parent_entity': parent_entity,
-                'email_list': initial_emails
-            }
+        # Update only the email list so tenant settings stored on the item are preserved
+        table.update_item(
+            Key={'parent_entity': parent_entity},
+            UpdateExpression="SET email_list = :email_list",
+            ExpressionAttributeValues={':email_list': initial_emails}
         )
         return True
     except Exception as e:
         print(f"Error setting up email list: {str(e)}")
         return False
+    finally:
+        invalidate_email_list_cache(parent_entity)
 
-def get_email_list(parent_entity: str, default_email: str = None) -> list:
-    """Get email list for parent entity"""
+def queue_pending_entities(parent_entity: str, entities) -> int:
+    """
+    Queue entity names on the parent's EmailList item until its tracking table is active.
+    
+    Names are kept in a string set, so re-queued names are stored once. Empty names are
+    dropped, since a string set cannot hold them.
+    
+    Returns:
+        int: Number of names queued
+    """
+    table = get_email_list_table()
+    entities = [entity for entity in entities if entity]
+    try:
+        for start in range(0, len(entities), PENDING_ENTITIES_CHUNK):
+            table.update_item(
+                Key={'parent_entity': parent_entity},
+                UpdateExpression='ADD pending_entities :entities',
+                ExpressionAttributeValues={':entities': set(entities[start:start + PENDING_ENTITIES_CHUNK])}
+            )
+    finally:
+        invalidate_email_list_cache(parent_entity)
+    return len(entities)
+
+def get_pending_entities(parent_entity: str) -> list:
+    """Get the entity names queued for a parent entity (read consistently, not from the cache)"""
+    response = get_email_list_table().get_item(
+        Key={'parent_entity': parent_entity},
+        ProjectionExpression='pending_entities',
+        ConsistentRead=True
+    )
+    return sorted(response.get('Item', {}).get('pending_entities', set()))
+
+def flush_pending_entities(parent_entity: str) -> dict:
+    """
+    Add queued entity names to the now-active tracking table and remove them from the queue.
+    
+    Entities that already exist keep their analysis. Names that fail to write stay queued.
+    
+    Returns:
+        dict: {"added_count", "existing_count", "failed_entities"} for the flushed names
+    """
+    pending = get_pending_entities(parent_entity)
+    if not pending:
+        return {"added_count": 0, "existing_count": 0, "failed_entities": []}
+    
+    result = bulk_add_entities(parent_entity, pending, only_if_absent=True)
+    failed = {failure['entity'] for failure in result['failed_entities']}
+    flushed = [entity for entity in pending if entity not in failed]
+    
     table = get_email_list_table()
+    try:
+        for start in range(0, len(flushed), PENDING_ENTITIES_CHUNK):
+            table.update_item(
+                Key={'parent_entity': parent_entity},
+                UpdateExpression='DELETE pending_entities :entities',
+                ExpressionAttributeValues={':entities': set(flushed[start:start + PENDING_ENTITIES_CHUNK])}
+            )
+    finally:
+        invalidate_email_list_cache(parent_entity)
+    
+    print(f"📥 Flushed {len(flushed)} queued entities into {parent_entity}_TrackedEntities")
+    return result
+
+def ensure_table_ready(parent_entity: str) -> str:
+    """
+    Get the tracking table's status, flushing queued adds the first time it is seen ACTIVE.
+    
+    Returns:
+        str: The table status (e.g. CREATING, ACTIVE), or None if the table does not exist
+    """
+    if _active_parents.get(parent_entity):
+        return 'ACTIVE'
+    
+    status = get_table_status(f"{parent_entity}_TrackedEntities")
+    if status == 'ACTIVE':
+        result = flush_pending_entities(parent_entity)
+        if not result['failed_entities']:
+            _active_parents.set(parent_entity, True)
+    return status
+
+def add_or_queue_entities(parent_entity: str, entities: list, analysis: dict = None, completed: bool = False,
+                          only_if_absent: bool = False) -> dict:
+    """
+    Add entities, or queue them while the tracking table is still being provisioned.
+    
+    Queued entities are added later without analysis, as not completed.
+    
+    Returns:
+        dict: add_entities_to_table's result, plus queued_entities (empty unless queued)
+        
+    Raises:
+        Exception: If the tracking table does not exist
+    """
+    status = ensure_table_ready(parent_entity)
+    if status is None:
+        raise Exception(f"Table {parent_entity}_TrackedEntities does not exist")
+    
+    if status == 'CREATING':
+        queue_pending_entities(parent_entity, entities)
+        print(f"⏳ {parent_entity}_TrackedEntities is still being created; queued {len(entities)} entities")
+        result = {"added_entities": [], "failed_entities": [], "created_count": 0, "completed_change": 0,
+                  "queued_entities": list(entities)}
+        if only_if_absent:
+            result["existing_entities"] = []
+        return result
+    
+    result = add_entities_to_table(parent_entity, entities, analysis, completed, only_if_absent=only_if_absent)
+    result["queued_entities"] = []
+    return result
+
+def bulk_add_or_queue_entities(parent_entity: str, entities, only_if_absent: bool = False) -> dict:
+    """
+    Bulk-add entities, or queue them while the tracking table is still being provisioned.
+    
+    Returns:
+        dict: bulk_add_entities' result, plus queued_count
+        
+    Raises:
+        Exception: If the tracking table does not exist
+    """
+    status = ensure_table_ready(parent_entity)
+    if status is None:
+        raise Exception(f"Table {parent_entity}_TrackedEntities does not exist")
+    
+    if status == 'CREATING':
+        queued = queue_pending_entities(parent_entity, entities)
+        print(f"⏳ {parent_entity}_TrackedEntities is still being created; queued {queued} entities")
+        return {"added_count": 0, "existing_count": 0, "failed_entities": [], "queued_count": queued}
+    
+    result = bulk_add_entities(parent_entity, entities, only_if_absent=only_if_absent)
+    result["queued_count"] = 0
+    return result
+
+def get_email_list_item(parent_entity: str) -> dict:
+    """
+    Get the EmailList item for a parent entity, served from the in-process cache when warm.
     
+    Missing items are cached as an empty dict so repeated lookups stay off the network.
+    
+    Raises:
+        Exception: If the DynamoDB lookup fails
+    """
+    item = _email_list_cache.get(parent_entity)
+    if item is not None:
+        return item
+    
+    response = get_email_list_table().get_item(Key={'parent_entity': parent_entity})
+    item = response.get('Item', {})
+    _email_list_cache.set(parent_entity, item)
+    return item
+
+def get_email_list(parent_entity: str, default_email: str = None) -> list:
+    """Get email list for parent entity"""
     try:
-        response = table.get_item(Key={'parent_entity': parent_entity})
-        if 'Item' in response:
-            return response['Item']['email_list']
+        item = get_email_list_item(parent_entity)
+        if 'email_list' in item:
+            return item['email_list']
         elif default_email:
             return [default_email]
         else:
             return []
     except Exception as e:
         print(f"Error getting email list: {str(e)}")
-        return [default_email] if default_email else [] 
\ No newline at end of file
+        return [default_email] if default_email else []
+
+def get_tenant_settings(parent_entity: str) -> dict:
+    """Get per-tenant settings stored on the parent entity's EmailList item"""
+    try:
+        return get_email_list_item(parent_entity).get('settings', {})
+    except Exception as e:
+        print(f"Error getting tenant settings: {str(e)}")
+        return {}
+
+def find_parent_entity_for_sender(sender_email: str):
+    """
+    Find which parent entity a sender email belongs to.
+    
+    The first call scans EmailList once and caches a sender -> parent index (and every
+    item it saw), so warm lookups need no network round trip until the TTL expires.
+    
+    Returns:
+        str: Parent entity name, or None if the sender is not on any email list
+        
+    Raises:
+        Exception: If the DynamoDB scan fails
+    """
+    sender_index = _email_list_cache.get(_SENDER_INDEX_KEY)
+    if sender_index is None:
+        # Concurrent lookups in one container share a single scan
+        with _sender_index_lock:
+            sender_index = _email_list_cache.get(_SENDER_INDEX_KEY)
+            if sender_index is None:
+                table = get_email_list_table()
+                response = table.scan()
+                items = response['Items']
+                
+                # Handle pagination
+                while 'LastEvaluatedKey' in response:
+                    response = table.scan(ExclusiveStartKey=response['LastEvaluatedKey'])
+                    items.extend(response['Items'])
+                
+                sender_index = {}
+                for item in items:
+                    _email_list_cache.set(item['parent_entity'], item)
+                    for email_address in item.get('email_list', []):
+                        # Keep the first match, same as a linear search over the scan
+                        sender_index.setdefault(email_address, item['parent_entity'])
+                _email_list_cache.set(_SENDER_INDEX_KEY, sender_index)
+    
+    return sender_index.get(sender_email)
+
+def invalidate_email_list_cache(parent_entity: str = None):
+    """Invalidate cached EmailList data for one parent entity (or all) and the sender index"""
+    _email_list_cache.invalidate(parent_entity)
+    _email_list_cache.invalidate(_SENDER_INDEX_KEY)
+
+def get_email_list_cache_stats() -> dict:
+    """Get hit/miss statistics for the EmailList cache"""
+    return _email_list_cache.stats()
\ No newline at end of file
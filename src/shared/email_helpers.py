@@ -1,51 +1,202 @@
 import boto3
 import os
+import io
+import re
+import html
+import json
+import hashlib
+import functools
+import gzip
+import time
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from botocore.config import Config
+import email.policy
+from email.utils import formataddr, getaddresses
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from datetime import datetime
-from .utils import load_credentials
+from .utils import load_credentials, TokenBucket, TTLCache
+
+# Inline report budget, measured on the encoded email; sections beyond it go only to the hosted full report
+REPORT_INLINE_MAX_BYTES = int(os.environ.get('REPORT_INLINE_MAX_BYTES', str(100 * 1024)))
+
+# Where full reports are stored when the inline digest is truncated
+REPORT_BUCKET = os.environ.get('REPORT_BUCKET')
+REPORT_BASE_URL = os.environ.get('REPORT_BASE_URL')
+REPORT_LINK_EXPIRY_SECONDS = int(os.environ.get('REPORT_LINK_EXPIRY_SECONDS', str(7 * 24 * 3600)))
+
+# Rendered per-entity report fragments, shared by all recipient views in a warm container
+REPORT_FRAGMENT_CACHE_SIZE = int(os.environ.get('REPORT_FRAGMENT_CACHE_SIZE', '4096'))
+_fragment_cache = TTLCache(maxsize=REPORT_FRAGMENT_CACHE_SIZE, ttl=3600)
+
+# Report delivery: recipient used when a tenant has no email list, parallelism and retries
+DEFAULT_REPORT_RECIPIENT = os.environ.get('REPORT_DEFAULT_RECIPIENT', 'neilpendyala@gmail.com')
+REPORT_SEND_CONCURRENCY = int(os.environ.get('REPORT_SEND_CONCURRENCY', '8'))
+REPORT_SEND_RETRIES = int(os.environ.get('REPORT_SEND_RETRIES', '3'))
+REPORT_SENDER = "reports@gargoylescope.com"
+
+# Append the nightly run summary (entities, articles, tokens, cost, latency) to report emails
+REPORT_RUN_SUMMARY = os.environ.get('REPORT_RUN_SUMMARY', 'false').lower() in ('1', 'true', 'yes')
+
+# SES errors worth retrying; anything else (e.g. MessageRejected) fails the recipient immediately
+_RETRYABLE_SES_ERRORS = {'Throttling', 'ThrottlingException', 'ServiceUnavailable', 'InternalFailure', 'RequestTimeout'}
+
+@functools.lru_cache(maxsize=4)
+def _pooled_ses_client(region: str):
+    # Thread-safe client reused across invocations, sized for parallel report delivery
+    return boto3.client('ses', region_name=region, config=Config(max_pool_connections=max(REPORT_SEND_CONCURRENCY, 10)))
 
 def get_ses_client():
-    """Get SES client with credentials"""
+    """Get SES client with credentials (pooled per container)"""
     credentials = load_credentials()
-    return boto3.client('ses', region_name=credentials.get('REGION', 'us-west-1'))
+    return _pooled_ses_client(credentials.get('REGION', 'us-west-1'))
 
-def send_email_report(html_content: str, subject: str = "News Alert", recipient: str = "neilpendyala@gmail.com"):
-    """Send HTML report via SES"""
-    try:
-        # Check content size
-        content_size_kb = len(html_content.encode('utf-8')) / 1024
-        if content_size_kb > 100:
-            print(f"⚠️ Warning: Email content is {content_size_kb:.1f}KB (recommended max is 100KB)")
-            if content_size_kb > 9500:  # Leave some room for headers
-                raise Exception(f"Email content too large: {content_size_kb:.1f}KB (max 10MB)")
-        
-        # Create SES client
-        ses = get_ses_client()
-        
-        # Create message container
-        msg = MIMEMultipart('alternative')
-        msg['Subject'] = subject
-        msg['From'] = "reports@gargoylescope.com"
+def get_s3_client():
+    """Get S3 client with credentials"""
+    credentials = load_credentials()
+    return boto3.client('s3', region_name=credentials.get('REGION', 'us-west-1'))
+
+def build_report_message(html_content: str, subject: str, recipient: str = None, sender: str = REPORT_SENDER) -> bytes:
+    """
+    Build the report MIME message and serialize it exactly once.
+    
+    With recipient None the To header is left out so the same bytes can be
+    addressed to many recipients with with_recipient().
+    """
+    msg = MIMEMultipart('alternative')
+    msg['Subject'] = subject
+    msg['From'] = sender
+    if recipient:
         msg['To'] = recipient
+    # Always base64 so the encoded size follows from the HTML size (see encoded_report_bytes)
+    msg.attach(MIMEText(html_content, 'html', 'utf-8'))
+    return msg.as_bytes()
+
+def encoded_report_bytes(html_bytes: int) -> int:
+    """
+    Upper bound on the size of the message build_report_message() makes from html_bytes of HTML.
+    
+    The body is base64 in 76-character lines (57 input bytes per 77 output bytes), plus
+    room for headers, MIME boundaries and the per-recipient To line.
+    """
+    return -(-html_bytes // 57) * 77 + _MESSAGE_OVERHEAD_BYTES
+
+def format_recipient(recipient: str) -> str:
+    """
+    Format one recipient as an ASCII To header value.
+    
+    Display names are RFC 2047 encoded and domains IDNA encoded.
+    
+    Raises:
+        Exception: If the recipient contains CR or LF (header injection), is not a single
+        address or has a non-ASCII local part
+    """
+    if '\r' in recipient or '\n' in recipient:
+        raise Exception(f"Invalid recipient (line break): {recipient!r}")
+    addresses = getaddresses([recipient])
+    if len(addresses) != 1 or addresses[0][1].count('@') != 1:
+        raise Exception(f"Invalid recipient: {recipient!r}")
+    name, address = addresses[0]
+    local, domain = address.split('@')
+    if not local or not domain or not local.isascii():
+        raise Exception(f"Invalid recipient: {recipient!r}")
+    return formataddr((name, f"{local}@{domain.encode('idna').decode('ascii')}"), charset='utf-8')
+
+def with_recipient(raw_message: bytes, recipient: str) -> bytes:
+    """
+    Address a pre-built message by adding its To header.
+    
+    The header is formatted and folded by the email package (see format_recipient), so a
+    recipient cannot add headers or put raw non-ASCII bytes in one. SES delivers to the
+    Destinations of the send, not to this header.
+    
+    Raises:
+        Exception: If the recipient is not a single valid address
+    """
+    return email.policy.default.fold('To', format_recipient(recipient)).encode('ascii') + raw_message
+
+def get_max_send_rate(ses) -> float:
+    """Get the account's SES MaxSendRate (messages per second), falling back to SES_MAX_SEND_RATE"""
+    try:
+        return float(ses.get_send_quota()['MaxSendRate'])
+    except Exception as e:
+        print(f"⚠️ Could not read SES send quota, using SES_MAX_SEND_RATE: {str(e)}")
+        return float(os.environ.get('SES_MAX_SEND_RATE', '1'))
+
+def _send_to_recipient(ses, raw_message: bytes, recipient: str, bucket: TokenBucket) -> dict:
+    """Send one addressed copy with rate limiting and retries on throttling/transient errors"""
+    attempt = 0
+    while True:
+        attempt += 1
+        bucket.acquire()
+        try:
+            response = ses.send_raw_email(
+                Source=REPORT_SENDER,
+                Destinations=[recipient],
+                RawMessage={'Data': with_recipient(raw_message, recipient)}
+            )
+            return {'recipient': recipient, 'status': 'sent', 'message_id': response['MessageId'], 'attempts': attempt}
+        except Exception as e:
+            error_code = getattr(e, 'response', {}).get('Error', {}).get('Code')
+            if error_code not in _RETRYABLE_SES_ERRORS or attempt > REPORT_SEND_RETRIES:
+                return {'recipient': recipient, 'status': 'failed', 'error': str(e), 'attempts': attempt}
+            time.sleep(min(2 ** (attempt - 1), 10) * 0.5)
+
+def deliver_report(html_content: str, subject: str, recipients: list, max_workers: int = None) -> dict:
+    """
+    Render-once, send-many report delivery.
+    
+    The MIME message is built once; each recipient gets the same bytes with their own
+    To header, sent in parallel through the pooled SES client. A token bucket keeps
+    the combined rate under the account's SES MaxSendRate, and each recipient is
+    retried independently.
+    
+    Args:
+        html_content (str): Rendered report HTML
+        subject (str): Email subject
+        recipients (list): Recipient addresses (duplicates are sent once)
+        max_workers (int, optional): Parallel sends. Defaults to REPORT_SEND_CONCURRENCY.
         
-        # Add HTML content
-        html_part = MIMEText(html_content, 'html')
-        msg.attach(html_part)
-        
-        # Check final message size
-        message_size_kb = len(msg.as_string().encode('utf-8')) / 1024
-        print(f"📧 Final email size: {message_size_kb:.1f}KB")
-        
-        # Send email
-        response = ses.send_raw_email(
-            Source=msg['From'],
-            Destinations=[recipient],
-            RawMessage={'Data': msg.as_string()}
-        )
-        
-        print(f"✅ Email sent! Message ID: {response['MessageId']}")
-        return True
+    Returns:
+        dict: Delivery summary with sent/failed counts and per-recipient results
+    """
+    recipients = list(dict.fromkeys(r.strip() for r in recipients if r and r.strip()))
+    if not recipients:
+        return {'sent': 0, 'failed': 0, 'message_size_kb': 0, 'results': []}
+    
+    raw_message = build_report_message(html_content, subject)
+    message_size_kb = len(raw_message) / 1024
+    print(f"📧 Final email size: {message_size_kb:.1f}KB")
+    if message_size_kb > REPORT_INLINE_MAX_BYTES / 1024:
+        print(f"⚠️ Warning: Email is {message_size_kb:.1f}KB (inline budget is {REPORT_INLINE_MAX_BYTES / 1024:.0f}KB)")
+    if message_size_kb > 9500:  # SES raw message limit is 10MB
+        raise Exception(f"Email too large: {message_size_kb:.1f}KB (max 10MB)")
+    
+    ses = get_ses_client()
+    bucket = TokenBucket(get_max_send_rate(ses))
+    workers = min(max_workers or REPORT_SEND_CONCURRENCY, len(recipients))
+    
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(lambda recipient: _send_to_recipient(ses, raw_message, recipient, bucket), recipients))
+    
+    summary = {
+        'sent': sum(1 for result in results if result['status'] == 'sent'),
+        'failed': sum(1 for result in results if result['status'] == 'failed'),
+        'message_size_kb': round(message_size_kb, 1),
+        'results': results
+    }
+    print(f"✅ Report delivered to {summary['sent']}/{len(recipients)} recipients")
+    for result in results:
+        if result['status'] == 'failed':
+            print(f"❌ Failed to send report to {result['recipient']}: {result['error']}")
+    return summary
+
+def send_email_report(html_content: str, subject: str = "News Alert", recipient: str = DEFAULT_REPORT_RECIPIENT):
+    """Send HTML report via SES"""
+    try:
+        summary = deliver_report(html_content, subject, [recipient])
+        return summary['sent'] == 1
         
     except Exception as e:
         print(f"❌ Error sending email: {str(e)}")
@@ -94,12 +245,30 @@ def send_error_notification(error_message: str, recipient: str = "neilpendyala@g
     except Exception as e:
         print(f"Failed to send error notification: {str(e)}")
 
-def send_confirmation_email(sender: str, original_message, add_results: dict = None, delete_results: dict = None):
-    """Send confirmation email about added/deleted entities"""
+def send_confirmation_email(sender: str, original_message, add_results: dict = None, delete_results: dict = None,
+                            import_summary: dict = None):
+    """Send confirmation email about added/deleted entities and bulk imports"""
     try:
         # Create message content
         message = ""
         
+        # Handle bulk imports: counts only, not every entity
+        if import_summary:
+            message += f"Imported {import_summary['added_count']} entities from {', '.join(map(str, import_summary['files']))}\n"
+            message += f"• Rows read: {import_summary['rows']}\n"
+            message += f"• Duplicates ignored: {import_summary['duplicates']}\n"
+            if import_summary.get('queued_count'):
+                message += f"• Queued until your table is ready: {import_summary['queued_count']}\n"
+            if import_summary.get('existing_count'):
+                message += f"• Already tracked, left unchanged: {import_summary['existing_count']}\n"
+            if import_summary.get('skipped'):
+                message += f"• Over the import limit, not added: {import_summary['skipped']}\n"
+            if import_summary.get('failed_count'):
+                message += f"• Failed: {import_summary['failed_count']}\n"
+                for failure in import_summary.get('failed_entities', []):
+                    message += f"  - {failure['entity']}\n"
+            message += "\n"
+        
         # Handle additions
         if add_results and add_results.get('added_entities'):
             entities = sorted(add_results['added_entities'])  # Sort alphabetically
@@ -107,6 +276,22 @@ def send_confirmation_email(sender: str, original_message, add_results: dict = N
             for entity in entities:
                 message += f"• {entity}\n"
             message += "\n"
+        
+        # Handle entities queued while the table is being created
+        if add_results and add_results.get('queued_entities'):
+            entities = sorted(add_results['queued_entities'])
+            message += f"Queued {len(entities)} entities until your table is ready:\n"
+            for entity in entities:
+                message += f"• {entity}\n"
+            message += "\n"
+        
+        # Handle entities that were already tracked
+        if add_results and add_results.get('existing_entities'):
+            entities = sorted(add_results['existing_entities'])
+            message += f"Already tracking {len(entities)} entities:\n"
+            for entity in entities:
+                message += f"• {entity}\n"
+            message += "\n"
             
         # Handle deletions
         if delete_results and delete_results.get('deleted_entities'):
@@ -177,75 +362,444 @@ def send_list_email(sender: str, original_message, entities: list):
     except Exception as e:
         print(f"Error sending list email: {str(e)}")
 
-def generate_html_report(entities_with_analysis, template_path: str = '../../web/templates/email_preview.html'):
-    """Generate HTML report from analyzed entities, focusing on important articles"""
-    try:
-        # Read email template
-        with open(template_path, 'r') as f:
-            template = f.read()
-            
-        all_analyses_html = ""
-        important_found = False
-        
-        # Process each entity
-        for entity in entities_with_analysis:
-            entity_name = entity['entity_name']
-            analysis_data = entity.get('analysis', {})
-            articles = analysis_data.get('articles', [])
-            
-            # Filter for important articles
-            important_articles = [
-                article for article in articles 
-                if article['analysis'].get('important', False)
-            ]
-            
-            # Skip entity if no important articles
-            if not important_articles:
-                continue
-                
-            important_found = True
-            
-            # Create entity section
-            all_analyses_html += f"""
+# Placeholder in the report template that entity sections are streamed into
+REPORT_PLACEHOLDER = '{{article_content}}'
+
+# Template locations: explicit override, Lambda image (/var/task), then the repo layout
+_REPORT_TEMPLATE_CANDIDATES = [
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'email_preview.html'),
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'web', 'templates', 'email_preview.html')
+]
+
+_NO_UPDATES_SECTION = """
             <tr>
                 <td style="padding: 20px;">
                     <div class="entity-box">
-                        <h2>{entity_name}</h2>
+                        <h2>No Important Updates</h2>
+                        <p>No significant news or updates were found for any tracked entities.</p>
+                    </div>
+                </td>
+            </tr>
             """
-            
-            # Add each important article
-            for article in important_articles:
-                all_analyses_html += f"""
+
+# Only the sentiment spans the analysis prompt asks for survive escaping of highlighted_text
+_ALLOWED_SPAN_OPEN = re.compile(r'&lt;span class=(?:&quot;|&#x27;)(positive|negative)(?:&quot;|&#x27;)&gt;')
+_ALLOWED_SPAN_CLOSE = '&lt;/span&gt;'
+
+def resolve_report_template_path(template_path: str = None) -> str:
+    """Resolve the report template path from the argument, REPORT_TEMPLATE_PATH, or known locations"""
+    if template_path:
+        return template_path
+    if os.environ.get('REPORT_TEMPLATE_PATH'):
+        return os.environ['REPORT_TEMPLATE_PATH']
+    for candidate in _REPORT_TEMPLATE_CANDIDATES:
+        if os.path.exists(candidate):
+            return os.path.normpath(candidate)
+    raise FileNotFoundError("Report template email_preview.html not found")
+
+@functools.lru_cache(maxsize=8)
+def _load_split_template(template_path: str) -> tuple:
+    with open(template_path, 'r') as f:
+        template = f.read()
+    
+    if REPORT_PLACEHOLDER not in template:
+        raise ValueError(f"Report template {template_path} has no {REPORT_PLACEHOLDER} placeholder")
+    
+    head, tail = template.split(REPORT_PLACEHOLDER, 1)
+    return head, tail
+
+def load_report_template(template_path: str = None) -> tuple:
+    """
+    Load the report template once per container and pre-split it around the placeholder.
+    
+    Returns:
+        tuple: (head, tail) strings surrounding {{article_content}}
+    """
+    return _load_split_template(resolve_report_template_path(template_path))
+
+def _safe_url(url: str) -> str:
+    """Escape a link target, dropping anything that is not http(s)"""
+    url = str(url or '').strip()
+    if not url.lower().startswith(('http://', 'https://')):
+        return '#'
+    return html.escape(url, quote=True)
+
+def _sanitize_highlighted_text(text: str) -> str:
+    """Escape LLM-produced highlighted text but keep its positive/negative sentiment spans"""
+    escaped = html.escape(str(text or ''), quote=True)
+    escaped = _ALLOWED_SPAN_OPEN.sub(r'<span class="\1">', escaped)
+    return escaped.replace(_ALLOWED_SPAN_CLOSE, '</span>')
+
+def get_important_articles(entity: dict) -> list:
+    """Get the articles flagged important in an entity's analysis"""
+    articles = entity.get('analysis', {}).get('articles', [])
+    return [
+        article for article in articles
+        if article.get('analysis', {}).get('important', False)
+    ]
+
+def render_entity_section(entity_name: str, important_articles: list) -> str:
+    """Render one entity's report section, escaping all article data"""
+    parts = [f"""
+            <tr>
+                <td style="padding: 20px;">
+                    <div class="entity-box">
+                        <h2>{html.escape(str(entity_name))}</h2>
+            """]
+    
+    for article in important_articles:
+        analysis = article.get('analysis', {})
+        parts.append(f"""
                 <div class="article-box">
-                    <h3><a href="{article['url']}">{article['title']}</a></h3>
-                    <p><strong>Summary:</strong> {article['analysis']['summary']}</p>
-                    <p><strong>Sentiment:</strong> {article['analysis']['sentiment']}</p>
-                    <div class="snippet">{article['analysis']['highlighted_text']}</div>
+                    <h3><a href="{_safe_url(article.get('url'))}">{html.escape(str(article.get('title', '')))}</a></h3>
+                    <p><strong>Summary:</strong> {html.escape(str(analysis.get('summary', '')))}</p>
+                    <p><strong>Sentiment:</strong> {html.escape(str(analysis.get('sentiment', '')))}</p>
+                    <div class="snippet">{_sanitize_highlighted_text(analysis.get('highlighted_text', ''))}</div>
                 </div>
-                """
-            
-            all_analyses_html += """
+                """)
+    
+    parts.append("""
                     </div>
                 </td>
             </tr>
-            """
+            """)
+    return ''.join(parts)
+
+def iter_report_sections(entities_with_analysis):
+    """
+    Yield (entity_name, important_article_count, section_html) for each entity with important articles.
+    
+    Consumes entities lazily, so any iterable (including a generator over DynamoDB pages) works.
+    """
+    for entity in entities_with_analysis:
+        important_articles = get_important_articles(entity)
         
-        if not important_found:
-            all_analyses_html = """
+        # Skip entity if no important articles
+        if not important_articles:
+            continue
+        
+        yield entity['entity_name'], len(important_articles), render_entity_section(entity['entity_name'], important_articles)
+
+def render_overflow_section(entities_omitted: int, articles_omitted: int, full_report_url: str = None) -> str:
+    """Render the notice for entities that did not fit in the inline digest"""
+    if full_report_url:
+        action = f'<a href="{_safe_url(full_report_url)}">View the full report</a>'
+    else:
+        action = "They are not included in this email."
+    return f"""
             <tr>
                 <td style="padding: 20px;">
                     <div class="entity-box">
-                        <h2>No Important Updates</h2>
-                        <p>No significant news or updates were found for any tracked entities.</p>
+                        <h2>{entities_omitted} More Entities</h2>
+                        <p>{articles_omitted} more important articles did not fit in this email. {action}</p>
                     </div>
                 </td>
             </tr>
             """
+
+def render_run_summary_section(summary: dict) -> str:
+    """Render a run summary (see shared.database.summarize_run) as a report section"""
+    def value(key, suffix=''):
+        return html.escape(f"{summary[key]}{suffix}") if summary.get(key) is not None else 'n/a'
+    
+    rows = [
+        ('Entities', f"{value('entities_processed')} processed of {value('entities_total')}, {value('entities_failed')} failed"),
+        ('Articles', f"{value('articles_analyzed')} analyzed, {value('important_articles')} important"),
+        ('Tokens', f"{value('total_tokens')} ({value('llm_calls')} model calls)"),
+        ('Estimated cost', f"${value('estimated_cost_usd')}"),
+        ('Worker latency', f"p50 &le; {value('latency_p50_ms', ' ms')}, p95 &le; {value('latency_p95_ms', ' ms')}")
+    ]
+    items = ''.join(f"<li><strong>{label}:</strong> {text}</li>" for label, text in rows)
+    return f"""
+            <tr>
+                <td style="padding: 20px;">
+                    <div class="entity-box">
+                        <h2>Run Summary</h2>
+                        <ul>{items}</ul>
+                    </div>
+                </td>
+            </tr>
+            """
+
+def append_report_section(report_html: str, section: str, template_path: str = None) -> str:
+    """Insert a section after the last entity section of a rendered report"""
+    _, tail = load_report_template(template_path)
+    if not report_html.endswith(tail):
+        return report_html + section
+    return report_html[:len(report_html) - len(tail)] + section + tail
+
+# Room kept in the encoded message for headers, MIME boundaries and the To line
+_MESSAGE_OVERHEAD_BYTES = 2048
+
+# Room kept in the inline budget for the overflow notice
+_OVERFLOW_RESERVE_BYTES = len(render_overflow_section(10 ** 9, 10 ** 9, 'https://' + 'x' * 2048).encode('utf-8'))
+
+# Unfiltered report view: every entity, every sentiment
+DEFAULT_REPORT_VIEW = (None, None)
+
+class _ReportWriter:
+    """Writes one report into out, inlining sections until the encoded email would exceed an optional byte budget"""
+
+    def __init__(self, out, head: str, tail: str, max_bytes: int = None):
+        self.out = out
+        self.tail = tail
+        self.max_bytes = max_bytes
+        self.inline_bytes = len(head.encode('utf-8'))
+        self.fixed_bytes = len(tail.encode('utf-8')) + _OVERFLOW_RESERVE_BYTES
+        self.entities_rendered = 0
+        self.important_articles = 0
+        self.entities_omitted = 0
+        self.articles_omitted = 0
+        out.write(head)
+
+    def add(self, section: str, article_count: int):
+        self.entities_rendered += 1
+        self.important_articles += article_count
+        
+        if self.max_bytes is None:
+            self.out.write(section)
+            return
+        if not self.entities_omitted:
+            section_bytes = len(section.encode('utf-8'))
+            if encoded_report_bytes(self.inline_bytes + section_bytes + self.fixed_bytes) <= self.max_bytes:
+                self.inline_bytes += section_bytes
+                self.out.write(section)
+                return
+        
+        # Over budget: keep order stable and summarize everything from here on
+        self.entities_omitted += 1
+        self.articles_omitted += article_count
+
+    def finish(self, full_report_url: str = None) -> dict:
+        if not self.entities_rendered:
+            self.out.write(_NO_UPDATES_SECTION)
+        if self.entities_omitted:
+            self.out.write(render_overflow_section(self.entities_omitted, self.articles_omitted, full_report_url))
+        self.out.write(self.tail)
+        
+        return {
+            'entities_rendered': self.entities_rendered,
+            'important_articles': self.important_articles,
+            'entities_inline': self.entities_rendered - self.entities_omitted,
+            'entities_omitted': self.entities_omitted,
+            'truncated': bool(self.entities_omitted)
+        }
+
+def write_html_report(entities_with_analysis, out, template_path: str = None, full_out=None,
+                      max_bytes: int = None, full_report_url: str = None) -> dict:
+    """
+    Stream the HTML report into a writable text buffer or file.
+    
+    With max_bytes set, sections are written to out until the inline budget is used up;
+    the rest are counted and summarized with a link to full_report_url. Every section
+    is always written to full_out, so one pass produces both the digest and the full report.
+    
+    Args:
+        entities_with_analysis: Iterable of entities with 'entity_name' and 'analysis'
+        out: Object with a write(str) method (file, StringIO, ...)
+        template_path (str, optional): Template override, see resolve_report_template_path
+        full_out (optional): Writer that receives the complete, untruncated report
+        max_bytes (int, optional): Budget for the encoded email built from out. Defaults to no limit.
+        full_report_url (str, optional): Link to the full report for the overflow notice
+        
+    Returns:
+        dict: Counts of entities and important articles rendered, inlined and omitted
+    """
+    head, tail = load_report_template(template_path)
+    digest = _ReportWriter(out, head, tail, max_bytes)
+    full = _ReportWriter(full_out, head, tail) if full_out is not None else None
+    
+    for _, article_count, section in iter_report_sections(entities_with_analysis):
+        digest.add(section, article_count)
+        if full is not None:
+            full.add(section, article_count)
+    
+    if full is not None:
+        full.finish()
+    return digest.finish(full_report_url)
+
+def normalize_report_view(view: dict = None) -> tuple:
+    """
+    Turn a recipient view setting into a hashable view key.
+    
+    Args:
+        view (dict, optional): {'entities': [...], 'sentiments': [...]}; missing keys mean "all"
+        
+    Returns:
+        tuple: (entities, sentiments) as sorted tuples of upper-cased names / lower-cased
+        sentiments, with None for "all". DEFAULT_REPORT_VIEW when view is empty.
+    """
+    if not view:
+        return DEFAULT_REPORT_VIEW
+    entities = view.get('entities')
+    sentiments = view.get('sentiments')
+    return (
+        tuple(sorted({str(entity).strip().upper() for entity in entities})) if entities else None,
+        tuple(sorted({str(sentiment).strip().lower() for sentiment in sentiments})) if sentiments else None
+    )
+
+def _analysis_digest(important_articles: list) -> str:
+    """Stable digest of an entity's important articles, used as the fragment cache key"""
+    payload = json.dumps(important_articles, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+def get_entity_fragment(entity_name: str, important_articles: list, digest: str, sentiments: tuple = None) -> tuple:
+    """
+    Get an entity's rendered section for a sentiment filter from the fragment cache.
+    
+    Fragments are keyed by (entity, analysis digest, sentiment filter), so any number of
+    recipient views that need the same section share one render.
+    
+    Returns:
+        tuple: (section_html, article_count); ('', 0) when the filter leaves no articles
+    """
+    key = (entity_name, digest, sentiments)
+    fragment = _fragment_cache.get(key)
+    if fragment is not None:
+        return fragment
+    
+    if sentiments is None:
+        articles = important_articles
+    else:
+        articles = [
+            article for article in important_articles
+            if str(article.get('analysis', {}).get('sentiment', '')).strip().lower() in sentiments
+        ]
+    fragment = (render_entity_section(entity_name, articles), len(articles)) if articles else ('', 0)
+    _fragment_cache.set(key, fragment)
+    return fragment
+
+def write_report_views(entities_with_analysis, outs: dict, template_path: str = None, full_out=None,
+                       max_bytes: int = None, full_report_url: str = None) -> dict:
+    """
+    Stream one pass over entities into several personalized reports.
+    
+    Each entity's important articles are digested once; every view then pulls its section
+    from the fragment cache, so N views cost one render per distinct section plus N
+    concatenations.
+    
+    Args:
+        entities_with_analysis: Iterable of entities with 'entity_name' and 'analysis'
+        outs (dict): View key (see normalize_report_view) -> writer
+        template_path (str, optional): Template override
+        full_out (optional): Writer that receives the complete, unfiltered report
+        max_bytes (int, optional): Budget for each view's encoded email. Defaults to no limit.
+        full_report_url (str, optional): Link to the full report for overflow notices
+        
+    Returns:
+        dict: View key -> render stats; the unfiltered totals are under None
+    """
+    head, tail = load_report_template(template_path)
+    writers = {view: _ReportWriter(out, head, tail, max_bytes) for view, out in outs.items()}
+    full = _ReportWriter(full_out if full_out is not None else _NullWriter(), head, tail)
+    
+    for entity in entities_with_analysis:
+        important_articles = get_important_articles(entity)
+        if not important_articles:
+            continue
+        
+        entity_name = entity['entity_name']
+        digest = _analysis_digest(important_articles)
+        section, article_count = get_entity_fragment(entity_name, important_articles, digest)
+        full.add(section, article_count)
         
-        # Replace template placeholders
-        html = template.replace('{{article_content}}', all_analyses_html)
-        return html
+        for (entities, sentiments), writer in writers.items():
+            if entities is not None and str(entity_name).strip().upper() not in entities:
+                continue
+            view_section, view_count = get_entity_fragment(entity_name, important_articles, digest, sentiments)
+            if view_count:
+                writer.add(view_section, view_count)
+    
+    stats = {view: writer.finish(full_report_url) for view, writer in writers.items()}
+    stats[None] = full.finish()
+    return stats
+
+class _NullWriter:
+    """Writer that discards output"""
+
+    def write(self, text):
+        pass
+
+def get_full_report_url(report_key: str) -> str:
+    """Get the link to a hosted full report: REPORT_BASE_URL if set, else a presigned S3 URL"""
+    if REPORT_BASE_URL:
+        return f"{REPORT_BASE_URL.rstrip('/')}/{report_key}"
+    return get_s3_client().generate_presigned_url(
+        'get_object',
+        Params={'Bucket': REPORT_BUCKET, 'Key': report_key},
+        ExpiresIn=REPORT_LINK_EXPIRY_SECONDS
+    )
+
+def render_report_digests(entities_with_analysis, views, report_key: str = None, max_bytes: int = None,
+                          template_path: str = None) -> tuple:
+    """
+    Render size-capped inline digests for several views and, if any overflows, host the
+    full report on S3.
+    
+    The full report is gzip-compressed to a temp file while rendering and uploaded to
+    REPORT_BUCKET under report_key only when a digest was truncated.
+    
+    Args:
+        entities_with_analysis: Iterable of entities with 'entity_name' and 'analysis'
+        views: Iterable of view keys (see normalize_report_view)
+        report_key (str, optional): S3 key for the full report (e.g. reports/Stanford/....html.gz)
+        max_bytes (int, optional): Encoded email budget per digest. Defaults to REPORT_INLINE_MAX_BYTES.
+        template_path (str, optional): Template override
+        
+    Returns:
+        tuple: ({view: (inline_html, view_stats)}, stats) where stats are the unfiltered
+        totals and include full_report_url when the full report was uploaded
+    """
+    if max_bytes is None:
+        max_bytes = REPORT_INLINE_MAX_BYTES
+    
+    outs = {view: io.StringIO() for view in set(views)}
+    
+    def collect(view_stats):
+        stats = view_stats.pop(None)
+        stats['truncated'] = any(s['truncated'] for s in view_stats.values())
+        return {view: (outs[view].getvalue(), view_stats[view]) for view in outs}, stats
+    
+    if not (REPORT_BUCKET and report_key):
+        return collect(write_report_views(entities_with_analysis, outs, template_path, max_bytes=max_bytes))
+    
+    # Presigning needs no network call, so the link can go in the digests before upload
+    full_report_url = get_full_report_url(report_key)
+    with tempfile.TemporaryFile() as full_file:
+        with gzip.open(full_file, 'wt', encoding='utf-8') as full_out:
+            digests, stats = collect(write_report_views(entities_with_analysis, outs, template_path, full_out=full_out,
+                                                        max_bytes=max_bytes, full_report_url=full_report_url))
+        
+        if stats['truncated']:
+            full_file.seek(0)
+            get_s3_client().upload_fileobj(
+                full_file, REPORT_BUCKET, report_key,
+                ExtraArgs={'ContentType': 'text/html; charset=utf-8', 'ContentEncoding': 'gzip'}
+            )
+            stats['full_report_url'] = full_report_url
+            print(f"📦 Full report uploaded to s3://{REPORT_BUCKET}/{report_key}")
+    
+    return digests, stats
+
+def render_report_digest(entities_with_analysis, report_key: str = None, max_bytes: int = None, template_path: str = None) -> tuple:
+    """
+    Render the size-capped inline digest and, if it overflows, host the full report on S3.
+    
+    Returns:
+        tuple: (inline_html, stats) where stats includes full_report_url when uploaded
+    """
+    digests, stats = render_report_digests(entities_with_analysis, [DEFAULT_REPORT_VIEW], report_key, max_bytes, template_path)
+    inline_html, view_stats = digests[DEFAULT_REPORT_VIEW]
+    view_stats.update({key: value for key, value in stats.items() if key == 'full_report_url'})
+    return inline_html, view_stats
+
+def generate_html_report(entities_with_analysis, template_path: str = None):
+    """Generate HTML report from analyzed entities, focusing on important articles"""
+    try:
+        buffer = io.StringIO()
+        write_html_report(entities_with_analysis, buffer, template_path)
+        return buffer.getvalue()
         
     except Exception as e:
         print(f"Error generating HTML report: {str(e)}")
-        raise 
\ No newline at end of file
+        raise
\ No newline at end of file
@@ -0,0 +1,159 @@
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+# Stage timings as CloudWatch Embedded Metric Format (EMF) log lines
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+METRICS_NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'GargoyleScope')
+FUNCTION_NAME = os.environ.get('AWS_LAMBDA_FUNCTION_NAME', 'local')
+
+# (records, thread id or None for all threads) pairs for active collect() blocks;
+# recording is on while any exist
+_collectors = []
+_collectors_lock = threading.Lock()
+
+class _NullStage:
+    """Stand-in returned by stage() while metrics are off, so instrumented code costs one check"""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def add(self, name: str, value, unit: str = 'Count'):
+        pass
+
+    def set(self, **properties):
+        pass
+
+_NULL_STAGE = _NullStage()
+
+class Stage:
+    """
+    Times one stage of work and emits it as a metric record on exit.
+
+    Metrics added with add() are summed and emitted with the stage's Duration
+    (and Errors = 1 if the block raised). Properties are searchable context
+    (entity, parent_entity, ...) that is not a metric dimension.
+    """
+    def __init__(self, name: str, properties: dict):
+        self.name = name
+        self.properties = properties
+        self.metrics = {}
+        self.units = {}
+        self._start = None
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.add('Duration', (time.perf_counter() - self._start) * 1000, 'Milliseconds')
+        if exc_type is not None:
+            self.add('Errors', 1)
+        emit(self.name, self.metrics, self.units, self.properties)
+        return False
+
+    def add(self, name: str, value, unit: str = 'Count'):
+        """Add to a metric of this stage (e.g. tokens, consumed capacity)"""
+        if value is None:
+            return
+        self.metrics[name] = self.metrics.get(name, 0) + value
+        self.units[name] = unit
+
+    def set(self, **properties):
+        """Attach properties to this stage's record"""
+        self.properties.update(properties)
+
+def enabled() -> bool:
+    """Whether stages are being recorded (METRICS_ENABLED, or a collect() block is active)"""
+    return METRICS_ENABLED or bool(_collectors)
+
+def stage(name: str, **properties):
+    """
+    Time a block of work as a named stage.
+
+    Usage:
+        with metrics.stage('llm', entity=entity) as llm:
+            response = client.chat.completions.create(...)
+            llm.add('PromptTokens', response.usage.prompt_tokens)
+
+    Returns a no-op stage when metrics are off.
+    """
+    if not enabled():
+        return _NULL_STAGE
+    return Stage(name, properties)
+
+def build_record(stage_name: str, values: dict, units: dict = None, properties: dict = None) -> dict:
+    """Build an EMF record for one stage, with Function and Stage as dimensions"""
+    units = units or {}
+    record = {
+        '_aws': {
+            'Timestamp': int(time.time() * 1000),
+            'CloudWatchMetrics': [{
+                'Namespace': METRICS_NAMESPACE,
+                'Dimensions': [['Function', 'Stage']],
+                'Metrics': [{'Name': name, 'Unit': units.get(name, 'Count')} for name in values]
+            }]
+        },
+        'Function': FUNCTION_NAME,
+        'Stage': stage_name
+    }
+    record.update(properties or {})
+    record.update(values)
+    return record
+
+def emit(stage_name: str, values: dict, units: dict = None, properties: dict = None):
+    """Send a stage record to active collectors, and to stdout (CloudWatch Logs) when enabled"""
+    if not enabled():
+        return
+    record = build_record(stage_name, values, units, properties)
+    thread_id = threading.get_ident()
+    with _collectors_lock:
+        for records, collector_thread in _collectors:
+            if collector_thread is None or collector_thread == thread_id:
+                records.append(record)
+    if METRICS_ENABLED:
+        print(json.dumps(record, default=str))
+
+@contextmanager
+def collect(all_threads: bool = False):
+    """
+    Capture the metric records emitted by this thread while the block runs.
+
+    Recording is switched on for the duration even if METRICS_ENABLED is off, so
+    tests and callers that summarize an invocation don't depend on configuration.
+
+    Args:
+        all_threads (bool, optional): Capture records from every thread in the process.
+            Off by default so concurrent invocations in one process (tests, the
+            pipeline emulator) each see only their own stages.
+    """
+    records = []
+    collector = (records, None if all_threads else threading.get_ident())
+    with _collectors_lock:
+        _collectors.append(collector)
+    try:
+        yield records
+    finally:
+        with _collectors_lock:
+            # By identity: another collector's list may compare equal to this one
+            _collectors[:] = [active for active in _collectors if active is not collector]
+
+def aggregate(records: list) -> dict:
+    """
+    Sum metric records by stage.
+
+    Returns:
+        dict: {stage: {"count": records, metric: total, ...}}
+    """
+    totals = {}
+    for record in records:
+        names = [metric['Name'] for directive in record['_aws']['CloudWatchMetrics'] for metric in directive['Metrics']]
+        stage_totals = totals.setdefault(record['Stage'], {'count': 0})
+        stage_totals['count'] += 1
+        for name in names:
+            stage_totals[name] = stage_totals.get(name, 0) + record.get(name, 0)
+    return totals
\ No newline at end of file
@@ -0,0 +1,154 @@
+import os
+import io
+import json
+import time
+import random
+import functools
+from datetime import datetime
+
+# Sampled per-invocation profiles (cProfile + tracemalloc) for finding slow handlers in production
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', '0'))
+PROFILE_BUCKET = os.environ.get('PROFILE_BUCKET')
+PROFILE_PREFIX = os.environ.get('PROFILE_PREFIX', 'profiles')
+PROFILE_DIR = os.environ.get('PROFILE_DIR', '/tmp/profiles')
+PROFILE_MEMORY = os.environ.get('PROFILE_MEMORY', 'true').lower() in ('1', 'true', 'yes')
+PROFILE_TOP_N = int(os.environ.get('PROFILE_TOP_N', '25'))
+FUNCTION_NAME = os.environ.get('AWS_LAMBDA_FUNCTION_NAME', 'local')
+
+def should_profile(event) -> bool:
+    """
+    Whether to profile this invocation.
+
+    A truthy `profile` flag in the event always profiles, `"profile": false` never
+    does; otherwise invocations are sampled at PROFILE_SAMPLE_RATE.
+    """
+    flag = event.get('profile') if isinstance(event, dict) else None
+    if flag is not None:
+        return flag is True or str(flag).lower() in ('1', 'true', 'yes')
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+def top_functions(stats, limit: int = PROFILE_TOP_N) -> list:
+    """The functions with the most cumulative time in a pstats.Stats"""
+    rows = []
+    for (filename, line, name), (_, calls, own, cumulative, _) in stats.stats.items():
+        rows.append({
+            'function': f"{filename}:{line}({name})",
+            'calls': calls,
+            'own_ms': round(own * 1000, 3),
+            'cumulative_ms': round(cumulative * 1000, 3)
+        })
+    rows.sort(key=lambda row: row['cumulative_ms'], reverse=True)
+    return rows[:limit]
+
+def top_allocations(snapshot, limit: int = PROFILE_TOP_N) -> list:
+    """The source lines holding the most memory in a tracemalloc snapshot"""
+    return [
+        {
+            'location': f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+            'size_kb': round(stat.size / 1024, 1),
+            'count': stat.count
+        }
+        for stat in snapshot.statistics('lineno')[:limit]
+    ]
+
+def write_profile(name: str, files: dict) -> str:
+    """
+    Write profile files to s3://PROFILE_BUCKET/PROFILE_PREFIX/, or to PROFILE_DIR without a bucket.
+
+    Args:
+        name (str): Path below the prefix or directory, without extension
+        files (dict): {extension: bytes}
+
+    Returns:
+        str: Location of the files, without extension
+    """
+    if PROFILE_BUCKET:
+        from .email_helpers import get_s3_client
+        s3 = get_s3_client()
+        key = f"{PROFILE_PREFIX.rstrip('/')}/{name}"
+        for extension, body in files.items():
+            s3.put_object(Bucket=PROFILE_BUCKET, Key=f"{key}.{extension}", Body=body)
+        return f"s3://{PROFILE_BUCKET}/{key}"
+
+    path = os.path.join(PROFILE_DIR, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    for extension, body in files.items():
+        with open(f"{path}.{extension}", 'wb') as f:
+            f.write(body)
+    return path
+
+def profile_call(handler, event, context, name: str = None):
+    """
+    Run a handler under cProfile (and tracemalloc if PROFILE_MEMORY) and write the results.
+
+    Writes `<name>.pstats` (cProfile, for pstats/snakeviz/flameprof) and `<name>.json`
+    with the duration, the top functions by cumulative time, peak traced memory and
+    the top allocations still held when the handler returns (what a warm container keeps).
+    Failing to write the profile never fails the invocation.
+
+    Returns:
+        The handler's return value
+    """
+    import cProfile
+    import pstats
+    import tracemalloc
+
+    request_id = getattr(context, 'aws_request_id', None) or f"{int(time.time() * 1000)}"
+    name = name or f"{FUNCTION_NAME}/{datetime.utcnow().strftime('%Y-%m-%d')}/{request_id}"
+    trace_memory = PROFILE_MEMORY and not tracemalloc.is_tracing()
+    if trace_memory:
+        tracemalloc.start()
+    profiler = cProfile.Profile()
+    start = time.perf_counter()
+
+    profiler.enable()
+    try:
+        return handler(event, context)
+    finally:
+        profiler.disable()
+        duration_ms = (time.perf_counter() - start) * 1000
+        snapshot = tracemalloc.take_snapshot() if trace_memory else None
+        peak_kb = tracemalloc.get_traced_memory()[1] / 1024 if trace_memory else None
+        if trace_memory:
+            tracemalloc.stop()
+
+        try:
+            stats = pstats.Stats(profiler, stream=io.StringIO())
+            summary = {
+                'function': FUNCTION_NAME,
+                'request_id': request_id,
+                'duration_ms': round(duration_ms, 1),
+                'peak_traced_memory_kb': round(peak_kb, 1) if peak_kb is not None else None,
+                'top_functions': top_functions(stats),
+                'top_allocations': top_allocations(snapshot) if snapshot else []
+            }
+            location = write_profile(name, {
+                'pstats': _dump_stats(stats),
+                'json': json.dumps(summary, indent=2).encode('utf-8')
+            })
+            print(f"🔬 Profile of {request_id} ({duration_ms:.0f} ms) written to {location}.pstats")
+        except Exception as e:
+            print(f"⚠️ Failed to write profile: {str(e)}")
+
+def _dump_stats(stats) -> bytes:
+    """pstats.Stats in the marshal format read by pstats.Stats(path)"""
+    import marshal
+    return marshal.dumps(stats.stats)
+
+def profiled(handler):
+    """
+    Decorate a Lambda handler so sampled or flagged invocations are profiled.
+
+    Usage:
+        @profiling.profiled
+        def lambda_handler(event, context):
+            ...
+
+    Unprofiled invocations only pay for should_profile().
+    """
+    @functools.wraps(handler)
+    def wrapper(event, context):
+        if should_profile(event):
+            return profile_call(handler, event, context)
+        return handler(event, context)
+    return wrapper
\ No newline at end of file
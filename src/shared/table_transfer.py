@@ -0,0 +1,277 @@
+import os
+import io
+import json
+import gzip
+import tempfile
+import threading
+from decimal import Decimal
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from .database import get_table, get_table_status, batch_put_items
+from .email_helpers import get_s3_client
+
+# Export/import of {parent}_TrackedEntities to S3 as gzip-compressed NDJSON parts
+EXPORT_BUCKET = os.environ.get('EXPORT_BUCKET')
+EXPORT_SEGMENTS = int(os.environ.get('EXPORT_SEGMENTS', '4'))
+EXPORT_CHUNK_ITEMS = int(os.environ.get('EXPORT_CHUNK_ITEMS', '5000'))
+IMPORT_CONCURRENCY = int(os.environ.get('IMPORT_CONCURRENCY', '4'))
+# Stop starting new chunks when less than this share of the invocation's time is left, at most
+# TRANSFER_TIME_MARGIN_MS, so short timeouts still leave time for work; re-invoke to resume
+TRANSFER_TIME_MARGIN_FRACTION = float(os.environ.get('TRANSFER_TIME_MARGIN_FRACTION', '0.25'))
+TRANSFER_TIME_MARGIN_MS = int(os.environ.get('TRANSFER_TIME_MARGIN_MS', '30000'))
+
+MANIFEST_NAME = 'manifest.json'
+
+def _json_default(value):
+    """Serialize DynamoDB types that json does not handle"""
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, set):
+        return sorted(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def _load_json(s3, bucket: str, key: str):
+    """Read a small JSON object from S3, or None if it does not exist"""
+    try:
+        return json.loads(s3.get_object(Bucket=bucket, Key=key)['Body'].read())
+    except s3.exceptions.NoSuchKey:
+        return None
+
+def _save_json(s3, bucket: str, key: str, data: dict):
+    """Write a small JSON object to S3"""
+    s3.put_object(Bucket=bucket, Key=key, Body=json.dumps(data, default=_json_default).encode('utf-8'),
+                  ContentType='application/json')
+
+def _deadline(context):
+    """
+    Get a callable that says whether the invocation is close to its timeout.
+    
+    The margin is TRANSFER_TIME_MARGIN_FRACTION of the time left when the transfer starts,
+    capped at TRANSFER_TIME_MARGIN_MS.
+    """
+    if context is None or not hasattr(context, 'get_remaining_time_in_millis'):
+        return lambda: False
+    margin_ms = min(TRANSFER_TIME_MARGIN_MS, context.get_remaining_time_in_millis() * TRANSFER_TIME_MARGIN_FRACTION)
+    return lambda: context.get_remaining_time_in_millis() < margin_ms
+
+def _export_segment(s3, table, bucket: str, prefix: str, manifest: dict, state: dict, chunk_items: int,
+                    out_of_time, checkpoint):
+    """Scan one segment into NDJSON parts, checkpointing the scan position after each part"""
+    scan_kwargs = {'Segment': state['segment'], 'TotalSegments': manifest['total_segments']}
+
+    while not state['done'] and not out_of_time():
+        last_key = state['last_key']
+        count = 0
+        part_key = f"{prefix}/segment-{state['segment']:03d}/part-{len(state['parts']):05d}.ndjson.gz"
+
+        # A part is at most chunk_items items (one or more scan pages), spooled compressed to /tmp rather than held in memory
+        with tempfile.TemporaryFile() as part_file:
+            with gzip.GzipFile(fileobj=part_file, mode='wb') as gz:
+                while count < chunk_items:
+                    if last_key:
+                        scan_kwargs['ExclusiveStartKey'] = last_key
+                    response = table.scan(Limit=chunk_items - count, **scan_kwargs)
+                    for item in response['Items']:
+                        gz.write(json.dumps(item, default=_json_default).encode('utf-8') + b'\n')
+                    count += len(response['Items'])
+                    last_key = response.get('LastEvaluatedKey')
+                    if last_key is None:
+                        break
+
+            if count:
+                part_file.seek(0)
+                s3.upload_fileobj(part_file, bucket, part_key, ExtraArgs={'ContentType': 'application/x-ndjson',
+                                                                         'ContentEncoding': 'gzip'})
+
+        with checkpoint['lock']:
+            if count:
+                state['parts'].append(part_key)
+                state['items'] += count
+            state['last_key'] = last_key
+            state['done'] = last_key is None
+            checkpoint['save']()
+
+def export_table(parent_entity: str, bucket: str = None, prefix: str = None, segments: int = None,
+                 chunk_items: int = None, context=None) -> dict:
+    """
+    Export a tracking table to S3 as gzip-compressed NDJSON parts, one item per line.
+
+    Segments are scanned in parallel and each writes its own parts of about chunk_items
+    items, so memory is bounded by one scan page per segment. After each part the scan
+    position is checkpointed in {prefix}/manifest.json; calling again with the same prefix
+    resumes where the previous invocation stopped (e.g. when close to the Lambda timeout).
+
+    Args:
+        parent_entity (str): Name of the parent entity (e.g., "Stanford")
+        bucket (str, optional): Destination bucket. Defaults to EXPORT_BUCKET.
+        prefix (str, optional): Destination prefix. Defaults to exports/{parent}/{UTC time}.
+        segments (int, optional): Parallel scan segments. Defaults to EXPORT_SEGMENTS.
+        chunk_items (int, optional): Items per part. Defaults to EXPORT_CHUNK_ITEMS.
+        context (optional): Lambda context, used to stop before the timeout
+
+    Returns:
+        dict: The manifest: bucket, prefix, item_count, complete and per-segment parts
+
+    Raises:
+        Exception: If no bucket is configured or the table doesn't exist
+    """
+    bucket = bucket or EXPORT_BUCKET
+    if not bucket:
+        raise Exception("An S3 bucket is required for export (set EXPORT_BUCKET or pass 'bucket')")
+    if prefix is None:
+        prefix = f"exports/{parent_entity}/{datetime.utcnow().strftime('%Y-%m-%dT%H%M%SZ')}"
+    prefix = prefix.rstrip('/')
+
+    s3 = get_s3_client()
+    table_name = f"{parent_entity}_TrackedEntities"
+    manifest_key = f"{prefix}/{MANIFEST_NAME}"
+
+    manifest = _load_json(s3, bucket, manifest_key)
+    if manifest is None:
+        total_segments = segments or EXPORT_SEGMENTS
+        manifest = {
+            'parent_entity': parent_entity,
+            'table_name': table_name,
+            'bucket': bucket,
+            'prefix': prefix,
+            'started_at': datetime.utcnow().isoformat(),
+            'total_segments': total_segments,
+            'segments': [
+                {'segment': segment, 'parts': [], 'items': 0, 'last_key': None, 'done': False}
+                for segment in range(total_segments)
+            ]
+        }
+    elif manifest.get('complete'):
+        return manifest
+    else:
+        print(f"↩️ Resuming export of {table_name} to s3://{bucket}/{prefix}")
+
+    def save():
+        manifest['item_count'] = sum(state['items'] for state in manifest['segments'])
+        manifest['complete'] = all(state['done'] for state in manifest['segments'])
+        _save_json(s3, bucket, manifest_key, manifest)
+
+    checkpoint = {'lock': threading.Lock(), 'save': save}
+    table = get_table(table_name)
+    out_of_time = _deadline(context)
+    pending = [state for state in manifest['segments'] if not state['done']]
+
+    with ThreadPoolExecutor(max_workers=max(1, len(pending))) as executor:
+        futures = [
+            executor.submit(_export_segment, s3, table, bucket, prefix, manifest, state,
+                            chunk_items or EXPORT_CHUNK_ITEMS, out_of_time, checkpoint)
+            for state in pending
+        ]
+        for future in futures:
+            future.result()
+
+    with checkpoint['lock']:
+        save()
+
+    print(f"📤 Exported {manifest['item_count']} items from {table_name} to s3://{bucket}/{prefix}"
+          f"{'' if manifest['complete'] else ' (incomplete, call again to resume)'}")
+    return manifest
+
+def iter_export_part(s3, bucket: str, key: str):
+    """Stream the items of one export part without downloading it whole"""
+    body = s3.get_object(Bucket=bucket, Key=key)['Body']
+    try:
+        with gzip.GzipFile(fileobj=body, mode='rb') as gz:
+            for line in io.TextIOWrapper(gz, encoding='utf-8'):
+                if line.strip():
+                    yield json.loads(line, parse_float=Decimal)
+    finally:
+        body.close()
+
+def import_table(parent_entity: str, bucket: str, prefix: str, max_workers: int = None, context=None) -> dict:
+    """
+    Load an export (see export_table) into a parent entity's tracking table.
+
+    Parts are streamed from S3 and written with batched writes, max_workers parts at a time.
+    Finished parts are checkpointed in {prefix}/imports/{parent}.json, so calling again
+    resumes with the parts that are left. A part with items that failed to write is not
+    finished: its failed keys are checkpointed and only those items are retried on resume.
+
+    Args:
+        parent_entity (str): Name of the parent entity to load into (may differ from the source)
+        bucket (str): Bucket holding the export
+        prefix (str): Prefix of the export
+        max_workers (int, optional): Parts imported in parallel. Defaults to IMPORT_CONCURRENCY.
+        context (optional): Lambda context, used to stop before the timeout
+
+    Returns:
+        dict: The import checkpoint: parts_done, failed_keys (part -> entity names still to
+        write), item_count, failed_count (items still to write), failed_entities (a sample of
+        their errors) and complete
+
+    Raises:
+        Exception: If the export is missing or incomplete, or the table is not active
+    """
+    bucket = bucket or EXPORT_BUCKET
+    prefix = prefix.rstrip('/')
+    s3 = get_s3_client()
+    table_name = f"{parent_entity}_TrackedEntities"
+
+    manifest = _load_json(s3, bucket, f"{prefix}/{MANIFEST_NAME}")
+    if manifest is None or not manifest.get('complete'):
+        raise Exception(f"No complete export found at s3://{bucket}/{prefix}")
+
+    status = get_table_status(table_name)
+    if status != 'ACTIVE':
+        raise Exception(f"Table {table_name} is not active (status: {status or 'NOT_FOUND'})")
+
+    checkpoint_key = f"{prefix}/imports/{parent_entity}.json"
+    checkpoint = _load_json(s3, bucket, checkpoint_key) or {
+        'parent_entity': parent_entity,
+        'source': f"s3://{bucket}/{prefix}",
+        'parts_done': [],
+        'item_count': 0,
+        'failed_count': 0,
+        'failed_entities': []
+    }
+    failed_keys = checkpoint.setdefault('failed_keys', {})
+
+    parts = [key for state in manifest['segments'] for key in state['parts']]
+    remaining = [key for key in parts if key not in set(checkpoint['parts_done'])]
+    lock = threading.Lock()
+    out_of_time = _deadline(context)
+
+    def import_part(key):
+        items = iter_export_part(s3, bucket, key)
+        retry = failed_keys.get(key)
+        if retry is not None:
+            retry = set(retry)
+            items = (item for item in items if item['entity_name'] in retry)
+        result = batch_put_items(table_name, items, max_workers=2)
+        failed = [failure['entity'] for failure in result['failed_entities']]
+        with lock:
+            checkpoint['item_count'] += result['written']
+            if failed:
+                failed_keys[key] = failed
+            else:
+                failed_keys.pop(key, None)
+                checkpoint['parts_done'].append(key)
+            checkpoint['failed_count'] = sum(len(names) for names in failed_keys.values())
+            # Keep the checkpoint small: a sample of the outstanding failures is enough to investigate
+            retried = retry or set()
+            checkpoint['failed_entities'] = ([entry for entry in checkpoint['failed_entities'] if entry['entity'] not in retried]
+                                             + result['failed_entities'])[:100]
+            checkpoint['complete'] = len(checkpoint['parts_done']) == len(parts)
+            _save_json(s3, bucket, checkpoint_key, checkpoint)
+
+    with ThreadPoolExecutor(max_workers=max_workers or IMPORT_CONCURRENCY) as executor:
+        in_flight = []
+        for key in remaining:
+            if out_of_time():
+                break
+            in_flight.append(executor.submit(import_part, key))
+            # Submit lazily so a timeout stops new parts from starting
+            if len(in_flight) >= (max_workers or IMPORT_CONCURRENCY):
+                in_flight.pop(0).result()
+        for future in in_flight:
+            future.result()
+
+    checkpoint['complete'] = len(checkpoint['parts_done']) == len(parts)
+    print(f"📥 Imported {checkpoint['item_count']} items into {table_name} from s3://{bucket}/{prefix}"
+          f"{'' if checkpoint['complete'] else ' (incomplete, call again to resume)'}")
+    return checkpoint
\ No newline at end of file
@@ -0,0 +1,191 @@
+import os
+import json
+import time
+import threading
+import contextvars
+
+# Spans in the OpenTelemetry (OTLP/JSON) format, with W3C traceparent propagation
+# none: propagate context only; memory: keep finished spans in process; file: append
+# OTLP/JSON lines to TRACE_FILE; log: print them to CloudWatch Logs
+TRACE_EXPORTER = os.environ.get('TRACE_EXPORTER', 'none').lower()
+TRACE_FILE = os.environ.get('TRACE_FILE', '/tmp/traces.jsonl')
+SERVICE_NAME = os.environ.get('AWS_LAMBDA_FUNCTION_NAME', 'local')
+
+# OTLP enum values
+SPAN_KINDS = {'INTERNAL': 1, 'SERVER': 2, 'CLIENT': 3, 'PRODUCER': 4, 'CONSUMER': 5}
+STATUS_UNSET, STATUS_OK, STATUS_ERROR = 0, 1, 2
+
+_current_span = contextvars.ContextVar('current_span', default=None)
+
+# Finished spans kept by the memory exporter
+_finished_spans = []
+_export_lock = threading.Lock()
+
+class SpanContext:
+    """Identifies a span across processes; what a traceparent carries"""
+    def __init__(self, trace_id: str, span_id: str):
+        self.trace_id = trace_id
+        self.span_id = span_id
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+class Span(SpanContext):
+    """
+    One timed operation in a trace.
+
+    Used as a context manager it becomes the current span, so spans started
+    inside it are its children and inject() propagates it. Leaving the block
+    ends and exports the span, with an error status if the block raised.
+    """
+    def __init__(self, name: str, trace_id: str, parent_span_id: str = None, kind: str = 'INTERNAL',
+                 start_ns: int = None, attributes: dict = None):
+        super().__init__(trace_id, os.urandom(8).hex())
+        self.name = name
+        self.parent_span_id = parent_span_id
+        self.kind = kind
+        self.start_ns = start_ns if start_ns is not None else time.time_ns()
+        self.end_ns = None
+        self.attributes = dict(attributes or {})
+        self.status = STATUS_UNSET
+        self.status_message = None
+        self._token = None
+
+    def __enter__(self):
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _current_span.reset(self._token)
+        if exc_type is not None:
+            self.set_error(exc)
+        self.end()
+        return False
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def set_attribute(self, key: str, value):
+        """Attach an attribute; None values are skipped"""
+        if value is not None:
+            self.attributes[key] = value
+
+    def set_error(self, error):
+        """Mark the span as failed"""
+        self.status = STATUS_ERROR
+        self.status_message = str(error)
+
+    def end(self, end_ns: int = None):
+        """End the span and hand it to the exporter; later calls are ignored"""
+        if self.end_ns is None:
+            self.end_ns = end_ns if end_ns is not None else time.time_ns()
+            export(self)
+
+    def to_otlp(self) -> dict:
+        """The span as an OTLP/JSON span"""
+        span = {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': SPAN_KINDS[self.kind],
+            'startTimeUnixNano': str(self.start_ns),
+            'endTimeUnixNano': str(self.end_ns),
+            'attributes': [{'key': key, 'value': _otlp_value(value)} for key, value in self.attributes.items()],
+            'status': {'code': self.status}
+        }
+        if self.parent_span_id:
+            span['parentSpanId'] = self.parent_span_id
+        if self.status_message:
+            span['status']['message'] = self.status_message
+        return span
+
+def _otlp_value(value) -> dict:
+    """OTLP AnyValue for an attribute"""
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+def parse_traceparent(value: str) -> SpanContext:
+    """
+    Parse a W3C traceparent ("00-<32 hex trace id>-<16 hex span id>-<flags>").
+
+    Returns:
+        SpanContext: The remote parent, or None if the value is missing or malformed
+    """
+    parts = value.split('-') if isinstance(value, str) else []
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        if int(parts[1], 16) == 0 or int(parts[2], 16) == 0:
+            return None
+    except ValueError:
+        return None
+    return SpanContext(parts[1].lower(), parts[2].lower())
+
+def current_span() -> Span:
+    """The span of the enclosing `with` block, or None"""
+    return _current_span.get()
+
+def start_span(name: str, parent: SpanContext = None, kind: str = 'INTERNAL', start_ns: int = None, **attributes) -> Span:
+    """
+    Start a span as a child of parent, or of the current span, or as a new trace.
+
+    Usage:
+        with tracing.start_span('dispatch', kind='PRODUCER', entity=entity) as span:
+            lambda_client.invoke(FunctionName=name, Payload=json.dumps(tracing.inject(payload, span)))
+
+    traceparent is only propagated to our own Lambdas through their payloads (see extract);
+    third-party HTTP calls (Custom Search, OpenAI) get CLIENT spans but no injected headers.
+
+    Args:
+        parent (SpanContext, optional): Remote parent, e.g. extract(event)
+        kind (str, optional): INTERNAL, SERVER, CLIENT, PRODUCER or CONSUMER
+        start_ns (int, optional): Start time in Unix nanoseconds; defaults to now
+    """
+    parent = parent or current_span()
+    if parent is None:
+        return Span(name, os.urandom(16).hex(), None, kind, start_ns, attributes)
+    return Span(name, parent.trace_id, parent.span_id, kind, start_ns, attributes)
+
+def inject(carrier: dict, span: SpanContext = None) -> dict:
+    """Add the traceparent of span (default: the current span) to a payload or headers dict"""
+    span = span or current_span()
+    if span is not None:
+        carrier['traceparent'] = span.traceparent
+    return carrier
+
+def extract(carrier: dict) -> SpanContext:
+    """The remote parent carried in a payload or headers dict, or None"""
+    return parse_traceparent((carrier or {}).get('traceparent'))
+
+def export(span: Span):
+    """Send a finished span to the configured exporter"""
+    if TRACE_EXPORTER == 'memory':
+        with _export_lock:
+            _finished_spans.append(span)
+    elif TRACE_EXPORTER in ('file', 'log'):
+        line = json.dumps({'resourceSpans': [{
+            'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': SERVICE_NAME}}]},
+            'scopeSpans': [{'scope': {'name': 'gargoylescope'}, 'spans': [span.to_otlp()]}]
+        }]}, default=str)
+        if TRACE_EXPORTER == 'log':
+            print(line)
+        else:
+            with _export_lock, open(TRACE_FILE, 'a') as f:
+                f.write(line + '\n')
+
+def finished_spans() -> list:
+    """Spans kept by the memory exporter, in the order they ended"""
+    with _export_lock:
+        return list(_finished_spans)
+
+def clear_spans():
+    """Drop the spans kept by the memory exporter"""
+    with _export_lock:
+        del _finished_spans[:]
\ No newline at end of file
@@ -1,5 +1,8 @@
 import os
 import json
+import time
+import threading
+from collections import OrderedDict
 from datetime import datetime
 
 def load_credentials():
@@ -20,6 +23,15 @@ def batch_entities(entities: list, batch_size: int = 10) -> list:
     """Split list of entities into batches"""
     return [entities[i:i + batch_size] for i in range(0, len(entities), batch_size)]
 
+def parse_analysis_response(content: str) -> dict:
+    """
+    Parse the JSON analysis in a model response, with or without a ```json fence.
+    
+    Raises:
+        json.JSONDecodeError: If the content is not valid JSON
+    """
+    return json.loads(content.replace('```json', '').replace('```', '').strip())
+
 def get_current_timestamp() -> str:
     """Get current timestamp in ISO format"""
     return datetime.now().isoformat()
@@ -28,4 +40,121 @@ def format_error_message(error: Exception, context: str = "") -> str:
     """Format error message with context"""
     timestamp = get_current_timestamp()
     error_msg = f"[{timestamp}] {context}: {type(error).__name__}: {str(error)}"
-    return error_msg 
\ No newline at end of file
+    return error_msg 
+
+_openai_clients = {}
+_openai_lock = threading.Lock()
+
+def get_openai_client(api_key: str):
+    """
+    Get a pooled OpenAI client for an API key, importing openai on first use.
+    
+    openai (with pydantic and httpx underneath) is the slowest import in the worker
+    and news alerter, so it is kept out of module import and off the cold-start path
+    of invocations that never call the model.
+    """
+    client = _openai_clients.get(api_key)
+    if client is None:
+        with _openai_lock:
+            client = _openai_clients.get(api_key)
+            if client is None:
+                from openai import OpenAI
+                client = _openai_clients[api_key] = OpenAI(api_key=api_key)
+    return client
+
+class TTLCache:
+    """
+    Small thread-safe in-process LRU cache whose entries expire after a TTL.
+
+    Lives at module level so warm Lambda containers reuse it across invocations.
+
+    Args:
+        maxsize (int): Maximum number of entries kept before evicting the least recently used
+        ttl (float): Seconds an entry stays valid after it is set
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = 300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    def get(self, key, default=None):
+        """Return the cached value for key, or default if missing or expired"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self._hits += 1
+                    return value
+                del self._data[key]
+            self._misses += 1
+            return default
+
+    def set(self, key, value):
+        """Store value under key, evicting the least recently used entry if full"""
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self._evictions += 1
+
+    def invalidate(self, key=None):
+        """Drop a single key, or every entry when key is None"""
+        with self._lock:
+            if key is None:
+                self._invalidations += len(self._data)
+                self._data.clear()
+            elif self._data.pop(key, None) is not None:
+                self._invalidations += 1
+
+    def stats(self) -> dict:
+        """Get hit/miss/eviction counters and current size"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'ttl_seconds': self.ttl,
+                'hits': self._hits,
+                'misses': self._misses,
+                'evictions': self._evictions,
+                'invalidations': self._invalidations,
+                'hit_rate': (self._hits / lookups) if lookups else 0.0
+            }
+
+class TokenBucket:
+    """
+    Thread-safe token bucket for client-side rate limiting.
+
+    Args:
+        rate (float): Tokens added per second (e.g. SES MaxSendRate)
+        capacity (float, optional): Maximum burst size. Defaults to rate.
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = max(float(rate), 0.001)
+        self.capacity = max(float(capacity if capacity is not None else rate), 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then take it"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
\ No newline at end of file
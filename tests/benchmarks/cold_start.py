@@ -0,0 +1,293 @@
+"""
+Cold-start benchmarks for the Lambda handlers.
+
+Each handler is imported and invoked in a fresh interpreter (run_handler.py)
+against a moto server standing in for AWS and stub OpenAI / Google Custom Search
+endpoints (fake_endpoints.py). Recorded per handler, best of --runs:
+
+    import_ms        cumulative import time of the handler module (-X importtime)
+    first_invoke_ms  latency of the first event (client setup, cold caches, lazy imports)
+    warm_invoke_ms   median latency of the --warm events that follow
+    peak_rss_mb      peak resident set size of the process
+
+Results are compared with baselines.json and the script exits non-zero when a
+metric regresses beyond the tolerance. After an intended change, accept the new
+numbers with --update-baseline.
+
+Usage:
+    python tests/benchmarks/cold_start.py [--runs 3] [--warm 5] [--only worker] [--update-baseline]
+
+Requires moto[server] (see tests/requirements.txt).
+"""
+
+import os
+import sys
+import json
+import logging
+import argparse
+import statistics
+import subprocess
+import tempfile
+import urllib.request
+from contextlib import contextmanager
+from decimal import Decimal
+from unittest.mock import patch
+
+import boto3
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.abspath(os.path.join(BENCHMARK_DIR, '../../src'))
+BASELINES_PATH = os.path.join(BENCHMARK_DIR, 'baselines.json')
+
+sys.path.insert(0, SRC_DIR)
+sys.path.insert(0, BENCHMARK_DIR)
+
+from fake_endpoints import FakeEndpoints, ANALYSIS
+
+BENCH_PARENT = 'Bench'
+BENCH_SENDER = 'bench@example.com'
+INCOMING_BUCKET = 'gargoylescope-incoming-emails'
+REGION = 'us-west-1'
+
+METRICS = ['import_ms', 'first_invoke_ms', 'warm_invoke_ms', 'peak_rss_mb']
+
+# A metric regresses when it exceeds baseline * ratio + slack; the slack keeps
+# small, noisy numbers (a 3ms warm invoke) from failing on jitter alone
+TOLERANCE_RATIO = float(os.environ.get('BENCHMARK_TOLERANCE', '1.5'))
+TOLERANCE_SLACK = {'import_ms': 50, 'first_invoke_ms': 100, 'warm_invoke_ms': 25, 'peak_rss_mb': 15}
+
+
+def s3_event(index: int) -> dict:
+    """S3 notification for one of the seeded command emails."""
+    return {'Records': [{'eventSource': 'aws:s3', 's3': {'bucket': {'name': INCOMING_BUCKET},
+                                                         'object': {'key': f'bench-{index}.eml'}}}]}
+
+
+# function name -> (entry point, event for invocation i); entry points match the container images
+HANDLERS = {
+    'handle_table': ('lambda_handler', lambda i: {'action': 'list', 'parent_entity': BENCH_PARENT, 'include_analysis': True}),
+    'worker': ('lambda_handler', lambda i: {'entity': f'Entity {i}', 'parent_entity': BENCH_PARENT}),
+    'news_alerter': ('lambda_handler', lambda i: {'action': 'report', 'parent_entity': BENCH_PARENT}),
+    'email_controls': ('process_email', s3_event)
+}
+
+
+def command_email(index: int) -> bytes:
+    """Plain-text LIST command from the benchmark tenant, unique per index."""
+    return (
+        f"From: Bench <{BENCH_SENDER}>\r\n"
+        f"To: commands@gargoylescope.com\r\n"
+        f"Subject: Commands\r\n"
+        f"Message-ID: <bench-{index}@example.com>\r\n"
+        f"Content-Type: text/plain; charset=utf-8\r\n"
+        f"\r\n"
+        f"LIST\r\n"
+    ).encode('utf-8')
+
+
+def seed(entity_count: int, email_count: int):
+    """Create the tables, bucket and SES identities the handlers expect, with a small tenant."""
+    from shared import database
+
+    dynamodb = boto3.client('dynamodb', region_name=REGION)
+    for table_name, key_schema in [
+        ('EmailList', [('parent_entity', 'HASH')]),
+        (database.RUN_STATUS_TABLE, [('parent_entity', 'HASH')]),
+        (database.PROCESSED_EMAILS_TABLE, [('message_id', 'HASH')]),
+        (database.ARTICLE_HISTORY_TABLE, [('entity_key', 'HASH'), ('run_ts', 'RANGE')])
+    ]:
+        dynamodb.create_table(
+            TableName=table_name,
+            AttributeDefinitions=[{'AttributeName': name, 'AttributeType': 'S'} for name, _ in key_schema],
+            KeySchema=[{'AttributeName': name, 'KeyType': key_type} for name, key_type in key_schema],
+            BillingMode='PAY_PER_REQUEST'
+        )
+
+    database.create_tracked_entities_table(BENCH_PARENT)
+    database.setup_email_list_table(BENCH_PARENT, [BENCH_SENDER])
+    analysis = {'articles': [{'title': 'Headline', 'url': 'https://news.example.com/0', 'snippet': 'Snippet',
+                              'analysis': ANALYSIS}], 'score': Decimal('1')}
+    database.bulk_add_entities(BENCH_PARENT, [f'Entity {i}' for i in range(entity_count)],
+                               analysis=analysis, completed=True)
+
+    s3 = boto3.client('s3', region_name=REGION)
+    s3.create_bucket(Bucket=INCOMING_BUCKET, CreateBucketConfiguration={'LocationConstraint': REGION})
+    for index in range(email_count):
+        s3.put_object(Bucket=INCOMING_BUCKET, Key=f'bench-{index}.eml', Body=command_email(index))
+
+    ses = boto3.client('ses', region_name=REGION)
+    ses.verify_domain_identity(Domain='gargoylescope.com')
+    ses.verify_email_identity(EmailAddress='reports@gargoylescope.com')
+
+
+@contextmanager
+def stub_environment():
+    """
+    Start moto and the stub endpoints; yields (environment for handler processes, reset).
+
+    reset() wipes moto's state so every run starts from the same seeded tenant.
+    """
+    from moto.server import ThreadedMotoServer
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = ThreadedMotoServer(ip_address='127.0.0.1', port=0, verbose=False)
+    server.start()
+    host, port = server.get_host_and_port()
+    endpoint_url = f"http://{host}:{port}"
+
+    env = {
+        'AWS_ENDPOINT_URL': endpoint_url,
+        'AWS_ACCESS_KEY_ID': 'testing',
+        'AWS_SECRET_ACCESS_KEY': 'testing',
+        'AWS_SESSION_TOKEN': 'testing',
+        'AWS_DEFAULT_REGION': REGION,
+        'REGION': REGION
+    }
+
+    def reset():
+        request = urllib.request.Request(f"{endpoint_url}/moto-api/reset", method='POST')
+        urllib.request.urlopen(request).close()
+
+    try:
+        with FakeEndpoints() as endpoints, patch.dict(os.environ, env):
+            env.update(endpoints.env())
+            yield env, reset
+    finally:
+        server.stop()
+
+
+def parse_import_time(stderr: str, module: str = 'handler') -> float:
+    """Cumulative import time in ms of a top-level module from -X importtime output."""
+    for line in stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        if line.startswith('import time:') and line.rsplit('|', 1)[-1].strip() == module:
+            return int(line.split('|')[1]) / 1000
+    raise Exception(f"No -X importtime entry for {module}")
+
+
+def run_handler(function_name: str, env: dict, warm: int, verbose: bool = False) -> dict:
+    """Import and invoke one handler in a fresh interpreter; returns its metrics."""
+    entry_point, make_event = HANDLERS[function_name]
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        events_path = os.path.join(work_dir, 'events.json')
+        result_path = os.path.join(work_dir, 'result.json')
+        with open(events_path, 'w') as f:
+            json.dump([make_event(i) for i in range(warm + 1)], f)
+
+        process_env = dict(os.environ, **env)
+        process_env['PYTHONPATH'] = os.pathsep.join([SRC_DIR, os.path.join(SRC_DIR, 'functions', function_name)])
+        # Run outside the repo so config/env.json is not picked up, as in Lambda
+        completed = subprocess.run(
+            [sys.executable, '-X', 'importtime', os.path.join(BENCHMARK_DIR, 'run_handler.py'),
+             entry_point, events_path, result_path],
+            cwd=work_dir, env=process_env, capture_output=True, text=True, timeout=300
+        )
+        if verbose:
+            print(completed.stdout)
+        if completed.returncode != 0:
+            raise Exception(f"{function_name} benchmark failed:\n{completed.stderr[-4000:]}")
+
+        with open(result_path) as f:
+            result = json.load(f)
+
+    bad_status = [code for code in result['status_codes'] if code not in (200, None)]
+    if bad_status:
+        raise Exception(f"{function_name} returned status {bad_status[0]}; benchmarks must exercise the success path")
+
+    return {
+        'import_ms': parse_import_time(completed.stderr),
+        'first_invoke_ms': result['invocations_ms'][0],
+        'warm_invoke_ms': statistics.median(result['invocations_ms'][1:]) if warm else 0.0,
+        'peak_rss_mb': result['peak_rss_mb']
+    }
+
+
+def run_benchmarks(functions: list = None, runs: int = 3, warm: int = 5, verbose: bool = False) -> dict:
+    """
+    Benchmark handlers in fresh interpreters, keeping the best value of each metric over runs.
+
+    Returns:
+        dict: {function name: {metric: value}}
+    """
+    functions = functions or sorted(HANDLERS)
+    best = {}
+    with stub_environment() as (env, reset):
+        for _ in range(runs):
+            reset()
+            seed(entity_count=20, email_count=warm + 1)
+            for function_name in functions:
+                metrics = run_handler(function_name, env, warm, verbose)
+                previous = best.setdefault(function_name, metrics)
+                for metric in METRICS:
+                    previous[metric] = min(previous[metric], metrics[metric])
+    return {name: {metric: round(value, 1) for metric, value in metrics.items()} for name, metrics in best.items()}
+
+
+def load_baselines(path: str = BASELINES_PATH) -> dict:
+    """Stored baselines, or {} if none have been recorded."""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def find_regressions(results: dict, baselines: dict, ratio: float = TOLERANCE_RATIO) -> list:
+    """Metrics above baseline * ratio + slack, as (function, metric, value, limit) tuples."""
+    regressions = []
+    for function_name, metrics in results.items():
+        baseline = baselines.get(function_name, {})
+        for metric in METRICS:
+            if metric not in baseline:
+                continue
+            limit = baseline[metric] * ratio + TOLERANCE_SLACK[metric]
+            if metrics[metric] > limit:
+                regressions.append((function_name, metric, metrics[metric], round(limit, 1)))
+    return regressions
+
+
+def format_report(results: dict, baselines: dict) -> str:
+    """Table of results next to their baselines."""
+    lines = [f"{'function':<16}" + ''.join(f"{metric:>22}" for metric in METRICS)]
+    for function_name in sorted(results):
+        baseline = baselines.get(function_name, {})
+        cells = []
+        for metric in METRICS:
+            value = results[function_name][metric]
+            cells.append(f"{value:>10.1f} ({baseline[metric]:>7.1f})" if metric in baseline else f"{value:>10.1f} (      -)")
+        lines.append(f"{function_name:<16}" + ''.join(f"{cell:>22}" for cell in cells))
+    return '\n'.join(lines)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Cold-start benchmarks for the Lambda handlers")
+    parser.add_argument('--runs', type=int, default=3, help="fresh-interpreter runs per handler (best is kept)")
+    parser.add_argument('--warm', type=int, default=5, help="warm invocations after the first")
+    parser.add_argument('--only', action='append', choices=sorted(HANDLERS), help="benchmark only these handlers")
+    parser.add_argument('--update-baseline', action='store_true', help="store these results as the new baselines")
+    parser.add_argument('--verbose', action='store_true', help="show handler output")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.only, args.runs, args.warm, args.verbose)
+    baselines = load_baselines()
+    print(format_report(results, baselines))
+
+    if args.update_baseline:
+        baselines.update(results)
+        with open(BASELINES_PATH, 'w') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"📝 Baselines updated in {BASELINES_PATH}")
+        return 0
+
+    regressions = find_regressions(results, baselines)
+    for function_name, metric, value, limit in regressions:
+        print(f"❌ {function_name} {metric} regressed: {value} > {limit}")
+    if not regressions:
+        print("✅ No cold-start regressions")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,163 @@
+"""
+Stub HTTP endpoints for the OpenAI and Google Custom Search APIs.
+
+Benchmarks point the handlers at these (OPENAI_BASE_URL, GOOGLE_CSE_ENDPOINT)
+so that invocation latency measures our code, not third-party APIs. The
+pipeline emulator (tests/emulator) adds latency and injected errors to model
+the real APIs under load.
+"""
+
+import json
+import time
+import random
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+ANALYSIS = {
+    'is_relevant': True,
+    'sentiment': 'negative',
+    'summary': 'A lawsuit was filed against the entity.',
+    'highlighted_text': 'A <span class="negative">lawsuit</span> was filed.',
+    'important': True
+}
+
+
+def search_results(query: str, count: int = 10) -> dict:
+    """Custom Search response with count articles about the query."""
+    return {
+        'items': [
+            {
+                'title': f'{query} headline {i}',
+                'link': f'https://news.example.com/{i}',
+                'snippet': f'Snippet {i} about {query}.'
+            }
+            for i in range(count)
+        ]
+    }
+
+
+def chat_completion(content: dict) -> dict:
+    """Chat completion response whose message is the JSON-encoded content."""
+    return {
+        'id': 'chatcmpl-benchmark',
+        'object': 'chat.completion',
+        'created': 0,
+        'model': 'gpt-4o-2024-08-06',
+        'choices': [{
+            'index': 0,
+            'finish_reason': 'stop',
+            'message': {'role': 'assistant', 'content': json.dumps(content)}
+        }],
+        'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0}
+    }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Routes /customsearch/v1 and /v1/chat/completions to canned responses."""
+
+    def _inject(self, endpoint: str) -> bool:
+        """Count the request, apply the configured latency; True if this request should fail."""
+        return self.server.fake.before_request(endpoint)
+
+    def _reply(self, body: dict, status: int = 200):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.startswith('/customsearch/v1'):
+            if self._inject('search'):
+                self._reply({'error': {'code': 503, 'message': 'Injected error'}}, 503)
+                return
+            query = parse_qs(urlparse(self.path).query).get('q', ['entity'])[0]
+            fake = self.server.fake
+            if fake.corpus is not None:
+                self._reply(fake.corpus.search_results(query, fake.articles))
+            else:
+                self._reply(search_results(query, fake.articles))
+        else:
+            self._reply({'error': 'not found'}, 404)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if self.path.rstrip('/').endswith('/chat/completions'):
+            if self._inject('chat'):
+                self._reply({'error': {'type': 'server_error', 'message': 'Injected error'}}, 500)
+                return
+            self._reply(chat_completion(ANALYSIS))
+        else:
+            self._reply({'error': 'not found'}, 404)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeEndpoints:
+    """
+    Threaded stub server on a free local port; use as a context manager.
+
+    Args:
+        latency_ms (float, optional): Delay added to every response
+        jitter_ms (float, optional): Extra uniformly random delay, up to this much
+        search_error_rate (float, optional): Fraction of searches answered with a 503
+        chat_error_rate (float, optional): Fraction of chat completions answered with a 500
+        articles (int, optional): Search results per query
+        seed (int, optional): Seed for jitter and error injection
+        corpus (NewsCorpus, optional): Serve search pages from a synthetic corpus (tests/corpus)
+    """
+
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, search_error_rate: float = 0.0,
+                 chat_error_rate: float = 0.0, articles: int = 10, seed: int = None, corpus=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rates = {'search': search_error_rate, 'chat': chat_error_rate}
+        self.articles = articles
+        self.corpus = corpus
+        # Requests and injected errors per endpoint ('search', 'chat', 'search_errors', ...)
+        self.counts = Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        self._server.daemon_threads = True
+        self._server.fake = self
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def before_request(self, endpoint: str) -> bool:
+        """Count a request and sleep for the configured latency; returns whether to fail it."""
+        with self._lock:
+            self.counts[endpoint] += 1
+            delay_ms = self.latency_ms + self._random.uniform(0, self.jitter_ms)
+            fail = self._random.random() < self.error_rates[endpoint]
+            if fail:
+                self.counts[f"{endpoint}_errors"] += 1
+        if delay_ms:
+            time.sleep(delay_ms / 1000)
+        return fail
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def env(self) -> dict:
+        """Environment variables that point the handlers at this server."""
+        return {
+            'OPENAI_API_KEY': 'benchmark-openai-key',
+            'OPENAI_BASE_URL': f"{self.url}/v1",
+            'GOOGLE_API_KEY': 'benchmark-google-key',
+            'GOOGLE_CSE_ID': 'benchmark-cse-id',
+            'GOOGLE_CSE_ENDPOINT': f"{self.url}/customsearch/v1"
+        }
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
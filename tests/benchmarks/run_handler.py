@@ -0,0 +1,78 @@
+"""
+Import one Lambda handler in this fresh interpreter and invoke it with a list of events.
+
+Run by cold_start.py under -X importtime, with PYTHONPATH set up the way the
+function's container image lays out /var/task:
+
+    python -X importtime run_handler.py <entry_point> <events.json> <result.json>
+
+The result file gets per-invocation latencies, status codes and peak RSS.
+"""
+
+import sys
+import json
+import time
+import resource
+
+
+class BenchmarkContext:
+    """Minimal Lambda context with a generous time budget."""
+
+    aws_request_id = 'benchmark'
+    function_name = 'benchmark'
+    memory_limit_in_mb = 512
+
+    def get_remaining_time_in_millis(self):
+        return 900000
+
+
+def peak_rss_mb() -> float:
+    """
+    Peak resident set size of this process in MB.
+    
+    VmHWM is read where available: ru_maxrss survives exec on Linux, so it would
+    report the (much larger) benchmark harness that forked this process.
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss is KB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def main(entry_point: str, events_path: str, result_path: str):
+    with open(events_path) as f:
+        events = json.load(f)
+
+    start = time.perf_counter()
+    # An import statement, not importlib.import_module, so -X importtime records it
+    import handler
+    import_wall_ms = (time.perf_counter() - start) * 1000
+    rss_after_import_mb = peak_rss_mb()
+
+    entry = getattr(handler, entry_point)
+    invocations_ms = []
+    status_codes = []
+    for event in events:
+        start = time.perf_counter()
+        response = entry(event, BenchmarkContext())
+        invocations_ms.append((time.perf_counter() - start) * 1000)
+        status_codes.append(response.get('statusCode') if isinstance(response, dict) else None)
+
+    with open(result_path, 'w') as f:
+        json.dump({
+            'import_wall_ms': import_wall_ms,
+            'invocations_ms': invocations_ms,
+            'status_codes': status_codes,
+            'rss_after_import_mb': rss_after_import_mb,
+            'peak_rss_mb': peak_rss_mb()
+        }, f)
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:4])
@@ -0,0 +1,62 @@
+"""
+Test suite for the cold-start benchmarks.
+
+Runs every handler in a fresh interpreter against stubbed AWS and OpenAI
+endpoints and fails when import time, first or warm invocation latency, or
+peak RSS regresses past the stored baselines (see cold_start.py).
+"""
+
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import cold_start
+
+
+class TestRegressionCheck:
+    """Test class for comparing results with baselines."""
+
+    def test_within_tolerance(self):
+        """Noise below ratio plus slack is not a regression."""
+        baselines = {'worker': {'import_ms': 100.0, 'first_invoke_ms': 200.0, 'warm_invoke_ms': 5.0, 'peak_rss_mb': 50.0}}
+        results = {'worker': {'import_ms': 140.0, 'first_invoke_ms': 350.0, 'warm_invoke_ms': 20.0, 'peak_rss_mb': 60.0}}
+
+        assert cold_start.find_regressions(results, baselines, ratio=1.5) == []
+
+    def test_regression_reported(self):
+        """Metrics past the limit are reported; handlers without baselines are not."""
+        baselines = {'worker': {'import_ms': 100.0}}
+        results = {
+            'worker': {'import_ms': 400.0, 'first_invoke_ms': 1.0, 'warm_invoke_ms': 1.0, 'peak_rss_mb': 1.0},
+            'handle_table': {'import_ms': 9999.0, 'first_invoke_ms': 1.0, 'warm_invoke_ms': 1.0, 'peak_rss_mb': 1.0}
+        }
+
+        assert cold_start.find_regressions(results, baselines, ratio=1.5) == [('worker', 'import_ms', 400.0, 200.0)]
+
+    def test_parse_import_time(self):
+        """The handler's cumulative time is read from -X importtime output."""
+        stderr = (
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       120 |        120 |   shared.utils\n"
+            "import time:      2500 |     180250 | handler\n"
+        )
+
+        assert cold_start.parse_import_time(stderr) == 180.25
+
+
+@pytest.mark.slow
+def test_no_cold_start_regressions():
+    """Each handler's startup cost stays within tolerance of its baseline."""
+    pytest.importorskip('moto.server')
+
+    results = cold_start.run_benchmarks(runs=2, warm=3)
+    regressions = cold_start.find_regressions(results, cold_start.load_baselines())
+
+    assert not regressions, cold_start.format_report(results, cold_start.load_baselines())
+
+
+if __name__ == "__main__":
+    # Run tests
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,85 @@
+"""
+Test suite for the hot path micro-benchmarks.
+
+Times the pure-Python hot paths on seeded synthetic data and fails when one
+regresses past its stored baseline (see hot_paths.py).
+"""
+
+import pytest
+import json
+import random
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import hot_paths
+
+
+class TestGenerators:
+    """Test class for the synthetic data generators."""
+
+    def test_seeded_data_is_reproducible(self):
+        """The same seed gives the same data, so baselines time the same work."""
+        first = hot_paths.synthetic_entities(random.Random(7), 3)
+        second = hot_paths.synthetic_entities(random.Random(7), 3)
+
+        assert first == second
+        assert len(first[0]['analysis']['articles']) == 5
+
+    def test_command_body_parses(self):
+        """Generated command bodies exercise every command."""
+        from functions.email_controls.handler import parse_commands
+
+        commands = parse_commands(hot_paths.synthetic_command_body(random.Random(0), 500))
+
+        assert commands['add'] and commands['delete'] and commands['list']
+
+    def test_model_response_is_fenced_json(self):
+        """Model responses parse with parse_analysis_response."""
+        from shared.utils import parse_analysis_response
+
+        response = hot_paths.model_response(random.Random(0))
+
+        assert response.startswith('```json')
+        assert 'important' in parse_analysis_response(response)
+
+
+class TestRegressionCheck:
+    """Test class for comparing results with baselines."""
+
+    def test_scaled_by_machine_speed(self):
+        """On a machine twice as slow, twice the baseline is not a regression."""
+        baselines = {'calibration': 100.0, 'parse_commands': 1000.0}
+        results = {'calibration': 200.0, 'parse_commands': 2500.0}
+
+        assert hot_paths.find_regressions(results, baselines, ratio=1.5) == []
+
+    def test_regression_reported(self):
+        """Benchmarks past the limit are reported; benchmarks without baselines are not."""
+        baselines = {'calibration': 100.0, 'parse_analysis': 5.0}
+        results = {'calibration': 100.0, 'parse_analysis': 9.0, 'batch_entities': 1e6}
+
+        assert hot_paths.find_regressions(results, baselines, ratio=1.5) == [('parse_analysis', 9.0, 7.5)]
+
+    def test_baselines_cover_every_benchmark(self):
+        """Every benchmark has a stored baseline."""
+        assert set(hot_paths.build_benchmarks()) == set(hot_paths.load_baselines())
+
+
+# Wall-clock timings are noisy on a loaded machine, so the gate only runs when asked for
+@pytest.mark.slow
+@pytest.mark.skipif(os.environ.get('RUN_BENCHMARKS', '').lower() not in ('1', 'true', 'yes'),
+                    reason="set RUN_BENCHMARKS=1 to time the hot paths against their baselines")
+def test_no_hot_path_regressions():
+    """Each hot path stays within tolerance of its baseline."""
+    baselines = hot_paths.load_baselines()
+    results = hot_paths.run_benchmarks(repeat=3)
+    regressions = hot_paths.confirm_regressions(results, baselines, repeat=5)
+
+    assert not regressions, hot_paths.format_report(results, baselines)
+
+
+if __name__ == "__main__":
+    # Run tests
+    pytest.main([__file__, "-v"])
@@ -6,6 +6,7 @@ This module provides shared fixtures and configuration for all test modules.
 
 import pytest
 import json
+import boto3
 import os
 import sys
 from unittest.mock import Mock, patch
@@ -125,6 +126,98 @@ def mock_boto3_clients():
         }
 
 
+@pytest.fixture
+def moto_aws():
+    """In-memory AWS backend (moto) with fake credentials for all services."""
+    from moto import mock_aws
+
+    fake_env = {
+        'AWS_ACCESS_KEY_ID': 'testing',
+        'AWS_SECRET_ACCESS_KEY': 'testing',
+        'AWS_SESSION_TOKEN': 'testing',
+        'AWS_DEFAULT_REGION': 'us-west-1',
+        'REGION': 'us-west-1'
+    }
+    with patch.dict(os.environ, fake_env):
+        with mock_aws():
+            yield
+
+
+@pytest.fixture
+def tracked_entities_table(moto_aws):
+    """Empty Stanford_TrackedEntities table in moto; yields the parent entity name."""
+    from shared import database
+
+    database._active_parents.invalidate('Stanford')
+    database.create_tracked_entities_table('Stanford')
+    yield 'Stanford'
+    database._active_parents.invalidate('Stanford')
+
+
+@pytest.fixture
+def email_list_table(moto_aws):
+    """Empty EmailList table in moto, with the in-process EmailList cache cleared."""
+    from shared.database import invalidate_email_list_cache
+
+    boto3.client('dynamodb', region_name='us-west-1').create_table(
+        TableName='EmailList',
+        AttributeDefinitions=[{'AttributeName': 'parent_entity', 'AttributeType': 'S'}],
+        KeySchema=[{'AttributeName': 'parent_entity', 'KeyType': 'HASH'}],
+        BillingMode='PAY_PER_REQUEST'
+    )
+    invalidate_email_list_cache()
+    yield 'EmailList'
+    invalidate_email_list_cache()
+
+
+@pytest.fixture
+def processed_emails_table(moto_aws):
+    """Empty ProcessedEmails ledger table in moto."""
+    from shared.database import PROCESSED_EMAILS_TABLE
+
+    boto3.client('dynamodb', region_name='us-west-1').create_table(
+        TableName=PROCESSED_EMAILS_TABLE,
+        AttributeDefinitions=[{'AttributeName': 'message_id', 'AttributeType': 'S'}],
+        KeySchema=[{'AttributeName': 'message_id', 'KeyType': 'HASH'}],
+        BillingMode='PAY_PER_REQUEST'
+    )
+    yield PROCESSED_EMAILS_TABLE
+
+
+@pytest.fixture
+def run_status_table(moto_aws):
+    """Empty RunStatus table in moto."""
+    from shared.database import RUN_STATUS_TABLE
+
+    boto3.client('dynamodb', region_name='us-west-1').create_table(
+        TableName=RUN_STATUS_TABLE,
+        AttributeDefinitions=[{'AttributeName': 'parent_entity', 'AttributeType': 'S'}],
+        KeySchema=[{'AttributeName': 'parent_entity', 'KeyType': 'HASH'}],
+        BillingMode='PAY_PER_REQUEST'
+    )
+    yield RUN_STATUS_TABLE
+
+
+@pytest.fixture
+def run_summaries_table(moto_aws):
+    """Empty RunSummaries table in moto."""
+    from shared.database import RUN_SUMMARIES_TABLE
+
+    boto3.client('dynamodb', region_name='us-west-1').create_table(
+        TableName=RUN_SUMMARIES_TABLE,
+        AttributeDefinitions=[
+            {'AttributeName': 'parent_entity', 'AttributeType': 'S'},
+            {'AttributeName': 'run_id', 'AttributeType': 'S'}
+        ],
+        KeySchema=[
+            {'AttributeName': 'parent_entity', 'KeyType': 'HASH'},
+            {'AttributeName': 'run_id', 'KeyType': 'RANGE'}
+        ],
+        BillingMode='PAY_PER_REQUEST'
+    )
+    yield RUN_SUMMARIES_TABLE
+
+
 @pytest.fixture
 def sample_article_data():
     """Sample article data for testing."""
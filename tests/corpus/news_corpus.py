@@ -0,0 +1,483 @@
+"""
+Synthetic tenants and news corpus for scale testing.
+
+Everything is derived from a seed, so the same arguments always produce the
+same tenants, search pages and article bodies, and every scaling change
+(dedup, caching, batching, clustering) can be measured on the same inputs.
+
+Tenants (generate_tenants):
+    1k-100k entities per parent entity, drawn from people, businesses,
+    campus places, chain locations and ambiguous one-word brands. A share of
+    each tenant comes from a pool shared by all tenants (overlap_rate), and a
+    share are variants of another entity in the same tenant (collision_rate):
+    case/spacing variants that normalize to the same name, and suffix, prefix
+    and punctuation variants that don't.
+
+News corpus (NewsCorpus):
+    Google Custom Search pages for any query, plus the article behind every
+    result link. Each result is, in order of precedence:
+
+        duplicate    a shared roundup story, with the same URL on many pages (duplicate_rate)
+        syndicated   an earlier story on the page republished by another outlet,
+                     same body under a new URL (syndication_rate)
+        original     a new story about the query
+
+Usage:
+    python tests/corpus/news_corpus.py --tenants 3 --entities 10000 --out /tmp/corpus [--pages]
+
+writes one entity list per tenant (the bulk-import file format), a manifest
+with the parameters and statistics and, with --pages, the search page of every
+entity and the body of every article.
+"""
+
+import os
+import re
+import sys
+import json
+import random
+import argparse
+from collections import Counter
+from datetime import datetime, timedelta
+
+FIRST_NAMES = ['James', 'Mary', 'Robert', 'Patricia', 'John', 'Jennifer', 'Michael', 'Linda', 'David', 'Elizabeth',
+               'William', 'Barbara', 'Richard', 'Susan', 'Joseph', 'Jessica', 'Thomas', 'Sarah', 'Charles', 'Karen',
+               'Wei', 'Priya', 'Carlos', 'Mei', 'Ahmed', 'Sofia', 'Hiroshi', 'Ana', 'Dmitri', 'Fatima',
+               'Kenji', 'Lucia', 'Omar', 'Ingrid', 'Raj', 'Elena', 'Kwame', 'Yuki', 'Mateo', 'Aisha',
+               'Daniel', 'Nancy', 'Matthew', 'Lisa', 'Anthony', 'Betty', 'Mark', 'Sandra', 'Steven', 'Ashley']
+LAST_NAMES = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis', 'Rodriguez', 'Martinez',
+              'Hernandez', 'Lopez', 'Gonzalez', 'Wilson', 'Anderson', 'Thomas', 'Taylor', 'Moore', 'Jackson', 'Martin',
+              'Lee', 'Perez', 'Thompson', 'White', 'Harris', 'Sanchez', 'Clark', 'Ramirez', 'Lewis', 'Robinson',
+              'Chen', 'Wang', 'Nguyen', 'Kim', 'Patel', 'Singh', 'Tanaka', 'Kowalski', 'Okafor', 'Haddad',
+              'Stanford', 'Hoover', 'Packard', 'Hewlett', 'Terman', 'Green', 'Meyer', 'Lathrop', 'Crothers', 'Escondido',
+              'Walker', 'Young', 'Allen', 'King', 'Wright', 'Scott', 'Torres', 'Hill', 'Flores', 'Adams']
+ADJECTIVES = ['Golden', 'Silver', 'Blue', 'Red', 'Green', 'Rangoon', 'Pacific', 'Sierra', 'Coastal', 'Redwood',
+              'Summit', 'Harbor', 'Valley', 'Sunrise', 'Northern', 'Southern', 'Grand', 'Little', 'Old', 'New',
+              'Bay', 'Mission', 'Oak', 'Cedar', 'Maple', 'Willow', 'Crystal', 'Iron', 'Copper', 'Emerald',
+              'Royal', 'Urban', 'Rustic', 'Modern', 'Lucky', 'Happy', 'Wild', 'Quiet', 'Bright', 'Twin',
+              'Pioneer', 'Liberty', 'Heritage', 'Evergreen', 'Horizon', 'Canyon', 'Alpine', 'Prairie', 'Lakeside', 'Hillside']
+NOUNS = ['Ruby', 'Lantern', 'Dragon', 'Lotus', 'Bear', 'Eagle', 'Oak', 'River', 'Stone', 'Garden',
+         'Table', 'Kitchen', 'Spoon', 'Fork', 'Anchor', 'Bridge', 'Tower', 'Gate', 'Lighthouse', 'Orchard',
+         'Vine', 'Barrel', 'Bean', 'Leaf', 'Rose', 'Tiger', 'Phoenix', 'Falcon', 'Fox', 'Wolf',
+         'Harvest', 'Meadow', 'Pine', 'Ridge', 'Shore', 'Wave', 'Star', 'Moon', 'Sun', 'Cloud',
+         'Bell', 'Crown', 'Key', 'Compass', 'Arrow', 'Hearth', 'Mill', 'Forge', 'Loom', 'Quill',
+         'Pearl', 'Jade', 'Saffron', 'Pepper', 'Basil', 'Olive', 'Fig', 'Plum', 'Cherry', 'Honey']
+KINDS = ['Bistro', 'Cafe', 'Grill', 'Kitchen', 'Bakery', 'Brewing', 'Market', 'Books', 'Labs', 'Capital',
+         'Partners', 'Health', 'Dental', 'Realty', 'Motors', 'Fitness', 'Studio', 'Design', 'Consulting', 'Logistics',
+         'Foods', 'Pharmacy', 'Clinic', 'Academy', 'Foundation', 'Ventures', 'Robotics', 'Energy', 'Bank', 'Hotel']
+PLACES = ['Hall', 'House', 'Center', 'Library', 'Stadium', 'Auditorium', 'Pavilion', 'Museum', 'Institute', 'Commons',
+          'Field', 'Dining', 'Plaza', 'Residences', 'Clinic', 'Gallery', 'Theater', 'Observatory', 'Chapel', 'Lab']
+CHAINS = ['Starbucks', 'Nordstrom', 'Safeway', 'Walgreens', 'Chipotle', 'Peet\'s Coffee', 'Trader Joe\'s', 'Whole Foods',
+          'CVS Pharmacy', 'In-N-Out Burger', 'Target', 'Costco', 'Philz Coffee', 'Panda Express', 'Sweetgreen',
+          'Blue Bottle Coffee', 'REI', 'Apple Store', 'Tesla Service Center', 'Bank of America']
+CITIES = ['Palo Alto', 'Menlo Park', 'Mountain View', 'Redwood City', 'San Mateo', 'Sunnyvale', 'Los Altos',
+          'Cupertino', 'San Jose', 'Santa Clara', 'Fremont', 'Oakland', 'Berkeley', 'San Francisco', 'Daly City',
+          'Burlingame', 'Foster City', 'Half Moon Bay', 'Woodside', 'Atherton', 'Campbell', 'Los Gatos', 'Milpitas',
+          'Saratoga', 'Belmont', 'San Carlos', 'East Palo Alto', 'Portola Valley', 'Stanford', 'Millbrae']
+# One-word names that are also common words or other organizations' names
+AMBIGUOUS = ['Apple', 'Target', 'Ruby', 'Oracle', 'Amazon', 'Summit', 'Crown', 'Pioneer', 'Liberty', 'Phoenix',
+             'Compass', 'Harvest', 'Anchor', 'Meridian', 'Beacon', 'Sequoia', 'Cardinal', 'Jade', 'Saffron', 'Falcon']
+PARENTS = ['Stanford', 'Palo Alto Unified', 'Menlo College', 'City of Mountain View', 'Santa Clara County',
+           'Foothill College', 'Redwood City Chamber', 'San Mateo Health', 'Sunnyvale Downtown Association',
+           'Cupertino Union']
+
+# Suffix/prefix/punctuation variants; these don't normalize to the original name
+SUFFIXES = ['Inc.', 'LLC', 'Co.', 'Group', 'Holdings', 'Corp.']
+
+PUBLISHERS = ['news.example.com', 'paloaltoonline.example.com', 'mercurynews.example.com', 'sfchronicle.example.com',
+              'stanforddaily.example.com', 'almanacnews.example.com', 'mv-voice.example.com', 'sfgate.example.com',
+              'bizjournals.example.com', 'patch.example.com', 'kqed.example.org', 'apnews.example.com',
+              'reuters.example.com', 'localnewsmatters.example.org', 'sanjosespotlight.example.com', 'abc7news.example.com']
+
+# Story topics: (headline template, sentiment, key phrases used in the body)
+TOPICS = [
+    ('{entity} settles wage theft case for ${amount} million', 'negative', ['settlement', 'unpaid wages', 'workers']),
+    ('{entity} faces lawsuit over {issue}', 'negative', ['lawsuit', 'complaint', 'court filing']),
+    ('Health inspectors temporarily close {entity}', 'negative', ['health code', 'inspection', 'closure']),
+    ('{entity} announces layoffs amid {issue}', 'negative', ['layoffs', 'restructuring', 'employees']),
+    ('{entity} opens new location in {city}', 'positive', ['grand opening', 'expansion', 'ribbon cutting']),
+    ('{entity} wins regional award for {issue}', 'positive', ['award', 'recognition', 'community']),
+    ('{entity} receives ${amount} million grant', 'positive', ['grant', 'funding', 'research']),
+    ('{entity} names new chief executive', 'neutral', ['leadership', 'appointment', 'board']),
+    ('{entity} partners with {city} nonprofit', 'positive', ['partnership', 'nonprofit', 'volunteers']),
+    ('Residents push back on {entity} expansion plans', 'negative', ['zoning', 'city council', 'neighbors']),
+    ('{entity} recalls products over {issue}', 'negative', ['recall', 'safety', 'customers']),
+    ('{entity} reports record quarter', 'positive', ['revenue', 'growth', 'earnings'])
+]
+ISSUES = ['labor practices', 'data privacy', 'food safety', 'accessibility', 'pricing', 'parking', 'noise complaints',
+          'environmental impact', 'sustainability', 'customer service', 'contract terms', 'billing errors']
+ROUNDUPS = ['Peninsula business roundup', 'Week in local news', 'What opened and closed this week',
+            'Bay Area briefing', 'Council agenda highlights', 'Campus news digest', 'Weekend events guide',
+            'Restaurant openings and closings']
+
+FILLER = ['The change takes effect next month.', 'Officials did not respond to a request for comment.',
+          'The announcement drew a mix of reactions online.', 'A spokesperson said more details would follow.',
+          'The matter is expected to come before the council in the spring.', 'Local residents shared their views at a public meeting.',
+          'Analysts said the move reflects wider trends in the region.', 'Further updates are expected later this week.',
+          'Customers were notified by email earlier in the day.', 'The organization has operated in the area for more than a decade.']
+
+BASE_DATE = datetime(2024, 1, 15, 8, 0)
+
+
+def _slug(text: str) -> str:
+    return re.sub(r'[^a-z0-9]+', '-', text.lower()).strip('-')[:60]
+
+
+def normalize(name: str) -> str:
+    """Entity name as ADD commands store it (email_controls.normalize_entity_name)."""
+    return ' '.join(name.split()).upper()
+
+
+class _NameFactory:
+    """Unique entity names (by normalized form) from a seeded generator."""
+
+    def __init__(self, rng: random.Random):
+        self._rng = rng
+        self._used = set()
+        self._chain_numbers = Counter()
+
+    def _candidate(self) -> str:
+        rng = self._rng
+        pattern = rng.random()
+        if pattern < 0.25:
+            return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+        if pattern < 0.75:
+            return f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {rng.choice(KINDS)}"
+        if pattern < 0.85:
+            return f"{rng.choice(LAST_NAMES)} {rng.choice(PLACES)}"
+        if pattern < 0.95:
+            return f"{rng.choice(CHAINS)} {rng.choice(CITIES)}"
+        if pattern < 0.96:
+            return rng.choice(AMBIGUOUS)
+        return self._chain_location()
+
+    def _chain_location(self) -> str:
+        chain = self._rng.choice(CHAINS)
+        self._chain_numbers[chain] += 1
+        return f"{chain} #{self._chain_numbers[chain]:04d}"
+
+    def name(self) -> str:
+        # The combinatorial patterns run out near 100k names; store numbers never do
+        for _ in range(20):
+            candidate = self._candidate()
+            if normalize(candidate) not in self._used:
+                break
+        else:
+            candidate = self._chain_location()
+            while normalize(candidate) in self._used:
+                candidate = self._chain_location()
+        self._used.add(normalize(candidate))
+        return candidate
+
+    def reserve(self, name: str):
+        self._used.add(normalize(name))
+
+
+def name_variant(rng: random.Random, name: str) -> tuple:
+    """
+    A colliding variant of an entity name.
+
+    Returns:
+        tuple: (variant, kind); kind 'normalized' variants normalize to the same
+        name (case and spacing), 'distinct' variants don't (suffix, prefix, punctuation)
+    """
+    kind = rng.random()
+    if kind < 0.2:
+        return name.upper(), 'normalized'
+    if kind < 0.3:
+        return name.replace(' ', '  ', 1) if ' ' in name else f" {name} ", 'normalized'
+    if kind < 0.65:
+        return f"{name} {rng.choice(SUFFIXES)}", 'distinct'
+    if kind < 0.8:
+        return f"The {name}", 'distinct'
+    if kind < 0.9 and ' ' in name:
+        return name.replace(' ', '-', 1), 'distinct'
+    return f"{name} ({rng.choice(CITIES)})", 'distinct'
+
+
+def generate_tenants(tenants: int = 3, entities=1000, overlap_rate: float = 0.2, collision_rate: float = 0.02,
+                     seed: int = 0) -> dict:
+    """
+    Generate parent entities with their entity lists.
+
+    Args:
+        tenants (int, optional): Number of parent entities
+        entities (int or list, optional): Entities per tenant, or one size per tenant
+        overlap_rate (float, optional): Share of each tenant drawn from a pool shared by all tenants
+        collision_rate (float, optional): Share of each tenant that are variants of another of its entities
+        seed (int, optional): Seed; the same arguments always give the same tenants
+
+    Returns:
+        dict: {parent_entity: [entity names]}; names are unique within a tenant
+    """
+    sizes = list(entities) if isinstance(entities, (list, tuple)) else [entities] * tenants
+    if len(sizes) != tenants:
+        raise Exception(f"Expected {tenants} tenant sizes, got {len(sizes)}")
+    if overlap_rate + collision_rate > 1:
+        raise Exception("overlap_rate + collision_rate must not exceed 1")
+
+    rng = random.Random(f"tenants:{seed}")
+    factory = _NameFactory(rng)
+    parents = [PARENTS[i] if i < len(PARENTS) else f"{PARENTS[i % len(PARENTS)]} {i // len(PARENTS) + 1}"
+               for i in range(tenants)]
+    for parent in parents:
+        factory.reserve(parent)
+
+    # The largest tenant takes the whole pool, so every pool entity a tenant draws is shared
+    shared_pool = [factory.name() for _ in range(int(max(sizes, default=0) * overlap_rate))]
+
+    result = {}
+    for parent, size in zip(parents, sizes):
+        names = rng.sample(shared_pool, int(size * overlap_rate))
+        # Variants need at least one name to vary
+        collisions = min(int(size * collision_rate), max(size - 1, 0))
+        names += [factory.name() for _ in range(size - len(names) - collisions)]
+        seen = {name for name in names}
+        while len(names) < size:
+            variant, _ = name_variant(rng, rng.choice(names))
+            if variant not in seen:
+                seen.add(variant)
+                names.append(variant)
+        rng.shuffle(names)
+        result[parent] = names
+    return result
+
+
+def tenant_stats(tenants: dict) -> dict:
+    """Sizes, cross-tenant overlap and name collisions of generated tenants."""
+    memberships = Counter(normalize(name) for names in tenants.values() for name in set(map(normalize, names)))
+    stats = {'tenants': len(tenants), 'entities': sum(len(names) for names in tenants.values()),
+             'unique_entities': len(memberships),
+             'shared_entities': len([name for name, count in memberships.items() if count > 1]),
+             'per_tenant': {}}
+    for parent, names in tenants.items():
+        normalized = Counter(normalize(name) for name in names)
+        stats['per_tenant'][parent] = {
+            'entities': len(names),
+            'shared': len([name for name in normalized if memberships[name] > 1]),
+            # Names ADD would merge into one entity
+            'normalized_collisions': sum(count - 1 for count in normalized.values())
+        }
+    return stats
+
+
+class NewsCorpus:
+    """
+    Custom Search pages and article bodies, derived from the seed and the query.
+
+    Args:
+        seed (int, optional): Seed; a query always gets the same page
+        articles (int, optional): Results per search page
+        duplicate_rate (float, optional): Share of results that are shared roundup stories
+        syndication_rate (float, optional): Share of results that republish an earlier story on the page
+        shared_stories (int, optional): Number of roundup stories duplicates are drawn from
+    """
+
+    def __init__(self, seed: int = 0, articles: int = 10, duplicate_rate: float = 0.1,
+                 syndication_rate: float = 0.15, shared_stories: int = 200):
+        if duplicate_rate + syndication_rate > 1:
+            raise Exception("duplicate_rate + syndication_rate must not exceed 1")
+        self.seed = seed
+        self.articles = articles
+        self.duplicate_rate = duplicate_rate
+        self.syndication_rate = syndication_rate
+        # story id -> (query, topic index, publisher, published); roundups have no query
+        self._stories = {}
+        for index in range(shared_stories):
+            rng = random.Random(f"{seed}:roundup:{index}")
+            self._stories[f"{rng.getrandbits(40):010x}"] = (None, index % len(ROUNDUPS), rng.choice(PUBLISHERS),
+                                                            BASE_DATE - timedelta(minutes=rng.randrange(2880)))
+        self._roundups = list(self._stories)
+
+    def _story(self, story_id: str, query: str = None) -> dict:
+        """Headline, publisher and date of a story."""
+        entity, topic, publisher, published = self._stories[story_id]
+        rng = random.Random(f"{self.seed}:story:{story_id}")
+        if entity is None:
+            title = f"{ROUNDUPS[topic]}: {rng.choice(ISSUES)} and more"
+        else:
+            title = TOPICS[topic][0].format(entity=entity, amount=rng.randint(1, 40), issue=rng.choice(ISSUES),
+                                            city=rng.choice(CITIES))
+            title = title[0].upper() + title[1:]
+        return {'story_id': story_id, 'title': title, 'publisher': publisher, 'published': published}
+
+    def _url(self, story: dict, publisher: str) -> str:
+        return (f"https://{publisher}/{story['published'].strftime('%Y/%m/%d')}/"
+                f"{_slug(story['title'])}-{story['story_id']}")
+
+    def _item(self, story: dict, publisher: str, snippet: str, kind: str) -> dict:
+        title = story['title'] if publisher == story['publisher'] else f"{story['title']} | {publisher.split('.')[0]}"
+        published = story['published'].strftime('%Y-%m-%dT%H:%M:%SZ')
+        return {
+            'kind': 'customsearch#result',
+            'title': title,
+            'link': self._url(story, publisher),
+            'displayLink': publisher,
+            'snippet': snippet,
+            'pagemap': {'metatags': [{'article:published_time': published, 'og:site_name': publisher}]},
+            # Not in real responses; lets benchmarks check dedup against ground truth
+            'corpus': {'story_id': story['story_id'], 'kind': kind}
+        }
+
+    def search_results(self, query: str, count: int = None) -> dict:
+        """
+        Custom Search response for a query.
+
+        Returns:
+            dict: {'searchInformation': ..., 'items': [...]} with title, link, displayLink,
+            snippet and pagemap like the real API, plus a 'corpus' entry with the story id
+            and whether the result is an original, syndicated or duplicate story
+        """
+        count = self.articles if count is None else count
+        rng = random.Random(f"{self.seed}:search:{query}")
+        items, originals = [], []
+        for position in range(count):
+            draw = rng.random()
+            if draw < self.duplicate_rate:
+                story = self._story(rng.choice(self._roundups))
+                snippet = f"... {query} was among the items in this week's roundup. {rng.choice(FILLER)}"
+                items.append(self._item(story, story['publisher'], snippet, 'duplicate'))
+            elif draw < self.duplicate_rate + self.syndication_rate and originals:
+                story = rng.choice(originals)
+                publisher = rng.choice([p for p in PUBLISHERS if p != story['publisher']])
+                items.append(self._item(story, publisher, story['snippet'], 'syndicated'))
+            else:
+                story_id = f"{rng.getrandbits(40):010x}"
+                self._stories.setdefault(story_id, (query, rng.randrange(len(TOPICS)), rng.choice(PUBLISHERS),
+                                                    BASE_DATE - timedelta(minutes=rng.randrange(2880))))
+                story = self._story(story_id)
+                story['snippet'] = f"{story['title']}. {self._paragraphs(story_id, 1)[0][:160]}"
+                originals.append(story)
+                items.append(self._item(story, story['publisher'], story['snippet'], 'original'))
+        return {
+            'kind': 'customsearch#search',
+            'searchInformation': {'totalResults': str(count * 37 + len(query)), 'formattedTotalResults': str(count)},
+            'items': items
+        }
+
+    def _paragraphs(self, story_id: str, count: int) -> list:
+        entity, topic, _, _ = self._stories[story_id]
+        rng = random.Random(f"{self.seed}:body:{story_id}")
+        if entity is None:
+            subjects = [rng.choice(CHAINS), f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {rng.choice(KINDS)}",
+                        f"{rng.choice(LAST_NAMES)} {rng.choice(PLACES)}"]
+            return [f"{subject} {rng.choice(['announced', 'confirmed', 'is planning', 'was cited for'])} "
+                    f"{rng.choice(ISSUES)} this week. {rng.choice(FILLER)}" for subject in subjects][:count]
+        _, sentiment, phrases = TOPICS[topic]
+        paragraphs = []
+        for index in range(count):
+            phrase = phrases[index % len(phrases)]
+            opener = entity if index == 0 else rng.choice([entity, 'The organization', 'A spokesperson'])
+            paragraphs.append(' '.join([
+                f"{opener} {rng.choice(['announced', 'confirmed', 'commented on', 'addressed'])} the {phrase} on "
+                f"{rng.choice(['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday'])}.",
+                f"The {phrase} involves {rng.choice(ISSUES)} and {rng.randint(2, 400)} people in {rng.choice(CITIES)}.",
+                rng.choice(FILLER)
+            ] + ([f"Observers described the news as {sentiment} for {entity}."] if index == count - 1 else [])))
+        return paragraphs
+
+    def article(self, url: str) -> dict:
+        """
+        The article behind a result link.
+
+        Syndicated copies share the original's body, with a credit line added.
+        Story links only resolve after search_results produced them.
+
+        Returns:
+            dict: url, title, publisher, published, story_id and body (text like tests/fixtures/testArticle.txt)
+        """
+        story_id = url.rstrip('/').rsplit('-', 1)[-1]
+        if story_id not in self._stories:
+            raise Exception(f"Unknown corpus article: {url}")
+        story = self._story(story_id)
+        publisher = url.split('/')[2]
+        rng = random.Random(f"{self.seed}:byline:{story_id}")
+        lines = [story['title'],
+                 f"by {rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                 story['published'].strftime('%B %d, %Y %I:%M %p')] + self._paragraphs(story_id, rng.randint(4, 8))
+        if publisher != story['publisher']:
+            lines.append(f"This story was originally published by {story['publisher']}.")
+        return {'url': url, 'title': story['title'], 'publisher': publisher,
+                'published': story['published'].isoformat(), 'story_id': story_id, 'body': '\n\n'.join(lines)}
+
+
+def corpus_stats(pages: list) -> dict:
+    """
+    What dedup could save over a set of search pages.
+
+    Args:
+        pages (list): search_results() responses
+
+    Returns:
+        dict: results, unique_urls, unique_stories, and the counts per result kind
+    """
+    items = [item for page in pages for item in page.get('items', [])]
+    stats = {'results': len(items), 'unique_urls': len({item['link'] for item in items}),
+             'unique_stories': len({item['corpus']['story_id'] for item in items})}
+    stats.update(Counter(item['corpus']['kind'] for item in items))
+    return stats
+
+
+def write_corpus(out_dir: str, tenants: dict, corpus: NewsCorpus = None, params: dict = None) -> dict:
+    """
+    Write tenants (and, with a corpus, every search page and article) under out_dir.
+
+    Layout:
+        tenants/<parent>.txt          one entity per line, the bulk-import file format
+        search/<parent>.jsonl         {"query", "response"} per entity
+        articles.jsonl                every distinct article linked from a page
+        manifest.json                 parameters and statistics
+
+    Returns:
+        dict: The manifest
+    """
+    os.makedirs(os.path.join(out_dir, 'tenants'), exist_ok=True)
+    manifest = {'params': params or {}, 'tenants': tenant_stats(tenants)}
+    pages, links = [], {}
+    for parent, names in tenants.items():
+        with open(os.path.join(out_dir, 'tenants', f"{_slug(parent)}.txt"), 'w') as f:
+            f.write('\n'.join(names) + '\n')
+        if corpus is None:
+            continue
+        os.makedirs(os.path.join(out_dir, 'search'), exist_ok=True)
+        with open(os.path.join(out_dir, 'search', f"{_slug(parent)}.jsonl"), 'w') as f:
+            for name in names:
+                page = corpus.search_results(name)
+                pages.append(page)
+                links.update((item['link'], None) for item in page['items'])
+                f.write(json.dumps({'query': name, 'response': page}) + '\n')
+
+    if corpus is not None:
+        with open(os.path.join(out_dir, 'articles.jsonl'), 'w') as f:
+            for link in links:
+                f.write(json.dumps(corpus.article(link)) + '\n')
+        manifest['corpus'] = corpus_stats(pages)
+
+    with open(os.path.join(out_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Generate synthetic tenants and a news corpus for scale testing")
+    parser.add_argument('--tenants', type=int, default=3, help="parent entities")
+    parser.add_argument('--entities', type=int, default=1000, help="entities per tenant (1k-100k)")
+    parser.add_argument('--overlap-rate', type=float, default=0.2, help="share of each tenant shared with other tenants")
+    parser.add_argument('--collision-rate', type=float, default=0.02, help="share of each tenant that are name variants")
+    parser.add_argument('--articles', type=int, default=10, help="results per search page")
+    parser.add_argument('--duplicate-rate', type=float, default=0.1, help="share of results that are shared roundups")
+    parser.add_argument('--syndication-rate', type=float, default=0.15, help="share of results republished by another outlet")
+    parser.add_argument('--seed', type=int, default=0, help="seed for everything")
+    parser.add_argument('--pages', action='store_true', help="also write search pages and article bodies")
+    parser.add_argument('--out', required=True, help="output directory")
+    args = parser.parse_args(argv)
+
+    tenants = generate_tenants(args.tenants, args.entities, args.overlap_rate, args.collision_rate, args.seed)
+    corpus = NewsCorpus(args.seed, args.articles, args.duplicate_rate, args.syndication_rate) if args.pages else None
+    manifest = write_corpus(args.out, tenants, corpus, vars(args))
+    print(json.dumps({key: value for key, value in manifest.items() if key != 'params'}, indent=2))
+    print(f"📝 Corpus written to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
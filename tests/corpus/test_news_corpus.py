@@ -0,0 +1,167 @@
+"""
+Test suite for the synthetic tenant and news corpus generator.
+
+Checks that tenants and search pages are reproducible from the seed and that
+overlap, name collisions, duplicates and syndication follow their rates.
+"""
+
+import pytest
+import json
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import news_corpus
+
+
+class TestTenants:
+    """Test class for generated tenants."""
+
+    def test_reproducible(self):
+        """The same arguments give the same tenants; another seed gives others."""
+        first = news_corpus.generate_tenants(2, 1000, seed=7)
+        assert first == news_corpus.generate_tenants(2, 1000, seed=7)
+        assert first != news_corpus.generate_tenants(2, 1000, seed=8)
+
+    def test_sizes_and_unique_names(self):
+        """Each tenant has its size and no repeated names."""
+        tenants = news_corpus.generate_tenants(3, [1000, 2500, 5000], seed=1)
+
+        assert [len(names) for names in tenants.values()] == [1000, 2500, 5000]
+        assert all(len(set(names)) == len(names) for names in tenants.values())
+        assert 'Stanford' in tenants
+
+    def test_overlap_across_parents(self):
+        """About overlap_rate of each tenant also belongs to another tenant."""
+        tenants = news_corpus.generate_tenants(3, 2000, overlap_rate=0.25, collision_rate=0.0, seed=3)
+        stats = news_corpus.tenant_stats(tenants)
+
+        for parent_stats in stats['per_tenant'].values():
+            assert parent_stats['shared'] >= 500
+        assert stats['unique_entities'] < stats['entities']
+
+    def test_name_collisions(self):
+        """Variants collide with other names in the tenant, some after normalization."""
+        names = news_corpus.generate_tenants(1, 5000, overlap_rate=0.0, collision_rate=0.1, seed=2)['Stanford']
+        stats = news_corpus.tenant_stats({'Stanford': names})['per_tenant']['Stanford']
+
+        assert 0 < stats['normalized_collisions'] < 500
+        assert any(name.startswith('The ') or name.endswith(('Inc.', 'LLC')) for name in names)
+
+    def test_invalid_rates(self):
+        """Rates that can't be met are rejected."""
+        with pytest.raises(Exception, match="must not exceed 1"):
+            news_corpus.generate_tenants(1, 100, overlap_rate=0.8, collision_rate=0.5)
+        with pytest.raises(Exception, match="tenant sizes"):
+            news_corpus.generate_tenants(2, [100])
+
+    @pytest.mark.slow
+    def test_largest_tenant(self):
+        """A 100k-entity tenant is generated with unique names."""
+        names = news_corpus.generate_tenants(1, 100000, seed=4)['Stanford']
+
+        assert len(set(names)) == 100000
+
+
+class TestNewsCorpus:
+    """Test class for synthetic search pages and articles."""
+
+    def test_search_page_shape(self):
+        """Pages have the Custom Search fields the worker reads."""
+        page = news_corpus.NewsCorpus(seed=1).search_results('Rangoon Ruby')
+
+        assert len(page['items']) == 10
+        for item in page['items']:
+            assert item['title'] and item['snippet']
+            assert item['link'].startswith('https://')
+            assert item['corpus']['kind'] in ('original', 'syndicated', 'duplicate')
+
+    def test_reproducible(self):
+        """A query gets the same page from any corpus with the same seed."""
+        page = news_corpus.NewsCorpus(seed=5).search_results('Nordstrom')
+
+        assert page == news_corpus.NewsCorpus(seed=5).search_results('Nordstrom')
+        assert page != news_corpus.NewsCorpus(seed=6).search_results('Nordstrom')
+
+    def test_duplicate_and_syndication_rates(self):
+        """Result kinds follow the configured rates over many pages."""
+        corpus = news_corpus.NewsCorpus(seed=1, duplicate_rate=0.2, syndication_rate=0.3)
+        pages = [corpus.search_results(f"Entity {i}") for i in range(300)]
+        stats = news_corpus.corpus_stats(pages)
+
+        assert stats['results'] == 3000
+        assert 0.15 < stats['duplicate'] / 3000 < 0.25
+        # Nothing to syndicate before a page's first original story
+        assert 0.2 < stats['syndicated'] / 3000 < 0.3
+        assert stats['unique_urls'] < stats['results']
+        assert stats['unique_stories'] < stats['unique_urls']
+
+    def test_no_duplicates_or_syndication(self):
+        """With both rates at zero every result is a distinct original story."""
+        corpus = news_corpus.NewsCorpus(seed=1, duplicate_rate=0.0, syndication_rate=0.0)
+        stats = news_corpus.corpus_stats([corpus.search_results(f"Entity {i}") for i in range(50)])
+
+        assert stats['results'] == stats['unique_urls'] == stats['unique_stories'] == stats['original'] == 500
+
+    def test_syndicated_article_shares_body(self):
+        """A syndicated copy has the original's body under another outlet's URL."""
+        corpus = news_corpus.NewsCorpus(seed=1, duplicate_rate=0.0, syndication_rate=0.5)
+        items = [item for i in range(20) for item in corpus.search_results(f"Entity {i}")['items']]
+        copy = next(item for item in items if item['corpus']['kind'] == 'syndicated')
+        original = next(item for item in items if item['corpus'] == {'story_id': copy['corpus']['story_id'], 'kind': 'original'})
+
+        copied, source = corpus.article(copy['link']), corpus.article(original['link'])
+        assert copy['link'] != original['link']
+        assert copied['body'].startswith(source['body'])
+        assert f"originally published by {source['publisher']}" in copied['body']
+
+    def test_article_mentions_entity(self):
+        """Original stories are about the query."""
+        corpus = news_corpus.NewsCorpus(seed=2, duplicate_rate=0.0)
+        item = corpus.search_results('Golden Lantern Bistro')['items'][0]
+
+        article = corpus.article(item['link'])
+        assert 'Golden Lantern Bistro' in article['title']
+        assert article['body'].count('Golden Lantern Bistro') >= 2
+
+    def test_unknown_article(self):
+        """Links the corpus never produced are rejected."""
+        with pytest.raises(Exception, match="Unknown corpus article"):
+            news_corpus.NewsCorpus().article('https://news.example.com/2024/01/15/missing-0000000000')
+
+
+class TestWriteCorpus:
+    """Test class for writing a corpus to disk."""
+
+    def test_layout(self, tmp_path):
+        """Tenant lists, search pages, articles and a manifest are written."""
+        tenants = news_corpus.generate_tenants(2, 50, seed=1)
+        manifest = news_corpus.write_corpus(str(tmp_path), tenants, news_corpus.NewsCorpus(seed=1, articles=3))
+
+        names = (tmp_path / 'tenants' / 'stanford.txt').read_text().splitlines()
+        pages = [json.loads(line) for line in (tmp_path / 'search' / 'stanford.jsonl').read_text().splitlines()]
+        articles = (tmp_path / 'articles.jsonl').read_text().splitlines()
+        assert names == tenants['Stanford']
+        assert [page['query'] for page in pages] == names
+        assert len(articles) == manifest['corpus']['unique_urls']
+        assert json.loads((tmp_path / 'manifest.json').read_text())['tenants']['entities'] == 100
+
+    def test_tenant_file_is_bulk_import_format(self, tmp_path):
+        """Tenant files read back through the bulk-import reader."""
+        pytest.importorskip('boto3')
+        sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../src'))
+        from functions.email_controls.handler import read_entity_file
+
+        tenants = news_corpus.generate_tenants(1, 200, collision_rate=0.1, seed=1)
+        news_corpus.write_corpus(str(tmp_path), tenants)
+
+        with open(tmp_path / 'tenants' / 'stanford.txt') as f:
+            imported = read_entity_file(f)
+        stats = news_corpus.tenant_stats(tenants)['per_tenant']['Stanford']
+        assert len(imported['entities']) == 200 - stats['normalized_collisions']
+
+
+if __name__ == "__main__":
+    # Run tests
+    pytest.main([__file__, "-v"])
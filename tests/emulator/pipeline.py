@@ -0,0 +1,370 @@
+"""
+Offline end-to-end emulator of the nightly pipeline.
+
+Runs news_alerter -> worker -> DynamoDB -> report in one process, with moto
+standing in for DynamoDB, SES and S3, a fake Lambda client that runs worker
+invocations on a thread pool (like async invocations with reserved
+concurrency), and the stub OpenAI / Google Custom Search server from
+tests/benchmarks with configurable latency and error injection.
+
+A run seeds N synthetic entities, dispatches them, waits for every worker,
+sends the report and prints throughput:
+
+    dispatch_s       news_alerter dispatching every worker
+    workers_s        dispatch start until the last worker finished
+    report_s         rendering and sending the report
+    entities_per_s   entities / workers_s
+    articles_per_s   analyzed articles / workers_s
+    worker_p50_ms    worker invocation latency (p95, max as well)
+    queue_p50_ms     time a dispatched worker waited for a free slot
+
+Usage:
+    python tests/emulator/pipeline.py --entities 200 --concurrency 32 --latency-ms 80 --jitter-ms 40 \\
+        --search-error-rate 0.01 --chat-error-rate 0.01
+
+Record the real APIs to a cassette once, then replay it offline:
+
+    python tests/emulator/pipeline.py --entities 20 --record /tmp/cassettes/nightly.jsonl.gz
+    python tests/emulator/pipeline.py --replay /tmp/cassettes/nightly.jsonl.gz --replay-latency sampled
+
+Except with --record, nothing leaves the machine; no AWS or API credentials are needed. Handler
+profiling (PROFILE_SAMPLE_RATE) and tracing (TRACE_EXPORTER) work as usual.
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import uuid
+import argparse
+import statistics
+import threading
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import ExitStack, contextmanager, nullcontext, redirect_stdout
+from unittest.mock import patch
+
+import boto3
+
+EMULATOR_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.abspath(os.path.join(EMULATOR_DIR, '../../src'))
+BENCHMARK_DIR = os.path.abspath(os.path.join(EMULATOR_DIR, '../benchmarks'))
+CORPUS_DIR = os.path.abspath(os.path.join(EMULATOR_DIR, '../corpus'))
+
+sys.path.insert(0, SRC_DIR)
+sys.path.insert(0, BENCHMARK_DIR)
+sys.path.insert(0, CORPUS_DIR)
+
+from fake_endpoints import FakeEndpoints
+
+EMULATED_PARENT = 'Emulated'
+RECIPIENTS = ['alerts@example.com']
+REGION = 'us-west-1'
+
+AWS_ENV = {
+    'AWS_ACCESS_KEY_ID': 'testing',
+    'AWS_SECRET_ACCESS_KEY': 'testing',
+    'AWS_SESSION_TOKEN': 'testing',
+    'AWS_DEFAULT_REGION': REGION,
+    'REGION': REGION
+}
+
+
+class LambdaContext:
+    """Lambda context for one emulated invocation."""
+
+    memory_limit_in_mb = 1024
+
+    def __init__(self, function_name: str, timeout_s: int = 900):
+        self.function_name = function_name
+        self.aws_request_id = str(uuid.uuid4())
+        self._deadline = time.monotonic() + timeout_s
+
+    def get_remaining_time_in_millis(self):
+        return int((self._deadline - time.monotonic()) * 1000)
+
+
+class FakeLambdaClient:
+    """
+    Lambda client stand-in that calls handlers in this process.
+
+    Event invocations go to a thread pool of `concurrency` workers, like async
+    invocations of a function with that much reserved concurrency; RequestResponse
+    invocations run inline. Every invocation is recorded in `invocations`.
+    """
+
+    def __init__(self, functions: dict, concurrency: int):
+        self.functions = functions
+        self.invocations = []
+        self._futures = []
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='lambda')
+
+    def _run(self, function_name: str, event: dict, queued_at: float) -> dict:
+        started_at = time.perf_counter()
+        response = self.functions[function_name](event, LambdaContext(function_name))
+        finished_at = time.perf_counter()
+        with self._lock:
+            self.invocations.append({
+                'function': function_name,
+                'queued_ms': (started_at - queued_at) * 1000,
+                'duration_ms': (finished_at - started_at) * 1000,
+                'finished_at': finished_at,
+                'status': response.get('statusCode') if isinstance(response, dict) else None
+            })
+        return response
+
+    def invoke(self, FunctionName: str, InvocationType: str = 'RequestResponse', Payload=b'{}', **kwargs):
+        if FunctionName not in self.functions:
+            raise Exception(f"Function not found: {FunctionName}")
+        event = json.loads(Payload)
+        if InvocationType == 'Event':
+            self._futures.append(self._executor.submit(self._run, FunctionName, event, time.perf_counter()))
+            return {'StatusCode': 202}
+        response = self._run(FunctionName, event, time.perf_counter())
+        return {'StatusCode': 200, 'Payload': io.BytesIO(json.dumps(response).encode('utf-8'))}
+
+    def wait(self):
+        """Block until every async invocation has finished; re-raises handler crashes."""
+        for future in wait(self._futures).done:
+            future.result()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+
+def entity_names(count: int) -> list:
+    """Synthetic entity names."""
+    return [f"Entity {i:05d}" for i in range(count)]
+
+
+def seed(parent_entity: str, entities: list):
+    """Create the tables, SES identities and tenant the pipeline expects."""
+    from shared import database
+
+    dynamodb = boto3.client('dynamodb', region_name=REGION)
+    for table_name, key_schema in [
+        ('EmailList', [('parent_entity', 'HASH')]),
+        (database.RUN_STATUS_TABLE, [('parent_entity', 'HASH')]),
+        (database.RUN_SUMMARIES_TABLE, [('parent_entity', 'HASH'), ('run_id', 'RANGE')]),
+        (database.ARTICLE_HISTORY_TABLE, [('entity_key', 'HASH'), ('run_ts', 'RANGE')])
+    ]:
+        dynamodb.create_table(
+            TableName=table_name,
+            AttributeDefinitions=[{'AttributeName': name, 'AttributeType': 'S'} for name, _ in key_schema],
+            KeySchema=[{'AttributeName': name, 'KeyType': key_type} for name, key_type in key_schema],
+            BillingMode='PAY_PER_REQUEST'
+        )
+
+    database.create_tracked_entities_table(parent_entity)
+    database.setup_email_list_table(parent_entity, RECIPIENTS)
+    database.bulk_add_entities(parent_entity, entities)
+
+    ses = boto3.client('ses', region_name=REGION)
+    ses.verify_domain_identity(Domain='gargoylescope.com')
+    ses.verify_email_identity(EmailAddress='reports@gargoylescope.com')
+
+
+@contextmanager
+def atomic_dynamodb_writes():
+    """
+    Serialize moto's DynamoDB writes.
+
+    DynamoDB applies each write (e.g. an ADD to a run counter) atomically; moto's
+    read-modify-write does not, so concurrent workers would lose updates.
+    """
+    from moto.dynamodb.models import DynamoDBBackend
+
+    lock = threading.RLock()
+
+    def locked(method):
+        def write(self, *args, **kwargs):
+            with lock:
+                return method(self, *args, **kwargs)
+        return write
+
+    writes = ['put_item', 'update_item', 'delete_item', 'batch_write_item', 'transact_write_items']
+    with ExitStack() as stack:
+        for name in writes:
+            stack.enter_context(patch.object(DynamoDBBackend, name, locked(getattr(DynamoDBBackend, name))))
+        yield
+
+
+@contextmanager
+def emulated_aws():
+    """In-process moto for DynamoDB, SES and S3, with fake credentials."""
+    from moto import mock_aws
+
+    with patch.dict(os.environ, AWS_ENV), mock_aws(), atomic_dynamodb_writes():
+        # Resolve the default session once; creating it from many threads at once races
+        boto3.client('dynamodb', region_name=REGION)
+        yield
+
+
+def percentile(values: list, fraction: float) -> float:
+    """Nearest-rank percentile, or 0.0 for no values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def run_pipeline(entities: int = 50, concurrency: int = 16, latency_ms: float = 0.0, jitter_ms: float = 0.0,
+                 search_error_rate: float = 0.0, chat_error_rate: float = 0.0, articles: int = 10,
+                 batch_pause_s: float = 0.0, seed_value: int = 0, entity_list: list = None, corpus=None,
+                 cassette_path: str = None, cassette_mode: str = 'replay', cassette_latency: str = 'off',
+                 live_apis: bool = False) -> dict:
+    """
+    Run one nightly pipeline end to end for synthetic entities.
+
+    Args:
+        entities (int, optional): Number of synthetic entities (ignored with entity_list)
+        concurrency (int, optional): Worker invocations running at once
+        latency_ms, jitter_ms (float, optional): Added to every fake API response
+        search_error_rate, chat_error_rate (float, optional): Fraction of API calls that fail
+        articles (int, optional): Search results per entity (one LLM call each)
+        batch_pause_s (float, optional): Pause between dispatch batches; production sleeps 2s
+        seed_value (int, optional): Seed for API jitter and error injection
+        entity_list (list, optional): Entity names to use instead of synthetic ones
+        corpus (NewsCorpus, optional): Serve search pages from a synthetic news corpus
+        cassette_path (str, optional): Replay the API calls from this cassette, or record them to it
+        cassette_mode (str, optional): replay or record
+        cassette_latency (str, optional): Replay latency - off, recorded or sampled
+        live_apis (bool, optional): Call the real APIs (keys from config/env.json or the environment)
+            instead of the stub server, e.g. to record a cassette
+
+    Returns:
+        dict: Timings, throughput, worker latency, API call counts and the run summary
+    """
+    names = entity_list or entity_names(entities)
+    fake_apis = FakeEndpoints(latency_ms=latency_ms, jitter_ms=jitter_ms, search_error_rate=search_error_rate,
+                              chat_error_rate=chat_error_rate, articles=articles, seed=seed_value,
+                              corpus=corpus)
+
+    api_env = {} if live_apis else fake_apis.env()
+
+    with emulated_aws(), fake_apis, patch.dict(os.environ, api_env):
+        from functions.news_alerter import handler as news_alerter
+        from functions.worker import handler as worker
+        from shared import utils, cassette
+
+        # OpenAI clients are cached per API key; each run's fake server has a new URL
+        utils._openai_clients.clear()
+        seed(EMULATED_PARENT, names)
+        lambda_client = FakeLambdaClient({'worker': worker.lambda_handler}, concurrency)
+        # news_alerter only uses time.time and time.sleep (between dispatch batches)
+        dispatch_clock = SimpleNamespace(time=time.time, sleep=lambda seconds: time.sleep(batch_pause_s))
+
+        api_calls = cassette.use(cassette_path, cassette_mode, cassette_latency) if cassette_path else nullcontext()
+
+        try:
+            with api_calls, patch.object(news_alerter, 'get_lambda_client', return_value=lambda_client), \
+                    patch.object(news_alerter, 'time', dispatch_clock), \
+                    patch.object(worker, 'GOOGLE_CSE_ENDPOINT', api_env.get('GOOGLE_CSE_ENDPOINT', worker.GOOGLE_CSE_ENDPOINT)):
+                start = time.perf_counter()
+                dispatch = news_alerter.lambda_handler({'parent_entity': EMULATED_PARENT}, LambdaContext('news_alerter'))
+                dispatched_at = time.perf_counter()
+                lambda_client.wait()
+                workers_done_at = max([start] + [call['finished_at'] for call in lambda_client.invocations])
+                report = news_alerter.lambda_handler({'action': 'report', 'parent_entity': EMULATED_PARENT,
+                                                      'run_summary': True}, LambdaContext('news_alerter'))
+                report_done_at = time.perf_counter()
+        finally:
+            lambda_client.shutdown()
+
+    if dispatch['statusCode'] != 200 or report['statusCode'] != 200:
+        raise Exception(f"Pipeline failed: dispatch {dispatch['body']}, report {report['body']}")
+
+    report_body = json.loads(report['body'])
+    summary = report_body.get('run_summary') or {}
+    workers_s = max(workers_done_at - start, 1e-9)
+    durations = [call['duration_ms'] for call in lambda_client.invocations]
+    queued = [call['queued_ms'] for call in lambda_client.invocations]
+    return {
+        'entities': len(names),
+        'concurrency': concurrency,
+        'worker_invocations': len(lambda_client.invocations),
+        'worker_errors': len([call for call in lambda_client.invocations if call['status'] != 200]),
+        'dispatch_s': round(dispatched_at - start, 3),
+        'workers_s': round(workers_s, 3),
+        'report_s': round(report_done_at - workers_done_at, 3),
+        'total_s': round(report_done_at - start, 3),
+        'entities_per_s': round(len(lambda_client.invocations) / workers_s, 2),
+        'articles_per_s': round(summary.get('articles_analyzed', 0) / workers_s, 2),
+        'worker_p50_ms': round(statistics.median(durations), 1) if durations else 0.0,
+        'worker_p95_ms': round(percentile(durations, 0.95), 1),
+        'worker_max_ms': round(max(durations, default=0.0), 1),
+        'queue_p50_ms': round(statistics.median(queued), 1) if queued else 0.0,
+        'api_calls': dict(fake_apis.counts),
+        'report_delivery': report_body.get('delivery'),
+        'run_summary': summary
+    }
+
+
+def format_report(result: dict) -> str:
+    """Human-readable throughput report for one run."""
+    summary = result['run_summary']
+    calls = result['api_calls']
+    return '\n'.join([
+        f"🧪 {result['entities']} entities, concurrency {result['concurrency']}",
+        f"   dispatch {result['dispatch_s']}s | workers {result['workers_s']}s | report {result['report_s']}s | total {result['total_s']}s",
+        f"   throughput {result['entities_per_s']} entities/s, {result['articles_per_s']} articles/s",
+        f"   worker latency p50 {result['worker_p50_ms']} ms, p95 {result['worker_p95_ms']} ms, max {result['worker_max_ms']} ms;"
+        f" queued p50 {result['queue_p50_ms']} ms",
+        f"   API calls: {calls.get('search', 0)} searches ({calls.get('search_errors', 0)} failed),"
+        f" {calls.get('chat', 0)} chat completions ({calls.get('chat_errors', 0)} failed)",
+        f"   run summary: {summary.get('entities_processed')} processed, {summary.get('entities_failed')} failed,"
+        f" {summary.get('articles_analyzed')} articles, {result['worker_errors']} worker errors"
+    ])
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Run the nightly pipeline offline and report throughput")
+    parser.add_argument('--entities', type=int, default=50, help="synthetic entities to process")
+    parser.add_argument('--concurrency', type=int, default=16, help="worker invocations running at once")
+    parser.add_argument('--latency-ms', type=float, default=0.0, help="latency added to every fake API response")
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help="extra random latency, up to this much")
+    parser.add_argument('--search-error-rate', type=float, default=0.0, help="fraction of searches that fail")
+    parser.add_argument('--chat-error-rate', type=float, default=0.0, help="fraction of chat completions that fail")
+    parser.add_argument('--articles', type=int, default=10, help="search results per entity")
+    parser.add_argument('--batch-pause', type=float, default=0.0, help="seconds between dispatch batches (production: 2)")
+    parser.add_argument('--seed', type=int, default=0, help="seed for jitter, error injection and the corpus")
+    parser.add_argument('--corpus', action='store_true',
+                        help="use generated entity names and news corpus (tests/corpus) instead of canned results")
+    parser.add_argument('--duplicate-rate', type=float, default=0.1, help="with --corpus: share of results that are shared roundups")
+    parser.add_argument('--syndication-rate', type=float, default=0.15, help="with --corpus: share of results republished elsewhere")
+    cassettes = parser.add_mutually_exclusive_group()
+    cassettes.add_argument('--record', metavar='CASSETTE',
+                           help="call the real APIs (keys from config/env.json or the environment) and record them")
+    cassettes.add_argument('--replay', metavar='CASSETTE',
+                           help="answer API calls from a cassette; entities default to the ones it searched for")
+    parser.add_argument('--replay-latency', choices=['off', 'recorded', 'sampled'], default='off',
+                        help="latency added on replay")
+    parser.add_argument('--json', action='store_true', help="print the result as JSON")
+    parser.add_argument('--verbose', action='store_true', help="show handler output")
+    args = parser.parse_args(argv)
+
+    entity_list, corpus = None, None
+    if args.corpus:
+        from news_corpus import generate_tenants, NewsCorpus
+        entity_list = list(generate_tenants(1, args.entities, overlap_rate=0.0, seed=args.seed).values())[0]
+        corpus = NewsCorpus(args.seed, args.articles, args.duplicate_rate, args.syndication_rate)
+    if args.replay and entity_list is None:
+        from shared.cassette import Cassette
+        entity_list = Cassette(args.replay, 'replay').queries()
+
+    # The handlers log every entity and article
+    with (nullcontext() if args.verbose else redirect_stdout(io.StringIO())):
+        result = run_pipeline(args.entities, args.concurrency, args.latency_ms, args.jitter_ms,
+                              args.search_error_rate, args.chat_error_rate, args.articles,
+                              args.batch_pause, args.seed, entity_list, corpus,
+                              args.record or args.replay, 'record' if args.record else 'replay', args.replay_latency,
+                              live_apis=bool(args.record))
+
+    print(json.dumps(result, indent=2, default=str) if args.json else format_report(result))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
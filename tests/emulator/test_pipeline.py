@@ -0,0 +1,119 @@
+"""
+Test suite for the offline pipeline emulator.
+
+Runs the nightly pipeline end to end in process (moto, fake Lambda client,
+stub OpenAI and Custom Search endpoints) for a handful of synthetic entities.
+"""
+
+import pytest
+import io
+import json
+import time
+from contextlib import redirect_stdout
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+pytest.importorskip('moto')
+
+import pipeline
+
+
+def quiet_run(**kwargs) -> dict:
+    """Run the pipeline without the handlers' per-entity logging."""
+    with redirect_stdout(io.StringIO()):
+        return pipeline.run_pipeline(**kwargs)
+
+
+class TestFakeLambdaClient:
+    """Test class for the in-process Lambda client."""
+
+    def test_async_invocations_run_concurrently(self):
+        """Event invocations run on the pool; wait() returns once all have finished."""
+        def slow(event, context):
+            time.sleep(0.1)
+            return {'statusCode': 200}
+
+        client = pipeline.FakeLambdaClient({'worker': slow}, concurrency=4)
+        start = time.perf_counter()
+        responses = [client.invoke(FunctionName='worker', InvocationType='Event', Payload=json.dumps({'i': i}))
+                     for i in range(4)]
+        client.wait()
+        client.shutdown()
+
+        assert [response['StatusCode'] for response in responses] == [202] * 4
+        assert len(client.invocations) == 4
+        assert time.perf_counter() - start < 0.35
+
+    def test_request_response_returns_payload(self):
+        """Synchronous invocations return the handler's response as the payload."""
+        client = pipeline.FakeLambdaClient({'handleTable': lambda event, context: {'statusCode': 200, 'body': event['action']}}, 1)
+
+        response = client.invoke(FunctionName='handleTable', Payload=json.dumps({'action': 'list'}))
+        client.shutdown()
+
+        assert json.loads(response['Payload'].read()) == {'statusCode': 200, 'body': 'list'}
+
+
+class TestPipeline:
+    """Test class for full emulated nightly runs."""
+
+    def test_full_run(self):
+        """Every entity is processed, summarized and reported."""
+        result = quiet_run(entities=12, concurrency=4, articles=2)
+
+        assert result['worker_invocations'] == 12
+        assert result['worker_errors'] == 0
+        assert result['api_calls'] == {'search': 12, 'chat': 24}
+        summary = result['run_summary']
+        assert (summary['entities_processed'], summary['entities_failed']) == (12, 0)
+        assert summary['articles_analyzed'] == 24
+        assert result['report_delivery']['sent'] == len(pipeline.RECIPIENTS)
+        assert result['entities_per_s'] > 0
+
+    def test_injected_search_errors(self):
+        """Failed searches leave entities without articles but do not fail the run."""
+        result = quiet_run(entities=6, concurrency=3, articles=2, search_error_rate=1.0)
+
+        assert result['api_calls']['search_errors'] == 6
+        assert result['api_calls'].get('chat', 0) == 0
+        assert result['run_summary']['entities_processed'] == 6
+        assert result['run_summary']['articles_analyzed'] == 0
+
+    def test_latency_overlaps_with_concurrency(self):
+        """With API latency, concurrent workers finish well before a serial run would."""
+        result = quiet_run(entities=8, concurrency=8, articles=1, latency_ms=100)
+
+        # Each worker waits at least 200 ms on the APIs; run serially, 8 would take 8x the median
+        assert result['worker_p50_ms'] >= 200
+        assert result['workers_s'] < 0.5 * 8 * result['worker_p50_ms'] / 1000
+
+    def test_synthetic_corpus(self):
+        """Generated entities run against search pages served from the synthetic corpus."""
+        from news_corpus import generate_tenants, NewsCorpus
+
+        names = generate_tenants(1, 6, overlap_rate=0.0, seed=1)['Stanford']
+        result = quiet_run(concurrency=3, articles=3, entity_list=names, corpus=NewsCorpus(seed=1))
+
+        assert result['entities'] == 6
+        assert result['api_calls'] == {'search': 6, 'chat': 18}
+        assert result['run_summary']['articles_analyzed'] == 18
+
+    def test_cassette_replay(self, tmp_path):
+        """A recorded run replays without the API server, to the same results."""
+        path = str(tmp_path / 'run.jsonl.gz')
+        recorded = quiet_run(entities=4, concurrency=2, articles=2, cassette_path=path, cassette_mode='record')
+        # Every API call would fail if replay reached the server
+        replayed = quiet_run(entities=4, concurrency=2, articles=2, search_error_rate=1.0, chat_error_rate=1.0,
+                             cassette_path=path, cassette_mode='replay')
+
+        assert recorded['api_calls'] == {'search': 4, 'chat': 8}
+        assert replayed['api_calls'] == {}
+        assert replayed['run_summary']['articles_analyzed'] == recorded['run_summary']['articles_analyzed'] == 8
+        assert replayed['run_summary']['important_articles'] == recorded['run_summary']['important_articles']
+
+
+if __name__ == "__main__":
+    # Run tests
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,348 @@
+"""
+Test suite for inbound email processing in the email_controls Lambda function.
+
+This module contains unit tests for S3 events that batch several inbound
+command emails into one notification, and for the streaming MIME parser.
+"""
+
+import pytest
+import io
+import base64
+import itertools
+import json
+import boto3
+import tracemalloc
+from unittest.mock import patch, MagicMock
+import sys
+import os
+
+# Add the src directory to the path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../src'))
+
+from functions.email_controls import handler
+from functions.email_controls.handler import process_email, parse_command_email, read_entity_file
+
+
+BUCKET = 'gargoylescope-incoming-emails'
+
+
+def make_email(sender: str, body: str) -> bytes:
+    """Build a minimal plain-text command email."""
+    return (
+        f"From: Sender <{sender}>\r\n"
+        f"To: commands@gargoylescope.com\r\n"
+        f"Subject: Commands\r\n"
+        f"Message-ID: <{sender}-1@example.com>\r\n"
+        f"Content-Type: text/plain; charset=utf-8\r\n"
+        f"\r\n"
+        f"{body}\r\n"
+    ).encode('utf-8')
+
+
+def make_event(*keys) -> dict:
+    """S3 event notification with one record per object key."""
+    return {
+        'Records': [
+            {'eventSource': 'aws:s3', 's3': {'bucket': {'name': BUCKET}, 'object': {'key': key}}}
+            for key in keys
+        ]
+    }
+
+
+@pytest.fixture
+def inbox(processed_emails_table):
+    """Incoming email bucket with three emails: two authorized, one not."""
+    s3 = boto3.client('s3', region_name='us-west-1')
+    s3.create_bucket(Bucket=BUCKET, CreateBucketConfiguration={'LocationConstraint': 'us-west-1'})
+    s3.put_object(Bucket=BUCKET, Key='one.eml', Body=make_email('a@stanford.edu', 'ADD Nordstrom'))
+    s3.put_object(Bucket=BUCKET, Key='two.eml', Body=make_email('b@stanford.edu', 'LIST'))
+    s3.put_object(Bucket=BUCKET, Key='spam.eml', Body=make_email('x@example.com', 'DELETE Nordstrom'))
+    return s3
+
+
+class TestEmailControlsRecords:
+    """Test class for processing every record in an S3 event."""
+
+    @pytest.fixture
+    def mock_commands(self):
+        """Stub the table operations and reply emails."""
+        senders = {'a@stanford.edu': 'Stanford', 'b@stanford.edu': 'Stanford'}
+        with patch('functions.email_controls.handler.find_parent_entity_for_sender', side_effect=senders.get), \
+             patch('functions.email_controls.handler.add_or_queue_entities', return_value={'added': ['NORDSTROM']}) as mock_add, \
+             patch('functions.email_controls.handler.list_entities_from_table', return_value=[{'entity_name': 'NORDSTROM'}]), \
+             patch('functions.email_controls.handler.send_confirmation_email'), \
+             patch('functions.email_controls.handler.send_list_email') as mock_list_email:
+            yield mock_add, mock_list_email
+
+    def test_single_record_response_unchanged(self, inbox, mock_commands):
+        """A one-record event returns that email's response directly."""
+        result = process_email(make_event('one.eml'), {})
+
+        assert result['statusCode'] == 200
+        assert json.loads(result['body'])['add_results'] == {'added': ['NORDSTROM']}
+
+    def test_all_records_processed(self, inbox, mock_commands):
+        """Every record is processed and reported, with failures isolated."""
+        mock_add, mock_list_email = mock_commands
+
+        result = process_email(make_event('one.eml', 'two.eml', 'spam.eml', 'missing.eml'), {})
+
+        assert result['statusCode'] == 207
+        body = json.loads(result['body'])
+        assert body['processed'] == 2
+        assert body['failed'] == 2
+        statuses = {entry['key']: entry['statusCode'] for entry in body['results']}
+        assert statuses == {'one.eml': 200, 'two.eml': 200, 'spam.eml': 403, 'missing.eml': 500}
+        mock_add.assert_called_once_with('Stanford', ['NORDSTROM'], only_if_absent=True)
+        mock_list_email.assert_called_once()
+
+    def test_redelivery_is_a_no_op(self, inbox, mock_commands):
+        """A redelivered email with the same Message-ID does not run its commands again."""
+        mock_add, _ = mock_commands
+        inbox.put_object(Bucket=BUCKET, Key='copy.eml', Body=make_email('a@stanford.edu', 'ADD Nordstrom'))
+
+        first = process_email(make_event('one.eml'), {})
+        replay = process_email(make_event('copy.eml'), {})
+
+        assert first['statusCode'] == 200
+        assert replay['statusCode'] == 200
+        assert json.loads(replay['body'])['duplicate'] is True
+        mock_add.assert_called_once()
+
+    def test_failed_email_can_be_retried(self, inbox, mock_commands):
+        """A failure releases the claim so the redelivery is processed."""
+        mock_add, _ = mock_commands
+        mock_add.side_effect = [Exception('throttled'), {'added_entities': ['NORDSTROM'], 'failed_entities': []}]
+
+        assert process_email(make_event('one.eml'), {})['statusCode'] == 500
+        assert process_email(make_event('one.eml'), {})['statusCode'] == 200
+        assert mock_add.call_count == 2
+
+
+class CountingStream(io.BytesIO):
+    """In-memory stream that records how many bytes were read."""
+
+    def __init__(self, data: bytes):
+        super().__init__(data)
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        chunk = super().read(size)
+        self.bytes_read += len(chunk)
+        return chunk
+
+
+class AttachmentStream(io.RawIOBase):
+    """Email whose large base64 attachment is generated on the fly, never held in memory."""
+
+    def __init__(self, attachment_lines: int):
+        self.parts = itertools.chain([
+            b'From: a@stanford.edu\r\nSubject: Fwd: report\r\nMIME-Version: 1.0\r\n'
+            b'Content-Type: multipart/mixed; boundary="outer"\r\n\r\n'
+            b'--outer\r\nContent-Type: application/pdf\r\nContent-Disposition: attachment; filename="a.pdf"\r\n'
+            b'Content-Transfer-Encoding: base64\r\n\r\n'
+        ], (b'QUFB' * 19 + b'\r\n' for _ in range(attachment_lines)), [
+            b'--outer\r\nContent-Type: text/plain; charset=utf-8\r\n\r\nADD Nordstrom\r\n--outer--\r\n'
+        ])
+        self.pending = b''
+
+    def read(self, size=-1):
+        while len(self.pending) < size:
+            chunk = next(self.parts, None)
+            if chunk is None:
+                break
+            self.pending += chunk
+        data, self.pending = self.pending[:size], self.pending[size:]
+        return data
+
+
+class TestCommandEmailParsing:
+    """Test class for the streaming, size-capped MIME parser."""
+
+    def test_plain_email(self):
+        """Single-part emails return their headers and text."""
+        headers, body = parse_command_email(io.BytesIO(make_email('a@stanford.edu', 'ADD Nordstrom')))
+
+        assert headers['from'] == 'Sender <a@stanford.edu>'
+        assert headers['subject'] == 'Commands'
+        assert body.strip() == 'ADD Nordstrom'
+
+    def test_nested_alternative_with_charset(self):
+        """The text/plain part is found inside nested multiparts and decoded from its charset."""
+        raw = (
+            b'From: a@stanford.edu\r\nContent-Type: multipart/mixed; boundary="outer"\r\n\r\n'
+            b'preamble\r\n'
+            b'--outer\r\nContent-Type: multipart/alternative; boundary="inner"\r\n\r\n'
+            b'--inner\r\nContent-Type: text/html\r\n\r\n<p>ADD Wrong</p>\r\n'
+            b'--inner\r\nContent-Type: text/plain; charset="iso-8859-1"\r\n'
+            b'Content-Transfer-Encoding: quoted-printable\r\n\r\nADD Caf=E9 Rouge\r\n'
+            b'--inner--\r\n--outer--\r\n'
+        )
+
+        _, body = parse_command_email(io.BytesIO(raw))
+
+        assert body == 'ADD Caf\u00e9 Rouge'
+
+    def test_attachment_text_is_skipped(self):
+        """Plain-text attachments are not mistaken for the command text."""
+        raw = (
+            b'From: a@stanford.edu\r\nContent-Type: multipart/mixed; boundary="b"\r\n\r\n'
+            b'--b\r\nContent-Type: text/plain\r\nContent-Disposition: attachment; filename="x.txt"\r\n\r\nDELETE All\r\n'
+            b'--b\r\nContent-Type: text/plain\r\nContent-Transfer-Encoding: base64\r\n\r\nTElTVA==\r\n--b--\r\n'
+        )
+
+        _, body = parse_command_email(io.BytesIO(raw))
+
+        assert body == 'LIST'
+
+    def test_stops_after_text_part(self):
+        """Nothing after the command text is read."""
+        raw = (
+            b'From: a@stanford.edu\r\nContent-Type: multipart/mixed; boundary="b"\r\n\r\n'
+            b'--b\r\nContent-Type: text/plain\r\n\r\nLIST\r\n'
+            b'--b\r\nContent-Type: application/zip\r\n\r\n' + b'A' * (4 * 1024 * 1024) + b'\r\n--b--\r\n'
+        )
+        stream = CountingStream(raw)
+
+        _, body = parse_command_email(stream)
+
+        assert body == 'LIST'
+        assert stream.bytes_read <= handler.EMAIL_READ_CHUNK_BYTES
+
+    def test_size_limit(self):
+        """Streams longer than the limit are rejected."""
+        with pytest.raises(Exception, match='exceeds'):
+            parse_command_email(AttachmentStream(10000), max_bytes=100 * 1024)
+
+    def test_memory_is_flat(self):
+        """Skipping a ~16MB attachment keeps peak memory far below its size."""
+        tracemalloc.start()
+        _, body = parse_command_email(AttachmentStream(200000))
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        assert body == 'ADD Nordstrom'
+        assert peak < 1024 * 1024
+
+    def test_unauthorized_sender_rejected_from_headers(self):
+        """Email from an unknown sender gets a 403 after its headers, before the body is read."""
+        names = ''.join(f'Entity {i}\n' for i in range(20000)).encode('utf-8')
+        stream = CountingStream(make_import_email('x@example.com', 'LIST', names))
+        s3 = MagicMock()
+        s3.get_object.return_value = {'Body': stream, 'ContentLength': len(stream.getvalue())}
+
+        with patch('functions.email_controls.handler.find_parent_entity_for_sender', return_value=None):
+            result = handler.process_record(s3, make_event('spam.eml')['Records'][0])
+
+        assert result['statusCode'] == 403
+        assert stream.bytes_read <= handler.EMAIL_READ_CHUNK_BYTES
+        assert stream.closed
+
+    def test_oversized_object_rejected_unread(self, inbox):
+        """Objects larger than EMAIL_MAX_BYTES get a 413 without being parsed."""
+        with patch('functions.email_controls.handler.EMAIL_MAX_BYTES', 10):
+            result = process_email(make_event('one.eml'), {})
+
+        assert result['statusCode'] == 413
+
+
+def make_import_email(sender: str, body: str, attachment: bytes, filename: str = 'entities.csv') -> bytes:
+    """Build a command email with a base64-encoded entity file attached."""
+    encoded = base64.encodebytes(attachment).replace(b'\n', b'\r\n')
+    return (
+        f"From: {sender}\r\nSubject: Import\r\nMessage-ID: <import@example.com>\r\n"
+        f"Content-Type: multipart/mixed; boundary=\"b\"\r\n\r\n"
+        f"--b\r\nContent-Type: text/plain\r\n\r\n{body}\r\n"
+        f"--b\r\nContent-Type: text/csv\r\nContent-Disposition: attachment; filename=\"{filename}\"\r\n"
+        f"Content-Transfer-Encoding: base64\r\n\r\n"
+    ).encode('utf-8') + encoded + b'--b--\r\n'
+
+
+class TestEntityImport:
+    """Test class for bulk entity import from attached files."""
+
+    def test_read_entity_file(self):
+        """Names are taken from the first column, normalized and deduped; the header row is skipped."""
+        lines = ['\ufeffEntity,notes\n', 'nordstrom,retail\n', '"Rangoon  Ruby",food\n', 'NORDSTROM\n', '\n', 'Caf\u00e9 Rouge\n']
+
+        result = read_entity_file(lines)
+
+        assert list(result['entities']) == ['NORDSTROM', 'RANGOON RUBY', 'CAF\u00c9 ROUGE']
+        assert result['rows'] == 4
+        assert result['duplicates'] == 1
+
+    def test_import_limit(self):
+        """Names beyond the limit are counted, not collected."""
+        result = read_entity_file((f'Entity {i}\n' for i in range(10)), max_entities=3)
+
+        assert len(result['entities']) == 3
+        assert result['skipped'] == 7
+
+    def test_attachment_streamed_from_email(self):
+        """Attached files are decoded across base64 lines and handed over as text lines."""
+        names = ''.join(f'Entity {i}\n' for i in range(500)).encode('utf-8')
+        files = {}
+
+        def on_entity_file(filename, text_lines):
+            files[filename] = read_entity_file(text_lines)
+
+        _, body = parse_command_email(io.BytesIO(make_import_email('a@stanford.edu', 'LIST', names)),
+                                      on_entity_file=on_entity_file)
+
+        assert body == 'LIST'
+        assert len(files['entities.csv']['entities']) == 500
+
+    def test_redelivered_import_not_reread(self, inbox, tracked_entities_table, email_list_table):
+        """A redelivery is recognized from its Message-ID before the attachment is read."""
+        names = ''.join(f'Entity {i}\n' for i in range(20000)).encode('utf-8')
+        inbox.put_object(Bucket=BUCKET, Key='import.eml', Body=make_import_email('a@stanford.edu', '', names))
+
+        with patch('functions.email_controls.handler.find_parent_entity_for_sender', return_value=tracked_entities_table), \
+             patch('functions.email_controls.handler.send_confirmation_email'):
+            assert process_email(make_event('import.eml'), {})['statusCode'] == 200
+
+            stream = CountingStream(make_import_email('a@stanford.edu', '', names))
+            s3 = MagicMock()
+            s3.get_object.return_value = {'Body': stream, 'ContentLength': len(stream.getvalue())}
+            with patch('functions.email_controls.handler.read_entity_file') as mock_read:
+                replay = handler.process_record(s3, make_event('import.eml')['Records'][0])
+
+        assert json.loads(replay['body'])['duplicate'] is True
+        mock_read.assert_not_called()
+        assert stream.bytes_read <= handler.EMAIL_READ_CHUNK_BYTES
+
+    def test_unauthorized_import_not_decoded(self, inbox):
+        """Entity files from unknown senders never reach the CSV reader."""
+        inbox.put_object(Bucket=BUCKET, Key='import.eml', Body=make_import_email('x@example.com', '', b'Nordstrom\n'))
+
+        with patch('functions.email_controls.handler.find_parent_entity_for_sender', return_value=None), \
+             patch('functions.email_controls.handler.read_entity_file') as mock_read, \
+             patch('functions.email_controls.handler.add_or_queue_entities') as mock_add:
+            result = process_email(make_event('import.eml'), {})
+
+        assert result['statusCode'] == 403
+        mock_read.assert_not_called()
+        mock_add.assert_not_called()
+
+    def test_import_email_writes_batches(self, inbox, tracked_entities_table, email_list_table):
+        """An import email adds every unique entity and sends one summary confirmation."""
+        names = ''.join(f'Entity {i % 60}\n' for i in range(100)).encode('utf-8')
+        inbox.put_object(Bucket=BUCKET, Key='import.eml', Body=make_import_email('a@stanford.edu', '', names))
+
+        with patch('functions.email_controls.handler.find_parent_entity_for_sender', return_value=tracked_entities_table), \
+             patch('functions.email_controls.handler.send_confirmation_email') as mock_confirm:
+            result = process_email(make_event('import.eml'), {})
+
+        assert result['statusCode'] == 200
+        summary = json.loads(result['body'])['import_summary']
+        assert summary['added_count'] == 60
+        assert summary['duplicates'] == 40
+        table = boto3.resource('dynamodb', region_name='us-west-1').Table(f'{tracked_entities_table}_TrackedEntities')
+        assert table.scan(Select='COUNT')['Count'] == 60
+        mock_confirm.assert_called_once()
+        assert mock_confirm.call_args[0][4]['added_count'] == 60
+
+
+if __name__ == "__main__":
+    # Run tests
+    pytest.main([__file__, "-v"])
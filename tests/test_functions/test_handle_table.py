@@ -252,6 +252,332 @@ class TestHandleTable:
         pass
 
 
+class TestHandleTableBulkUpdate:
+    """Tests for the bulk_update action."""
+
+    @staticmethod
+    def update(name: str, important: bool = True) -> dict:
+        """One entity update with a single article."""
+        return {
+            'entity_name': name,
+            'analysis': {'articles': [{'title': name, 'url': 'http://example.com', 'analysis': {'important': important}}]},
+            'completed': True
+        }
+
+    def test_inline_updates(self, run_status_table, tracked_entities_table):
+        """Inline updates are written in batches; only failed and invalid ones are listed."""
+        from shared.database import list_entities_from_table
+
+        parent = tracked_entities_table
+        updates = [self.update(f'Entity {i}', important=i % 2 == 0) for i in range(60)]
+        updates.append({'analysis': {}})
+        updates.append(self.update('Entity 0'))
+
+        result = lambda_handler({'action': 'bulk_update', 'parent_entity': parent, 'updates': updates}, {})
+
+        assert result['statusCode'] == 200
+        body = json.loads(result['body'])
+        assert body['updated_count'] == 60
+        assert body['failed_count'] == 2
+        assert [entity['status'] for entity in body['errors']] == ['invalid', 'invalid']
+        assert 'results' not in body
+        entities = list_entities_from_table(parent, include_analysis=True)
+        assert len(entities) == 60
+        assert all(entity['completed'] for entity in entities)
+
+    def test_errors_are_capped(self, run_status_table, tracked_entities_table):
+        """Error entries beyond BULK_UPDATE_MAX_ERRORS are counted, not listed."""
+        updates = [{'analysis': {}} for _ in range(5)]
+
+        with patch('functions.handle_table.handler.BULK_UPDATE_MAX_ERRORS', 3):
+            result = lambda_handler({'action': 'bulk_update', 'parent_entity': tracked_entities_table, 'updates': updates}, {})
+
+        body = json.loads(result['body'])
+        assert body['invalid_count'] == 5
+        assert len(body['errors']) == 3
+        assert body['errors_truncated'] is True
+
+    def test_completed_defaults_to_false(self, run_status_table, tracked_entities_table):
+        """Updates without completed leave the entity incomplete, as the update action does."""
+        from shared.database import list_entities_from_table
+
+        parent = tracked_entities_table
+        lambda_handler({'action': 'bulk_update', 'parent_entity': parent, 'updates': [{'entity_name': 'A', 'analysis': {}}]}, {})
+
+        assert list_entities_from_table(parent)[0]['completed'] is False
+
+    def test_adjusts_run_counters(self, run_status_table, tracked_entities_table):
+        """New entities and changed completed flags are added to the current run's counters."""
+        from shared.database import add_entities_to_table, start_run_status, get_run_status
+
+        parent = tracked_entities_table
+        add_entities_to_table(parent, ['A', 'B'])
+        add_entities_to_table(parent, ['C'], completed=True)
+        start_run_status(parent, total_entities=3, completed_entities=1)
+        updates = [self.update('A'), self.update('C'), {'entity_name': 'C2', 'analysis': {}},
+                   dict(self.update('D'), completed=True), {'entity_name': 'B', 'analysis': {}}]
+        updates[1]['completed'] = False
+
+        with patch('shared.database.iter_entity_items', side_effect=AssertionError('scanned')):
+            lambda_handler({'action': 'bulk_update', 'parent_entity': parent, 'updates': updates}, {})
+
+        # A completed, C no longer completed, C2 and D new (D completed)
+        status = get_run_status(parent)
+        assert (status['total_entities'], status['completed_entities']) == (5, 2)
+
+    def test_updates_from_s3_ndjson(self, run_status_table, tracked_entities_table):
+        """Large payloads are streamed from an NDJSON file on S3."""
+        from shared.database import iter_entities_with_important_articles
+
+        parent = tracked_entities_table
+        s3 = boto3.client('s3', region_name='us-west-1')
+        s3.create_bucket(Bucket='backfills', CreateBucketConfiguration={'LocationConstraint': 'us-west-1'})
+        lines = [json.dumps(self.update(f'Entity {i}', important=i < 3)) for i in range(40)] + ['not json']
+        s3.put_object(Bucket='backfills', Key='stanford.ndjson', Body='\n'.join(lines).encode('utf-8'))
+
+        result = lambda_handler({'action': 'bulk_update', 'parent_entity': parent, 'updates_s3': 's3://backfills/stanford.ndjson'}, {})
+
+        body = json.loads(result['body'])
+        assert body['updated_count'] == 40
+        assert body['errors'][-1]['status'] == 'invalid'
+        assert 'Line 41' in body['errors'][-1]['error']
+        # important_count is kept in sync for the report scan
+        assert len(list(iter_entities_with_important_articles(parent))) == 3
+
+    def test_requires_updates(self):
+        """Either inline updates or an S3 pointer is required."""
+        result = lambda_handler({'action': 'bulk_update', 'parent_entity': 'Stanford'}, {})
+
+        assert result['statusCode'] == 500
+
+
+class TestHandleTableCheckCompleted:
+    """Tests for the counter-based checkCompleted action."""
+
+    def test_reads_counters_without_scanning(self, run_status_table, tracked_entities_table):
+        """With a run recorded, checkCompleted is a single GetItem."""
+        from shared.database import start_run_status, record_run_progress
+
+        parent = tracked_entities_table
+        run_id = start_run_status(parent, total_entities=4, completed_entities=1)
+        record_run_progress(parent, run_id, completed=3)
+
+        with patch('shared.database.iter_entity_items', side_effect=AssertionError('scanned')):
+            result = lambda_handler({'action': 'checkCompleted', 'parent_entity': parent}, {})
+
+        body = json.loads(result['body'])
+        assert body['all_completed'] is True
+        assert body['completed_entities'] == 4
+        assert body['run_id'] == run_id
+
+    def test_reconcile_on_demand(self, run_status_table, tracked_entities_table):
+        """reconcile recounts the table, and the first check without a run counts once."""
+        from shared.database import add_entities_to_table, update_entity_analysis
+
+        parent = tracked_entities_table
+        add_entities_to_table(parent, ['A', 'B'])
+        update_entity_analysis(parent, 'A', {})
+
+        first = json.loads(lambda_handler({'action': 'checkCompleted', 'parent_entity': parent}, {})['body'])
+        update_entity_analysis(parent, 'B', {})
+        stale = json.loads(lambda_handler({'action': 'checkCompleted', 'parent_entity': parent}, {})['body'])
+        fixed = json.loads(lambda_handler({'action': 'checkCompleted', 'parent_entity': parent, 'reconcile': True}, {})['body'])
+
+        assert (first['completed_entities'], first['total_entities']) == (1, 2)
+        assert stale['completed_entities'] == 1
+        assert fixed['all_completed'] is True
+        assert fixed['reconciled']['previous'] == {'total_entities': 2, 'completed_entities': 1}
+
+
+    def test_add_and_delete_adjust_counters(self, run_status_table, tracked_entities_table, email_list_table):
+        """add and delete keep the run's totals in step without a recount."""
+        from shared.database import add_entities_to_table, start_run_status
+
+        parent = tracked_entities_table
+        add_entities_to_table(parent, ['A', 'B'], completed=True)
+        start_run_status(parent, total_entities=2, completed_entities=2)
+
+        with patch('shared.database.iter_entity_items', side_effect=AssertionError('scanned')):
+            # A is reset to incomplete, C and D are new
+            lambda_handler({'action': 'add', 'parent_entity': parent, 'entities': ['A', 'C', 'D']}, {})
+            added = json.loads(lambda_handler({'action': 'checkCompleted', 'parent_entity': parent}, {})['body'])
+            lambda_handler({'action': 'delete', 'parent_entity': parent, 'entities': ['B', 'C', 'missing']}, {})
+            deleted = json.loads(lambda_handler({'action': 'checkCompleted', 'parent_entity': parent}, {})['body'])
+
+        assert (added['completed_entities'], added['total_entities']) == (1, 4)
+        assert (deleted['completed_entities'], deleted['total_entities']) == (0, 2)
+        assert deleted['all_completed'] is False
+
+
+    def test_update_adjusts_counters(self, run_status_table, tracked_entities_table):
+        """update creates untracked entities and flips completed, keeping the totals in step."""
+        from shared.database import add_entities_to_table, start_run_status
+
+        parent = tracked_entities_table
+        add_entities_to_table(parent, ['A'])
+        start_run_status(parent, total_entities=1)
+
+        def update(name, completed):
+            lambda_handler({'action': 'update', 'parent_entity': parent, 'entity_name': name,
+                            'analysis': {}, 'completed': completed}, {})
+            return json.loads(lambda_handler({'action': 'checkCompleted', 'parent_entity': parent}, {})['body'])
+
+        with patch('shared.database.iter_entity_items', side_effect=AssertionError('scanned')):
+            created = update('B', True)
+            completed = update('A', True)
+            reopened = update('B', False)
+
+        assert (created['completed_entities'], created['total_entities']) == (1, 2)
+        assert completed['all_completed'] is True
+        assert (reopened['completed_entities'], reopened['total_entities']) == (1, 2)
+
+
+class TestHandleTableProvisioning:
+    """Tests for asynchronous table provisioning."""
+
+    @pytest.fixture(autouse=True)
+    def reset_active_parents(self):
+        """Forget which tables this container has seen active."""
+        from shared import database
+
+        database._active_parents.invalidate()
+        yield
+        database._active_parents.invalidate()
+
+    def test_setup_does_not_wait(self, email_list_table):
+        """setup returns right after CreateTable instead of blocking on the waiter."""
+        with patch('botocore.client.BaseClient.get_waiter') as mock_get_waiter:
+            result = lambda_handler({'action': 'setup', 'parent_entity': 'Berkeley'}, {})
+
+        assert result['statusCode'] == 200
+        assert json.loads(result['body'])['status'] in ('CREATING', 'ACTIVE')
+        mock_get_waiter.assert_not_called()
+
+    def test_adds_are_queued_until_active(self, email_list_table):
+        """Adds while the table is CREATING are queued and written once it is active."""
+        from shared.database import list_entities_from_table
+
+        lambda_handler({'action': 'setup', 'parent_entity': 'Berkeley'}, {})
+
+        with patch('shared.database.get_table_status', return_value='CREATING'):
+            added = json.loads(lambda_handler({'action': 'add', 'parent_entity': 'Berkeley', 'entities': ['Nordstrom', 'Caltrain']}, {})['body'])
+            creating = json.loads(lambda_handler({'action': 'setup_status', 'parent_entity': 'Berkeley'}, {})['body'])
+
+        assert added['queued_entities'] == ['Nordstrom', 'Caltrain']
+        assert creating['ready'] is False
+        assert creating['pending_entities'] == 2
+        assert list_entities_from_table('Berkeley') == []
+
+        ready = json.loads(lambda_handler({'action': 'setup_status', 'parent_entity': 'Berkeley'}, {})['body'])
+
+        assert ready['ready'] is True
+        assert ready['pending_entities'] == 0
+        assert sorted(entity['entity_name'] for entity in list_entities_from_table('Berkeley')) == ['Caltrain', 'Nordstrom']
+
+    def test_missing_table(self, email_list_table):
+        """setup_status reports tables that were never set up."""
+        result = json.loads(lambda_handler({'action': 'setup_status', 'parent_entity': 'Nowhere'}, {})['body'])
+
+        assert result['status'] == 'NOT_FOUND'
+        assert result['ready'] is False
+
+    def test_deleted_table_is_looked_up_again(self, tracked_entities_table, email_list_table):
+        """A table deleted after it was seen ACTIVE is dropped from the cache on the next add."""
+        from shared import database
+
+        lambda_handler({'action': 'setup_status', 'parent_entity': tracked_entities_table}, {})
+        boto3.client('dynamodb', region_name='us-west-1').delete_table(TableName=f'{tracked_entities_table}_TrackedEntities')
+
+        failed = lambda_handler({'action': 'add', 'parent_entity': tracked_entities_table, 'entities': ['Nordstrom']}, {})
+        status = json.loads(lambda_handler({'action': 'setup_status', 'parent_entity': tracked_entities_table}, {})['body'])
+
+        assert failed['statusCode'] == 500
+        assert 'does not exist' in failed['body']
+        assert status['status'] == 'NOT_FOUND'
+        assert database._active_parents.get(tracked_entities_table) is None
+
+    def test_active_cache_expires(self, tracked_entities_table, email_list_table):
+        """Tables are only trusted to be ACTIVE for ACTIVE_TABLE_CACHE_TTL seconds."""
+        from shared import database
+
+        database._active_parents.ttl = 0
+        try:
+            database.ensure_table_ready(tracked_entities_table)
+            with patch('shared.database.get_table_status', return_value=None) as mock_status:
+                assert database.ensure_table_ready(tracked_entities_table) is None
+        finally:
+            database._active_parents.ttl = database.ACTIVE_TABLE_CACHE_TTL
+        mock_status.assert_called_once()
+
+    def test_empty_names_not_queued(self, email_list_table):
+        """Empty names are dropped before the string-set ADD, which would reject them."""
+        from shared.database import queue_pending_entities, get_pending_entities
+
+        assert queue_pending_entities('Berkeley', ['Nordstrom', '', None]) == 1
+        assert queue_pending_entities('Berkeley', ['']) == 0
+        assert get_pending_entities('Berkeley') == ['Nordstrom']
+
+
+class TestHandleTableTransfer:
+    """Tests for the export and import actions."""
+
+    def test_export_then_import(self, run_status_table, tracked_entities_table):
+        """A tenant's table can be exported and loaded into another tenant's table."""
+        from shared.database import bulk_add_entities, create_tracked_entities_table, list_entities_from_table, get_run_status
+
+        boto3.client('s3', region_name='us-west-1').create_bucket(
+            Bucket='exports', CreateBucketConfiguration={'LocationConstraint': 'us-west-1'}
+        )
+        bulk_add_entities(tracked_entities_table, [f'Entity {i}' for i in range(30)])
+        create_tracked_entities_table('Harvard')
+
+        exported = json.loads(lambda_handler({'action': 'export', 'parent_entity': tracked_entities_table,
+                                              'bucket': 'exports', 'prefix': 'exports/run'}, {})['body'])
+        imported = json.loads(lambda_handler({'action': 'import', 'parent_entity': 'Harvard',
+                                              'bucket': 'exports', 'prefix': exported['prefix']}, {})['body'])
+
+        assert exported['complete'] is True
+        assert exported['item_count'] == 30
+        assert imported['complete'] is True
+        assert imported['item_count'] == 30
+        assert len(list_entities_from_table('Harvard')) == 30
+        # The completed import is counted for checkCompleted
+        assert get_run_status('Harvard')['total_entities'] == 30
+
+    def test_import_requires_prefix(self):
+        """Imports need the location of an export."""
+        result = lambda_handler({'action': 'import', 'parent_entity': 'Stanford'}, {})
+
+        assert result['statusCode'] == 500
+
+
+class TestHandleTableRunSummary:
+    """Tests for the run_summary action."""
+
+    def test_current_and_finalized(self, run_status_table, run_summaries_table):
+        """The live run is summarized; finalizing stores it in the history."""
+        from shared.database import start_run_status, record_run_progress
+
+        run_id = start_run_status('Stanford', total_entities=2)
+        record_run_progress('Stanford', run_id, completed=1, stats={'articles': 7, 'prompt_tokens': 500, 'latency_ms': 3000})
+
+        live = json.loads(lambda_handler({'action': 'run_summary', 'parent_entity': 'Stanford'}, {})['body'])
+        finalized = json.loads(lambda_handler({'action': 'run_summary', 'parent_entity': 'Stanford', 'finalize': True}, {})['body'])
+
+        assert live['current']['articles_analyzed'] == 7
+        assert live['current']['latency_p50_ms'] == 5000
+        assert live['history'] == []
+        assert [run['run_id'] for run in finalized['history']] == [run_id]
+        assert finalized['history'][0]['prompt_tokens'] == 500
+
+    def test_no_run_yet(self, run_status_table, run_summaries_table):
+        """Before the first run there is nothing to summarize."""
+        result = json.loads(lambda_handler({'action': 'run_summary', 'parent_entity': 'Stanford'}, {})['body'])
+
+        assert result['current'] is None
+        assert result['history'] == []
+
+
 class TestHandleTableIntegration:
     """Integration tests for the handle_table function."""
     
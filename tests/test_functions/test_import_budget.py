@@ -0,0 +1,68 @@
+"""
+Test suite for Lambda handler import cost.
+
+Each handler is imported in a fresh interpreter, as on a cold start, and its
+cumulative import time (from -X importtime) is held to a per-handler budget.
+Heavy packages that are only needed by some invocations must stay out of
+module import entirely.
+"""
+
+import pytest
+import subprocess
+import sys
+import os
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../src'))
+
+# Cumulative import time budgets in milliseconds, about twice what the handlers
+# measure today. IMPORT_BUDGET_SCALE loosens them on slow CI machines.
+IMPORT_BUDGETS_MS = {
+    'worker': 500,
+    'news_alerter': 500,
+    'handle_table': 500,
+    'email_controls': 500
+}
+IMPORT_BUDGET_SCALE = float(os.environ.get('IMPORT_BUDGET_SCALE', '1'))
+
+# Imported on first use (shared.utils.get_openai_client) or not at all
+DEFERRED_MODULES = ['openai', 'googleapiclient']
+
+
+def import_handler(function_name: str):
+    """Import a handler in a fresh interpreter; returns (cumulative import ms, loaded module names)."""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([SRC_DIR, os.path.join(SRC_DIR, 'functions', function_name)]))
+    code = "import handler, sys; print(' '.join(sorted(sys.modules)))"
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                            capture_output=True, text=True, env=env, timeout=60)
+    assert result.returncode == 0, result.stderr[-2000:]
+
+    cumulative_us = None
+    for line in result.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        if line.startswith('import time:') and line.rsplit('|', 1)[-1].strip() == 'handler':
+            cumulative_us = int(line.split('|')[1])
+    assert cumulative_us is not None, "handler import not found in -X importtime output"
+    return cumulative_us / 1000, set(result.stdout.split())
+
+
+@pytest.mark.parametrize('function_name', sorted(IMPORT_BUDGETS_MS))
+class TestImportBudget:
+    """Test class for cold-start import cost of each handler."""
+
+    def test_heavy_modules_deferred(self, function_name):
+        """Importing the handler does not import packages needed only on first use."""
+        _, modules = import_handler(function_name)
+
+        assert not [name for name in DEFERRED_MODULES if name in modules]
+
+    def test_import_time_within_budget(self, function_name):
+        """The best of three cold imports stays within the handler's budget."""
+        budget = IMPORT_BUDGETS_MS[function_name] * IMPORT_BUDGET_SCALE
+        elapsed = min(import_handler(function_name)[0] for _ in range(3))
+
+        assert elapsed <= budget, f"{function_name} imports in {elapsed:.0f}ms (budget {budget:.0f}ms)"
+
+
+if __name__ == "__main__":
+    # Run tests
+    pytest.main([__file__, "-v"])
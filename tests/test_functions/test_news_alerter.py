@@ -134,6 +134,153 @@ class TestNewsAlerter:
         assert mock_credentials['NewsAlerterFunction']['OPENAI_API_KEY'] == 'test-openai-key'
 
 
+class TestNewsAlerterDispatch:
+    """Tests for dispatching workers from the news_alerter function."""
+
+    @patch('functions.news_alerter.handler.time.sleep')
+    @patch('functions.news_alerter.handler.record_run_progress')
+    @patch('functions.news_alerter.handler.start_run_status', return_value='run-1')
+    @patch('functions.news_alerter.handler.ensure_table_ready')
+    @patch('functions.news_alerter.handler.list_entities_from_table')
+    @patch('functions.news_alerter.handler.get_lambda_client')
+    def test_payload_carries_trace_context(self, mock_lambda, mock_list, mock_ready, mock_start, mock_progress, mock_sleep):
+        """Every worker payload carries the run ID, the run's trace context and its dispatch time."""
+        from shared import tracing
+
+        mock_list.return_value = [{'entity_name': 'Nordstrom'}, {'entity_name': 'Rangoon Ruby'}]
+        mock_lambda.return_value.invoke.return_value = {'StatusCode': 202}
+
+        tracing.clear_spans()
+        with patch('shared.tracing.TRACE_EXPORTER', 'memory'):
+            result = lambda_handler({'parent_entity': 'Stanford'}, {})
+        spans = tracing.finished_spans()
+        tracing.clear_spans()
+
+        trace_id = json.loads(result['body'])['trace_id']
+        payloads = [json.loads(call[1]['Payload']) for call in mock_lambda.return_value.invoke.call_args_list]
+        dispatch_spans = [span.span_id for span in spans if span.name == 'dispatch']
+        assert [payload['run_id'] for payload in payloads] == ['run-1', 'run-1']
+        assert [tracing.extract(payload).span_id for payload in payloads] == dispatch_spans
+        assert all(tracing.extract(payload).trace_id == trace_id for payload in payloads)
+        assert all(payload['dispatched_at'] > 0 for payload in payloads)
+
+
+    @patch('functions.news_alerter.handler.start_run_status')
+    @patch('functions.news_alerter.handler.ensure_table_ready')
+    @patch('functions.news_alerter.handler.list_entities_from_table')
+    @patch('functions.news_alerter.handler.get_lambda_client')
+    def test_no_run_without_dispatch(self, mock_lambda, mock_list, mock_ready, mock_start):
+        """A run with every entity already completed does not replace the last run's record."""
+        mock_list.return_value = [{'entity_name': 'Nordstrom', 'completed': True}]
+
+        result = lambda_handler({'parent_entity': 'Stanford'}, {})
+
+        assert json.loads(result['body'])['message'] == 'All entities already processed'
+        mock_start.assert_not_called()
+        mock_lambda.return_value.invoke.assert_not_called()
+
+
+class TestNewsAlerterReport:
+    """Tests for the streaming report path of the news_alerter function."""
+
+    @staticmethod
+    def article(title: str, sentiment: str) -> dict:
+        """Important analyzed article."""
+        return {
+            'title': title,
+            'url': f"http://example.com/{title.replace(' ', '-').lower()}",
+            'snippet': 'Snippet',
+            'analysis': {'summary': title, 'sentiment': sentiment, 'important': True}
+        }
+
+    @staticmethod
+    def delivered(html_content, subject, recipients):
+        """deliver_report stand-in that reports every recipient as sent."""
+        return {'sent': len(recipients), 'failed': 0, 'message_size_kb': 1.0,
+                'results': [{'recipient': r, 'status': 'sent'} for r in recipients]}
+
+    @patch('functions.news_alerter.handler.get_tenant_settings', return_value={})
+    @patch('functions.news_alerter.handler.get_email_list', return_value=['a@stanford.edu', 'b@stanford.edu'])
+    @patch('functions.news_alerter.handler.deliver_report')
+    def test_report_action_streams_important_entities(self, mock_deliver, mock_get_email_list, mock_settings, tracked_entities_table):
+        """The report action renders only entities with important articles."""
+        from shared.database import add_entities_to_table, update_entity_analysis
+
+        parent = tracked_entities_table
+        add_entities_to_table(parent, ['Nordstrom', 'Rangoon Ruby'])
+        update_entity_analysis(parent, 'Nordstrom', {'articles': [self.article('Store Closure', 'negative')]})
+
+        mock_deliver.side_effect = self.delivered
+
+        result = lambda_handler({'action': 'report', 'parent_entity': parent}, {})
+
+        assert result['statusCode'] == 200
+        assert json.loads(result['body'])['entities_reported'] == 1
+        html_content, _, recipients = mock_deliver.call_args[0]
+        assert recipients == ['a@stanford.edu', 'b@stanford.edu']
+        assert 'Store Closure' in html_content
+        assert 'Rangoon Ruby' not in html_content
+
+    @patch('functions.news_alerter.handler.finalize_run_summary')
+    @patch('functions.news_alerter.handler.get_tenant_settings', return_value={})
+    @patch('functions.news_alerter.handler.get_email_list', return_value=['a@stanford.edu'])
+    @patch('functions.news_alerter.handler.deliver_report')
+    def test_run_summary_appended(self, mock_deliver, mock_get_email_list, mock_settings, mock_finalize, tracked_entities_table):
+        """The report finalizes the run summary and can append it to the email."""
+        from shared.database import add_entities_to_table, update_entity_analysis
+
+        parent = tracked_entities_table
+        add_entities_to_table(parent, ['Nordstrom'])
+        update_entity_analysis(parent, 'Nordstrom', {'articles': [self.article('Store Closure', 'negative')]})
+        mock_finalize.return_value = {'entities_total': 1, 'entities_processed': 1, 'entities_failed': 0,
+                                      'articles_analyzed': 12, 'important_articles': 1, 'total_tokens': 4321,
+                                      'llm_calls': 12, 'estimated_cost_usd': 0.02,
+                                      'latency_p50_ms': 5000, 'latency_p95_ms': 5000}
+        mock_deliver.side_effect = self.delivered
+
+        result = lambda_handler({'action': 'report', 'parent_entity': parent, 'run_summary': True}, {})
+
+        mock_finalize.assert_called_once_with(parent)
+        assert json.loads(result['body'])['run_summary']['total_tokens'] == 4321
+        html_content = mock_deliver.call_args[0][0]
+        assert html_content.index('Store Closure') < html_content.index('Run Summary')
+        assert html_content.rstrip().endswith('</html>')
+
+    @patch('functions.news_alerter.handler.get_tenant_settings')
+    @patch('functions.news_alerter.handler.get_email_list')
+    @patch('functions.news_alerter.handler.deliver_report')
+    def test_recipient_views(self, mock_deliver, mock_get_email_list, mock_settings, tracked_entities_table):
+        """Recipients with the same view share one report; filtered views only see their slice."""
+        from shared.database import add_entities_to_table, update_entity_analysis
+
+        parent = tracked_entities_table
+        add_entities_to_table(parent, ['Nordstrom', 'Rangoon Ruby'])
+        update_entity_analysis(parent, 'Nordstrom', {
+            'articles': [self.article('Store Closure', 'negative'), self.article('New Flagship', 'positive')]
+        })
+        update_entity_analysis(parent, 'Rangoon Ruby', {'articles': [self.article('Health Code', 'negative')]})
+
+        mock_get_email_list.return_value = ['all1@stanford.edu', 'all2@stanford.edu', 'neg@stanford.edu', 'ruby@stanford.edu']
+        mock_settings.return_value = {'recipient_views': {
+            'neg@stanford.edu': {'sentiments': ['Negative']},
+            'ruby@stanford.edu': {'entities': ['rangoon ruby']}
+        }}
+        mock_deliver.side_effect = self.delivered
+
+        result = lambda_handler({'action': 'report', 'parent_entity': parent}, {})
+
+        body = json.loads(result['body'])
+        assert body['report_views'] == 3
+        assert body['delivery']['sent'] == 4
+        reports = {tuple(call[0][2]): call[0][0] for call in mock_deliver.call_args_list}
+        assert len(reports) == 3
+        assert 'New Flagship' in reports[('all1@stanford.edu', 'all2@stanford.edu')]
+        assert 'Store Closure' in reports[('neg@stanford.edu',)]
+        assert 'New Flagship' not in reports[('neg@stanford.edu',)]
+        assert 'Health Code' in reports[('ruby@stanford.edu',)]
+        assert 'Store Closure' not in reports[('ruby@stanford.edu',)]
+
+
 class TestNewsAlerterIntegration:
     """Integration tests for the news_alerter function."""
     
@@ -204,6 +204,125 @@ class TestWorker:
         pass
 
 
+class TestWorkerRunProgress:
+    """Tests for run completion reporting by the worker."""
+
+    @pytest.mark.parametrize('result,counter', [
+        ({'entity': 'Nordstrom', 'articles_found': 1, 'important_articles': 0}, 'completed'),
+        ({'entity': 'Nordstrom', 'error': 'boom', 'articles_found': 0, 'important_articles': 0}, 'failed')
+    ])
+    @patch('functions.worker.handler.record_run_progress')
+    @patch('functions.worker.handler.process_entity')
+    def test_reports_progress(self, mock_process, mock_progress, result, counter):
+        """Finished entities count as completed or failed against the dispatching run."""
+        mock_process.return_value = result
+
+        lambda_handler({'entity': 'Nordstrom', 'parent_entity': 'Stanford', 'run_id': 'run-1'}, {})
+
+        mock_progress.assert_called_once()
+        assert mock_progress.call_args[0] == ('Stanford', 'run-1')
+        assert mock_progress.call_args[1][counter] == 1
+        assert mock_progress.call_args[1]['stats']['articles'] == result['articles_found']
+
+    @patch('functions.worker.handler.record_run_progress')
+    @patch('functions.worker.handler.process_entity', return_value={'entity': 'Nordstrom'})
+    def test_without_run_id(self, mock_process, mock_progress):
+        """Direct invocations without a run do not touch the counters."""
+        lambda_handler({'entity': 'Nordstrom', 'parent_entity': 'Stanford'}, {})
+
+        mock_progress.assert_not_called()
+
+
+class TestWorkerMetrics:
+    """Tests for per-stage metrics emitted by the worker."""
+
+    @patch('functions.worker.handler.record_article_history')
+    @patch('functions.worker.handler.load_credentials', return_value={'GOOGLE_API_KEY': 'key', 'GOOGLE_CSE_ID': 'cse', 'OPENAI_API_KEY': 'key'})
+    @patch('functions.worker.handler.get_openai_client')
+    @patch('functions.worker.handler.requests.get')
+    def test_stages_recorded(self, mock_get, mock_openai, mock_creds, mock_history, tracked_entities_table):
+        """Search, each LLM call with its tokens, and the DynamoDB write are timed."""
+        from shared import metrics
+        from shared.database import add_entities_to_table
+
+        add_entities_to_table(tracked_entities_table, ['Nordstrom'])
+        mock_get.return_value.json.return_value = {
+            'items': [{'title': f'Headline {i}', 'link': 'http://example.com', 'snippet': 'Snippet'} for i in range(2)]
+        }
+        mock_openai.return_value.chat.completions.create.return_value = Mock(
+            choices=[Mock(message=Mock(content='{"important": true}'))],
+            usage=Mock(prompt_tokens=100, completion_tokens=20)
+        )
+
+        with metrics.collect() as records:
+            lambda_handler({'entity': 'Nordstrom', 'parent_entity': tracked_entities_table}, {})
+        totals = metrics.aggregate(records)
+
+        assert totals['search']['Results'] == 2
+        assert totals['llm']['count'] == 2
+        assert totals['llm']['PromptTokens'] == 200
+        assert totals['llm']['CompletionTokens'] == 40
+        assert totals['dynamodb_write']['count'] == 1
+        assert 'ConsumedWriteCapacity' in totals['dynamodb_write']
+        assert totals['entity']['ImportantArticles'] == 2
+
+
+class TestWorkerTracing:
+    """Tests for continuing the orchestrator's trace in the worker."""
+
+    @patch('functions.worker.handler.record_run_progress')
+    @patch('functions.worker.handler.process_entity', return_value={'entity': 'Nordstrom', 'articles_found': 0, 'important_articles': 0})
+    def test_continues_trace_and_measures_queueing(self, mock_process, mock_progress):
+        """Queueing (dispatch to start) is a separate span and stat from processing."""
+        import time
+        from shared import tracing
+
+        dispatch = tracing.start_span('dispatch', kind='PRODUCER')
+        event = tracing.inject({'entity': 'Nordstrom', 'parent_entity': 'Stanford', 'run_id': 'run-1',
+                                'dispatched_at': int(time.time() * 1000) - 1500}, dispatch)
+
+        tracing.clear_spans()
+        with patch('shared.tracing.TRACE_EXPORTER', 'memory'):
+            lambda_handler(event, {})
+        spans = {span.name: span for span in tracing.finished_spans()}
+        tracing.clear_spans()
+
+        assert {spans['queued'].parent_span_id, spans['process'].parent_span_id} == {dispatch.span_id}
+        assert spans['process'].trace_id == dispatch.trace_id
+        assert spans['queued'].duration_ms >= 1500
+        assert spans['process'].attributes['run_id'] == 'run-1'
+        assert spans['process'].attributes['queue_delay_ms'] >= 1500
+        assert mock_progress.call_args[1]['stats']['queue_delay_ms'] >= 1500
+
+    @patch('functions.worker.handler.load_credentials',
+           return_value={'GOOGLE_API_KEY': 'key', 'GOOGLE_CSE_ID': 'cx', 'OPENAI_API_KEY': 'sk-test'})
+    @patch('functions.worker.handler.get_openai_client')
+    @patch('requests.get')
+    def test_no_trace_headers_to_external_apis(self, mock_get, mock_client, mock_creds):
+        """Custom Search and OpenAI never receive the run's traceparent."""
+        from shared import tracing
+        from functions.worker.handler import search_news_articles, analyze_entity
+
+        mock_get.return_value.json.return_value = {'items': []}
+        mock_client.return_value.chat.completions.create.return_value.choices = [
+            type('Choice', (), {'message': type('Message', (), {'content': '{"is_relevant": false}'})()})()
+        ]
+
+        with tracing.start_span('process', kind='CONSUMER'):
+            search_news_articles('Nordstrom')
+            analyze_entity('Article', 'Nordstrom', 'Stanford', advanced_response=False)
+
+        assert not mock_get.call_args[1].get('headers')
+        assert 'extra_headers' not in mock_client.return_value.chat.completions.create.call_args[1]
+
+    def test_queue_delay_without_dispatch_time(self):
+        """Invocations not dispatched by the orchestrator have no queueing delay."""
+        from functions.worker.handler import queue_delay_ms
+
+        assert queue_delay_ms({}, 1000.0) is None
+        assert queue_delay_ms({'dispatched_at': 1200}, 1000.0) == 0.0
+
+
 class TestWorkerIntegration:
     """Integration tests for the worker function."""
     
@@ -0,0 +1,270 @@
+"""
+Test suite for the API record/replay cassettes.
+
+This module contains unit tests for redaction, recording and replaying Custom
+Search and OpenAI exchanges, replay latency, and the worker running offline
+from a cassette.
+"""
+
+import pytest
+import json
+import gzip
+from unittest.mock import patch, MagicMock
+import sys
+import os
+
+# Add the src directory to the path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../src'))
+
+from shared import cassette
+
+SEARCH_PARAMS = {'key': 'secret-google-key', 'cx': 'cse-id', 'q': 'Nordstrom', 'num': 10}
+SEARCH_BODY = {'items': [{'title': 'Nordstrom lawsuit', 'link': 'https://news.example.com/1', 'snippet': 'A lawsuit.'}]}
+
+
+def completion(content: dict):
+    """ChatCompletion whose message is the JSON-encoded content."""
+    from openai.types.chat import ChatCompletion
+    return ChatCompletion.model_validate({
+        'id': 'chatcmpl-test', 'object': 'chat.completion', 'created': 0, 'model': 'gpt-4o-2024-08-06',
+        'choices': [{'index': 0, 'finish_reason': 'stop', 'message': {'role': 'assistant', 'content': json.dumps(content)}}],
+        'usage': {'prompt_tokens': 100, 'completion_tokens': 20, 'total_tokens': 120}
+    })
+
+
+def search_response(body: dict = SEARCH_BODY, status: int = 200):
+    response = MagicMock(status_code=status)
+    response.json.return_value = body
+    return response
+
+
+class TestRedaction:
+    """Test class for request redaction and matching."""
+
+    def test_credentials_redacted(self):
+        """Keys, engine ids and headers never reach the cassette."""
+        redacted = cassette.redact({'params': SEARCH_PARAMS, 'headers': {'Authorization': 'Bearer sk-secret'}})
+
+        assert redacted['params']['key'] == cassette.REDACTED
+        assert redacted['params']['cx'] == cassette.REDACTED
+        assert redacted['params']['q'] == 'Nordstrom'
+        assert 'sk-secret' not in json.dumps(redacted)
+
+    def test_failed_search_error_redacted(self, tmp_path):
+        """A failed search records its error without the key and engine id from the request URL."""
+        import requests
+
+        path = str(tmp_path / 'errors.jsonl.gz')
+        error = requests.exceptions.ConnectionError(
+            "HTTPSConnectionPool(host='www.googleapis.com', port=443): Max retries exceeded with url: "
+            "/customsearch/v1?key=secret-google-key&cx=cse-id&q=Nordstrom&num=10")
+        with cassette.use(path, 'record'), patch('requests.get', side_effect=error), \
+                pytest.raises(requests.exceptions.ConnectionError):
+            cassette.get('https://www.googleapis.com/customsearch/v1', params=SEARCH_PARAMS)
+
+        with gzip.open(path, 'rt') as f:
+            text = f.read()
+        assert 'secret-google-key' not in text
+        assert 'cse-id' not in text
+        assert 'q=Nordstrom' in text
+
+    def test_response_and_chat_error_redacted(self, tmp_path):
+        """Engine ids echoed in search responses and keys echoed in OpenAI errors are redacted."""
+        path = str(tmp_path / 'redacted.jsonl')
+        body = dict(SEARCH_BODY, queries={'request': [{'cx': 'cse-id', 'searchTerms': 'Nordstrom'}]})
+        with cassette.use(path, 'record'), patch('requests.get', return_value=search_response(body)):
+            cassette.get('https://www.googleapis.com/customsearch/v1', params=SEARCH_PARAMS)
+
+        def unauthorized():
+            raise RuntimeError('Incorrect API key provided: sk-proj-abc1*************wxyz.')
+
+        with cassette.use(path, 'record'), pytest.raises(RuntimeError):
+            cassette.chat_completion({'messages': []}, unauthorized)
+
+        text = (tmp_path / 'redacted.jsonl').read_text()
+        assert 'cse-id' not in text
+        assert 'sk-proj' not in text and 'wxyz' not in text
+        assert 'Nordstrom' in text
+
+    def test_key_ignores_credentials(self):
+        """Requests match whatever keys they were made with."""
+        other = dict(SEARCH_PARAMS, key='another-key')
+
+        assert cassette.request_key('search', {'params': SEARCH_PARAMS}) == cassette.request_key('search', {'params': other})
+        assert cassette.request_key('search', {'params': SEARCH_PARAMS}) != \
+            cassette.request_key('search', {'params': dict(SEARCH_PARAMS, q='Ruby')})
+
+
+class TestRecordReplay:
+    """Test class for recording exchanges and replaying them offline."""
+
+    def test_search_round_trip(self, tmp_path):
+        """A recorded search replays the same body and status without calling requests."""
+        path = str(tmp_path / 'search.jsonl.gz')
+        with cassette.use(path, 'record'), patch('requests.get', return_value=search_response()) as live:
+            cassette.get('https://www.googleapis.com/customsearch/v1', params=SEARCH_PARAMS, headers={'traceparent': 'x'})
+        assert live.call_count == 1
+
+        with cassette.use(path, 'replay'), patch('requests.get') as live:
+            response = cassette.get('https://www.googleapis.com/customsearch/v1', params=dict(SEARCH_PARAMS, key=None))
+        live.assert_not_called()
+        response.raise_for_status()
+        assert response.json() == SEARCH_BODY
+
+        with gzip.open(path, 'rt') as f:
+            text = f.read()
+        assert 'secret-google-key' not in text and 'traceparent' not in text
+
+    def test_failed_search_replays_status(self, tmp_path):
+        """Error responses replay with their status, so raise_for_status fails the same way."""
+        import requests
+
+        path = str(tmp_path / 'errors.jsonl')
+        with cassette.use(path, 'record'), patch('requests.get', return_value=search_response({'error': 'quota'}, 429)):
+            cassette.get('https://example.com', params=SEARCH_PARAMS)
+
+        with cassette.use(path, 'replay'):
+            response = cassette.get('https://example.com', params=SEARCH_PARAMS)
+        assert response.status_code == 429
+        with pytest.raises(requests.exceptions.HTTPError):
+            response.raise_for_status()
+
+    def test_chat_round_trip(self, tmp_path):
+        """A recorded completion replays as a ChatCompletion without a client."""
+        path = str(tmp_path / 'llm.jsonl')
+        request = {'model': 'gpt-4o-2024-08-06', 'messages': [{'role': 'user', 'content': 'Nordstrom'}]}
+        with cassette.use(path, 'record'):
+            cassette.chat_completion(request, lambda: completion({'important': True}))
+
+        with cassette.use(path, 'replay'):
+            response = cassette.chat_completion(request, lambda: pytest.fail("replay called the API"))
+        assert json.loads(response.choices[0].message.content) == {'important': True}
+        assert response.usage.prompt_tokens == 100
+
+    def test_chat_error_replayed(self, tmp_path):
+        """A failed completion fails again on replay."""
+        path = str(tmp_path / 'llm.jsonl')
+        request = {'model': 'gpt-4o-2024-08-06', 'messages': []}
+
+        def rate_limited():
+            raise RuntimeError('rate limited')
+
+        with cassette.use(path, 'record'), pytest.raises(RuntimeError):
+            cassette.chat_completion(request, rate_limited)
+        with cassette.use(path, 'replay'), pytest.raises(Exception, match='RuntimeError: rate limited'):
+            cassette.chat_completion(request, rate_limited)
+
+    def test_repeated_requests_replay_in_order(self, tmp_path):
+        """Identical requests get their recordings in order, then the last one again."""
+        path = str(tmp_path / 'llm.jsonl')
+        request = {'model': 'gpt-4o-2024-08-06', 'messages': []}
+        with cassette.use(path, 'record'):
+            for index in range(2):
+                cassette.chat_completion(request, lambda: completion({'index': index}))
+
+        with cassette.use(path, 'replay'):
+            replies = [json.loads(cassette.chat_completion(request, None).choices[0].message.content)['index']
+                       for _ in range(3)]
+        assert replies == [0, 1, 1]
+
+    def test_unrecorded_request(self, tmp_path):
+        """Replay never falls through to the network."""
+        path = str(tmp_path / 'llm.jsonl')
+        with cassette.use(path, 'record'):
+            cassette.chat_completion({'messages': ['recorded']}, lambda: completion({}))
+
+        with cassette.use(path, 'replay'), pytest.raises(Exception, match='No llm exchange'):
+            cassette.chat_completion({'messages': ['new']}, lambda: completion({}))
+
+    def test_missing_cassette(self, tmp_path):
+        """Replaying a cassette that doesn't exist fails up front."""
+        with pytest.raises(Exception, match='Cassette not found'):
+            with cassette.use(str(tmp_path / 'missing.jsonl'), 'replay'):
+                pass
+
+    def test_off_calls_through(self):
+        """Without a cassette the live call is made unchanged."""
+        with patch('shared.cassette.CASSETTE_MODE', 'off'), patch('requests.get', return_value='live') as live:
+            assert cassette.get('https://example.com', params={'q': 'x'}, headers={'h': '1'}) == 'live'
+            assert cassette.chat_completion({}, lambda: 'completion') == 'completion'
+        live.assert_called_once_with('https://example.com', params={'q': 'x'}, headers={'h': '1'})
+        assert not cassette.replaying()
+
+
+class TestReplayLatency:
+    """Test class for re-injecting recorded latency."""
+
+    def record_latencies(self, path, latencies):
+        with cassette.use(path, 'record') as recording:
+            for index, latency in enumerate(latencies):
+                recording.record('llm', {'messages': [index]}, 200, latency, {'index': index})
+
+    def test_recorded(self, tmp_path):
+        """recorded sleeps each exchange's own latency."""
+        path = str(tmp_path / 'llm.jsonl')
+        self.record_latencies(path, [120.0, 340.0])
+
+        with cassette.use(path, 'replay', latency='recorded') as replay, patch('shared.cassette.time.sleep') as sleep:
+            replay.play('llm', {'messages': [1]})
+        sleep.assert_called_once_with(0.34)
+
+    def test_sampled_is_deterministic(self, tmp_path):
+        """sampled draws from the recorded distribution, the same way on every run."""
+        path = str(tmp_path / 'llm.jsonl')
+        self.record_latencies(path, [10.0, 20.0, 30.0, 40.0])
+
+        delays = []
+        for _ in range(2):
+            with cassette.use(path, 'replay', latency='sampled', seed=3) as replay:
+                delays.append([replay.delay_ms(replay.exchanges[cassette.request_key('llm', {'messages': [index]})][0])
+                               for index in range(4)])
+        assert delays[0] == delays[1]
+        assert set(delays[0]) <= {10.0, 20.0, 30.0, 40.0}
+
+    def test_off_by_default(self, tmp_path):
+        """Replay doesn't sleep unless asked to."""
+        path = str(tmp_path / 'llm.jsonl')
+        self.record_latencies(path, [500.0])
+
+        with cassette.use(path, 'replay') as replay, patch('shared.cassette.time.sleep') as sleep:
+            replay.play('llm', {'messages': [0]})
+        sleep.assert_not_called()
+
+
+class TestWorkerReplay:
+    """Test class for the worker running from a cassette."""
+
+    def test_process_entity_offline(self, tmp_path):
+        """A recorded entity replays to the same analysis with no credentials or network."""
+        pytest.importorskip('boto3')
+        from functions.worker import handler as worker
+
+        path = str(tmp_path / 'worker.jsonl.gz')
+        credentials = {'GOOGLE_API_KEY': 'secret-google-key', 'GOOGLE_CSE_ID': 'cse-id', 'OPENAI_API_KEY': 'sk-secret'}
+        client = MagicMock()
+        client.chat.completions.create.return_value = completion({'is_relevant': True, 'important': True})
+
+        with cassette.use(path, 'record'), \
+                patch('functions.worker.handler.load_credentials', return_value=credentials), \
+                patch('functions.worker.handler.get_openai_client', return_value=client), \
+                patch('requests.get', return_value=search_response()):
+            articles = worker.search_news_articles('Nordstrom')['articles']
+            recorded = worker.analyze_entity(articles[0]['title'], 'Nordstrom', 'Stanford', advanced_response=False)
+
+        with cassette.use(path, 'replay'), \
+                patch('functions.worker.handler.load_credentials', return_value={}), \
+                patch('functions.worker.handler.get_openai_client', side_effect=AssertionError('client used')), \
+                patch('requests.get', side_effect=AssertionError('network used')):
+            replayed_articles = worker.search_news_articles('Nordstrom')['articles']
+            replayed = worker.analyze_entity(replayed_articles[0]['title'], 'Nordstrom', 'Stanford', advanced_response=False)
+
+        assert replayed_articles == articles
+        assert replayed == recorded == {'is_relevant': True, 'important': True}
+        with gzip.open(path, 'rt') as f:
+            text = f.read()
+        assert 'secret' not in text
+
+
+if __name__ == "__main__":
+    # Run tests
+    pytest.main([__file__, "-v"])
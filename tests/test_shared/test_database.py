@@ -0,0 +1,391 @@
+"""
+Test suite for the shared DynamoDB helpers.
+
+This module contains unit tests for the shared database module used by all
+GargoyleScope Lambda functions.
+"""
+
+import pytest
+import boto3
+from datetime import datetime, timedelta
+from unittest.mock import Mock, patch
+import sys
+import os
+
+# Add the src directory to the path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../src'))
+
+from shared import database
+from shared.utils import TTLCache
+
+
+class TestEmailListCache:
+    """Test class for the in-process EmailList cache."""
+
+    @pytest.fixture(autouse=True)
+    def clear_cache(self):
+        """Start every test with an empty cache."""
+        database.invalidate_email_list_cache()
+        yield
+        database.invalidate_email_list_cache()
+
+    @pytest.fixture
+    def mock_table(self):
+        """Mock EmailList table with two tenants."""
+        table = Mock()
+        table.get_item.return_value = {
+            'Item': {
+                'parent_entity': 'Stanford',
+                'email_list': ['a@stanford.edu'],
+                'settings': {'report_hour': 12}
+            }
+        }
+        table.scan.return_value = {
+            'Items': [
+                {'parent_entity': 'Stanford', 'email_list': ['a@stanford.edu']},
+                {'parent_entity': 'Berkeley', 'email_list': ['b@berkeley.edu']}
+            ]
+        }
+        return table
+
+    def test_get_email_list_is_cached(self, mock_table):
+        """Repeated lookups hit DynamoDB only once."""
+        with patch('shared.database.get_email_list_table', return_value=mock_table):
+            assert database.get_email_list('Stanford') == ['a@stanford.edu']
+            assert database.get_email_list('Stanford') == ['a@stanford.edu']
+            assert database.get_tenant_settings('Stanford') == {'report_hour': 12}
+
+        mock_table.get_item.assert_called_once()
+        stats = database.get_email_list_cache_stats()
+        assert stats['hits'] >= 2
+
+    def test_missing_item_is_negatively_cached(self, mock_table):
+        """Unknown tenants fall back to the default without repeated lookups."""
+        mock_table.get_item.return_value = {}
+        with patch('shared.database.get_email_list_table', return_value=mock_table):
+            assert database.get_email_list('Unknown', 'x@example.com') == ['x@example.com']
+            assert database.get_email_list('Unknown') == []
+
+        mock_table.get_item.assert_called_once()
+
+    def test_sender_lookup_scans_once(self, mock_table):
+        """Warm authorization lookups are served from the sender index."""
+        with patch('shared.database.get_email_list_table', return_value=mock_table):
+            assert database.find_parent_entity_for_sender('a@stanford.edu') == 'Stanford'
+            assert database.find_parent_entity_for_sender('b@berkeley.edu') == 'Berkeley'
+            assert database.find_parent_entity_for_sender('nobody@example.com') is None
+            # The scan also primed per-tenant items
+            assert database.get_email_list('Berkeley') == ['b@berkeley.edu']
+
+        mock_table.scan.assert_called_once()
+        mock_table.get_item.assert_not_called()
+
+    def test_setup_email_list_invalidates(self, mock_table):
+        """Writes through setup_email_list_table drop the cached item and sender index."""
+        with patch('shared.database.get_email_list_table', return_value=mock_table):
+            database.get_email_list('Stanford')
+            database.find_parent_entity_for_sender('a@stanford.edu')
+
+            assert database.setup_email_list_table('Stanford', ['new@stanford.edu'])
+
+            database.get_email_list('Stanford')
+            database.find_parent_entity_for_sender('new@stanford.edu')
+
+        assert mock_table.get_item.call_count == 2
+        assert mock_table.scan.call_count == 2
+        mock_table.update_item.assert_called_once()
+
+
+class TestArticleHistory:
+    """Test class for the append-only ArticleHistory store."""
+
+    @pytest.fixture
+    def history_table(self, moto_aws):
+        """Create the ArticleHistory table in moto."""
+        boto3.client('dynamodb', region_name='us-west-1').create_table(
+            TableName=database.ARTICLE_HISTORY_TABLE,
+            AttributeDefinitions=[
+                {'AttributeName': 'entity_key', 'AttributeType': 'S'},
+                {'AttributeName': 'run_ts', 'AttributeType': 'S'}
+            ],
+            KeySchema=[
+                {'AttributeName': 'entity_key', 'KeyType': 'HASH'},
+                {'AttributeName': 'run_ts', 'KeyType': 'RANGE'}
+            ],
+            BillingMode='PAY_PER_REQUEST'
+        )
+
+    @pytest.fixture
+    def articles(self):
+        """Analyzed articles as stored by the worker."""
+        return [
+            {'title': 'A', 'url': 'http://example.com/a', 'snippet': '',
+             'analysis': {'sentiment': 'Negative', 'important': True}},
+            {'title': 'B', 'url': 'http://example.com/b', 'snippet': '',
+             'analysis': {'sentiment': 'neutral', 'important': False}}
+        ]
+
+    def test_compact_article_record(self, articles):
+        """Compact records keep only hash, sentiment, importance and cluster."""
+        record = database.compact_article_record(articles[0])
+
+        assert set(record) == {'url_hash', 'sentiment', 'important', 'cluster_id'}
+        assert record['sentiment'] == 'negative'
+        assert record['important'] is True
+        assert record['cluster_id'] == record['url_hash']
+
+    def test_last_n_days_reads_one_partition(self, history_table, articles):
+        """Only runs for the requested entity and window come back, newest first."""
+        now = datetime.utcnow()
+        for days_ago in (0, 1, 10):
+            database.record_article_history('Stanford', 'Nordstrom', articles, now - timedelta(days=days_ago))
+        database.record_article_history('Stanford', 'Rangoon Ruby', articles, now)
+
+        runs = database.get_article_history('Stanford', 'Nordstrom', days=7)
+
+        assert len(runs) == 2
+        assert runs[0]['run_ts'] > runs[1]['run_ts']
+        assert runs[0]['important_count'] == 1
+        assert runs[0]['expires_at'] > int(now.timestamp())
+
+    def test_history_is_append_only(self, history_table, articles):
+        """Writing the same run twice does not overwrite the first record."""
+        run_ts = datetime.utcnow()
+        database.record_article_history('Stanford', 'Nordstrom', articles, run_ts)
+
+        with pytest.raises(Exception):
+            database.record_article_history('Stanford', 'Nordstrom', [], run_ts)
+
+
+class TestEntityStreaming:
+    """Test class for the streaming entity readers."""
+
+    @staticmethod
+    def analysis(important: bool) -> dict:
+        """Analysis map with one article."""
+        return {
+            'timestamp': '2024-01-01T00:00:00',
+            'articles': [{
+                'title': 'Title',
+                'url': 'http://example.com',
+                'snippet': 'Snippet',
+                'analysis': {'summary': 'Summary', 'sentiment': 'neutral', 'important': important}
+            }]
+        }
+
+    def test_iter_entities_with_important_articles(self, tracked_entities_table):
+        """Only entities with important articles are yielded, across pages."""
+        parent = tracked_entities_table
+        database.add_entities_to_table(parent, [f'Quiet {i}' for i in range(30)])
+        for i in range(5):
+            database.add_entities_to_table(parent, [f'Hot {i}'])
+            database.update_entity_analysis(parent, f'Hot {i}', self.analysis(True))
+        # Legacy item without important_count
+        database.add_entities_to_table(parent, ['Legacy'], self.analysis(True), completed=True)
+        database.update_entity_analysis(parent, 'Quiet 0', self.analysis(False))
+
+        entities = list(database.iter_entities_with_important_articles(parent, page_size=7))
+
+        assert sorted(entity['entity_name'] for entity in entities) == ['Hot 0', 'Hot 1', 'Hot 2', 'Hot 3', 'Hot 4', 'Legacy']
+        assert entities[0]['analysis']['articles'][0]['analysis']['important'] is True
+
+    def test_list_entities_projects_away_analysis(self, tracked_entities_table):
+        """Listing without analysis does not read the analysis attribute."""
+        parent = tracked_entities_table
+        database.add_entities_to_table(parent, ['Nordstrom'], self.analysis(True))
+
+        assert database.list_entities_from_table(parent) == [{'entity_name': 'Nordstrom', 'completed': False}]
+        assert 'analysis' in database.list_entities_from_table(parent, include_analysis=True)[0]
+
+
+class TestBatchWrites:
+    """Test class for batched entity writes."""
+
+    def test_bulk_add_entities(self, tracked_entities_table):
+        """Entities from a generator are written in batches of 25."""
+        parent = tracked_entities_table
+
+        result = database.bulk_add_entities(parent, (f'Entity {i}' for i in range(130)))
+
+        assert result['added_count'] == 130
+        assert result['failed_entities'] == []
+        assert len(database.list_entities_from_table(parent)) == 130
+
+    def test_only_if_absent_keeps_analysis(self, tracked_entities_table):
+        """Re-adding tracked entities leaves their analysis alone, singly and in bulk."""
+        parent = tracked_entities_table
+        database.add_entities_to_table(parent, ['Nordstrom'], {'articles': []}, completed=True)
+
+        single = database.add_entities_to_table(parent, ['Nordstrom', 'Rangoon Ruby'], only_if_absent=True)
+        bulk = database.bulk_add_entities(parent, ['Nordstrom', 'Rangoon Ruby', 'Caltrain'], only_if_absent=True)
+
+        assert single['added_entities'] == ['Rangoon Ruby']
+        assert single['existing_entities'] == ['Nordstrom']
+        assert bulk['added_count'] == 1
+        assert bulk['existing_count'] == 2
+        entities = {entity['entity_name']: entity for entity in database.list_entities_from_table(parent, include_analysis=True)}
+        assert entities['Nordstrom']['completed'] is True
+        assert entities['Nordstrom']['analysis'] == {'articles': []}
+
+    def test_unprocessed_items_are_retried(self):
+        """Unprocessed items are retried; items that never go through are reported."""
+        resource = Mock()
+        resource.batch_write_item.side_effect = [
+            {'UnprocessedItems': {'T': [{'PutRequest': {'Item': {'entity_name': 'B'}}}]}},
+            {'UnprocessedItems': {}}
+        ]
+        with patch('shared.database.get_dynamodb_resource', return_value=resource), \
+             patch('shared.database.time.sleep'):
+            result = database.batch_put_items('T', [{'entity_name': 'A'}, {'entity_name': 'B'}])
+
+        assert result == {'written': 2, 'failed_entities': []}
+        assert resource.batch_write_item.call_args[1]['RequestItems'] == {'T': [{'PutRequest': {'Item': {'entity_name': 'B'}}}]}
+
+        resource.batch_write_item.side_effect = None
+        resource.batch_write_item.return_value = {'UnprocessedItems': {'T': [{'PutRequest': {'Item': {'entity_name': 'B'}}}]}}
+        with patch('shared.database.get_dynamodb_resource', return_value=resource), \
+             patch('shared.database.time.sleep'):
+            result = database.batch_put_items('T', [{'entity_name': 'A'}, {'entity_name': 'B'}])
+
+        assert result['written'] == 1
+        assert result['failed_entities'] == [{'entity': 'B', 'error': 'Unprocessed after retries'}]
+
+
+class TestProcessedEmailLedger:
+    """Test class for the inbound email dedup ledger."""
+
+    def test_second_claim_is_duplicate(self, processed_emails_table):
+        """Only the first delivery of a Message-ID is claimed, even after completion."""
+        assert database.claim_processed_email('<m1@example.com>') is True
+        assert database.claim_processed_email('<m1@example.com>') is False
+
+        database.complete_processed_email('<m1@example.com>', 200)
+
+        assert database.claim_processed_email('<m1@example.com>') is False
+
+    def test_released_or_abandoned_claims_can_be_retaken(self, processed_emails_table):
+        """Failed and timed-out claims do not block a redelivery."""
+        database.claim_processed_email('<m1@example.com>')
+        database.release_processed_email('<m1@example.com>')
+        assert database.claim_processed_email('<m1@example.com>') is True
+
+        later = datetime.utcnow() + timedelta(seconds=database.PROCESSED_EMAIL_CLAIM_TIMEOUT + 60)
+        with patch('shared.database.datetime') as mock_datetime:
+            mock_datetime.utcnow.return_value = later
+            assert database.claim_processed_email('<m1@example.com>') is True
+
+
+class TestRunStatus:
+    """Test class for the per-run completion counters."""
+
+    def test_counters(self, run_status_table):
+        """Dispatch and completion counts are added atomically to the current run."""
+        run_id = database.start_run_status('Stanford', total_entities=10, completed_entities=4)
+
+        assert database.record_run_progress('Stanford', run_id, dispatched=6)
+        for _ in range(3):
+            database.record_run_progress('Stanford', run_id, completed=1)
+        database.record_run_progress('Stanford', run_id, failed=1)
+
+        status = database.get_run_status('Stanford')
+        assert status['run_id'] == run_id
+        assert (status['total_entities'], status['completed_entities'], status['dispatched'], status['failed']) == (10, 7, 6, 1)
+
+    def test_stale_run_is_ignored(self, run_status_table):
+        """Workers from a previous run cannot change the current run's counters."""
+        old_run = database.start_run_status('Stanford', 5)
+        database.start_run_status('Stanford', 5)
+
+        assert database.record_run_progress('Stanford', old_run, completed=1) is False
+        assert database.get_run_status('Stanford')['completed_entities'] == 0
+
+    def test_reconcile(self, run_status_table, tracked_entities_table):
+        """Reconciling recounts the table and fixes drifted counters."""
+        parent = tracked_entities_table
+        database.add_entities_to_table(parent, ['A', 'B', 'C'])
+        database.update_entity_analysis(parent, 'A', {})
+        database.start_run_status(parent, total_entities=1, completed_entities=0)
+
+        result = database.reconcile_run_status(parent)
+
+        assert result['previous'] == {'total_entities': 1, 'completed_entities': 0}
+        status = database.get_run_status(parent)
+        assert (status['total_entities'], status['completed_entities']) == (3, 1)
+
+
+class TestRunSummary:
+    """Test class for the per-run summary built from worker stats."""
+
+    def record_workers(self, latencies_ms):
+        run_id = database.start_run_status('Stanford', total_entities=len(latencies_ms) + 1)
+        database.record_run_progress('Stanford', run_id, dispatched=len(latencies_ms) + 1)
+        for latency_ms in latencies_ms:
+            stats = {'articles': 10, 'important_articles': 1, 'searches': 1, 'llm_calls': 1,
+                     'prompt_tokens': 100000, 'completion_tokens': 10000, 'latency_ms': latency_ms,
+                     'queue_delay_ms': 40}
+            database.record_run_progress('Stanford', run_id, completed=1, stats=stats)
+        database.record_run_progress('Stanford', run_id, failed=1)
+        return run_id
+
+    def test_summarize(self, run_status_table):
+        """Worker stats add up to totals, an estimated cost and bucketed latency percentiles."""
+        self.record_workers([200] * 18 + [2000, 20000])
+
+        summary = database.summarize_run(database.get_run_status('Stanford'))
+
+        assert (summary['entities_total'], summary['entities_processed'], summary['entities_failed']) == (21, 20, 1)
+        assert (summary['articles_analyzed'], summary['important_articles']) == (200, 20)
+        assert summary['total_tokens'] == 2200000
+        # 2M prompt tokens at $2.50/M + 200k completion tokens at $10/M + 20 searches at $0.005
+        assert summary['estimated_cost_usd'] == pytest.approx(7.1)
+        assert (summary['latency_p50_ms'], summary['latency_p95_ms']) == (250, 2500)
+        assert summary['latency_mean_ms'] == 1280
+        assert summary['queue_delay_mean_ms'] == 40
+
+    def test_finalize_and_history(self, run_status_table, run_summaries_table):
+        """Finalized summaries are stored per run and listed newest first."""
+        first_run = self.record_workers([200])
+        assert database.finalize_run_summary('Stanford', run_id='stale') is None
+        database.finalize_run_summary('Stanford', run_id=first_run)
+        with patch('shared.database.datetime') as mock_datetime:
+            mock_datetime.utcnow.return_value = datetime.utcnow() + timedelta(days=1)
+            mock_datetime.strptime = datetime.strptime
+            second_run = self.record_workers([200, 200])
+            database.finalize_run_summary('Stanford')
+
+        history = database.get_run_summaries('Stanford')
+
+        assert [run['run_id'] for run in history] == [second_run, first_run]
+        assert history[0]['articles_analyzed'] == 20
+        assert history[0]['estimated_cost_usd'] == pytest.approx(0.71)
+
+
+class TestTTLCache:
+    """Test class for the generic TTL/LRU cache."""
+
+    def test_expiry(self):
+        """Entries are dropped once their TTL has elapsed."""
+        cache = TTLCache(maxsize=4, ttl=10)
+        with patch('shared.utils.time.monotonic', return_value=100.0):
+            cache.set('key', 'value')
+        with patch('shared.utils.time.monotonic', return_value=105.0):
+            assert cache.get('key') == 'value'
+        with patch('shared.utils.time.monotonic', return_value=111.0):
+            assert cache.get('key') is None
+
+    def test_lru_eviction(self):
+        """The least recently used entry is evicted when full."""
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        assert cache.get('a') == 1
+        assert cache.get('b') is None
+        assert cache.stats()['evictions'] == 1
+
+
+if __name__ == "__main__":
+    # Run tests
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,324 @@
+"""
+Test suite for the shared email helpers.
+
+This module contains unit tests for HTML report rendering, including a
+scaling benchmark for the streaming renderer.
+"""
+
+import pytest
+import gzip
+import boto3
+import time
+import tracemalloc
+from unittest.mock import patch
+import sys
+import os
+
+# Add the src directory to the path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../src'))
+
+from shared import email_helpers
+from shared.email_helpers import (
+    generate_html_report,
+    write_html_report,
+    load_report_template,
+    render_report_digest,
+    render_report_digests,
+    normalize_report_view,
+    send_email_report
+)
+
+
+def make_entity(index: int, important: bool = True) -> dict:
+    """Build an entity with one important and one regular article."""
+    return {
+        'entity_name': f'Entity {index}',
+        'analysis': {
+            'articles': [
+                {
+                    'title': f'Headline {index}',
+                    'url': f'https://example.com/{index}',
+                    'snippet': 'Snippet',
+                    'analysis': {
+                        'summary': 'Summary text',
+                        'sentiment': 'negative',
+                        'highlighted_text': 'A <span class="negative">lawsuit</span> was filed.',
+                        'important': important
+                    }
+                },
+                {
+                    'title': 'Regular update',
+                    'url': 'https://example.com/regular',
+                    'snippet': 'Snippet',
+                    'analysis': {'important': False}
+                }
+            ]
+        }
+    }
+
+
+class CountingSink:
+    """Writable that only counts characters, so output size does not affect memory."""
+
+    def __init__(self):
+        self.size = 0
+
+    def write(self, text):
+        self.size += len(text)
+
+
+class TestReportRenderer:
+    """Test class for the streaming HTML report renderer."""
+
+    def test_only_important_articles_rendered(self):
+        """Entities without important articles are skipped."""
+        html = generate_html_report([make_entity(1), make_entity(2, important=False)])
+
+        assert 'Entity 1' in html
+        assert 'Entity 2' not in html
+        assert 'Regular update' not in html
+        assert '{{article_content}}' not in html
+
+    def test_no_important_articles(self):
+        """A placeholder section is rendered when nothing is important."""
+        html = generate_html_report([make_entity(1, important=False)])
+
+        assert 'No Important Updates' in html
+
+    def test_user_data_is_escaped(self):
+        """Article data is escaped but sentiment spans are kept."""
+        entity = make_entity(1)
+        article = entity['analysis']['articles'][0]
+        entity['entity_name'] = '<script>alert(1)</script>'
+        article['url'] = 'javascript:alert(1)'
+        article['analysis']['summary'] = '<img src=x onerror=alert(1)>'
+
+        html = generate_html_report([entity])
+
+        assert '<script>' not in html
+        assert '<img' not in html
+        assert 'href="javascript:' not in html
+        assert '<span class="negative">lawsuit</span>' in html
+
+    def test_template_loaded_once(self):
+        """The template is read and split once per container."""
+        email_helpers._load_split_template.cache_clear()
+        with patch('builtins.open', wraps=open) as mock_open:
+            generate_html_report([make_entity(1)])
+            generate_html_report([make_entity(2)])
+
+        assert mock_open.call_count == 1
+
+    def test_accepts_generator(self):
+        """Entities can be streamed from a generator."""
+        stats = write_html_report((make_entity(i) for i in range(5)), CountingSink())
+
+        assert stats['entities_rendered'] == 5
+        assert stats['important_articles'] == 5
+
+    @pytest.mark.slow
+    def test_benchmark_linear_time_bounded_memory(self):
+        """Rendering 10k streamed entities scales linearly and keeps memory flat."""
+        load_report_template()
+
+        def render(count):
+            start = time.perf_counter()
+            write_html_report((make_entity(i) for i in range(count)), CountingSink())
+            return time.perf_counter() - start
+
+        small = min(render(1000) for _ in range(3))
+        large = min(render(10000) for _ in range(3))
+        # 10x the entities should cost roughly 10x the time, not 100x
+        assert large / small < 20
+
+        tracemalloc.start()
+        write_html_report((make_entity(i) for i in range(10000)), CountingSink())
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        # Peak memory is a handful of sections, not the whole report
+        assert peak < 1024 * 1024
+
+
+class TestReportSizeBudget:
+    """Test class for the size-capped digest and hosted full report."""
+
+    def test_digest_respects_budget(self):
+        """Sections past the budget are summarized instead of inlined."""
+        html, stats = render_report_digest((make_entity(i) for i in range(200)), max_bytes=20 * 1024)
+
+        assert len(html.encode('utf-8')) <= 20 * 1024
+        assert stats['truncated'] is True
+        assert stats['entities_inline'] + stats['entities_omitted'] == 200
+        assert f"{stats['entities_omitted']} More Entities" in html
+
+    def test_encoded_message_respects_budget(self):
+        """The budget holds for the base64-encoded email, not just the raw HTML."""
+        entities = []
+        for i in range(200):
+            entity = make_entity(i)
+            entity['entity_name'] = f'Entité {i} 🏛️'
+            entity['analysis']['articles'][0]['analysis']['summary'] = 'Résumé ✅ ' * 40
+            entities.append(entity)
+        html, stats = render_report_digest(entities, max_bytes=20 * 1024)
+        message = email_helpers.build_report_message(html, 'News Alert 📰')
+        
+        assert stats['truncated'] is True
+        assert len(email_helpers.with_recipient(message, 'a@example.com')) <= 20 * 1024
+
+    def test_small_report_not_truncated(self):
+        """Reports under budget are rendered in full."""
+        html, stats = render_report_digest([make_entity(1)], max_bytes=100 * 1024)
+
+        assert stats['truncated'] is False
+        assert 'More Entities' not in html
+
+    def test_full_report_uploaded_compressed(self, moto_aws):
+        """Overflowing reports are uploaded gzip-compressed and linked from the digest."""
+        s3 = boto3.client('s3', region_name='us-west-1')
+        s3.create_bucket(Bucket='reports', CreateBucketConfiguration={'LocationConstraint': 'us-west-1'})
+
+        with patch('shared.email_helpers.REPORT_BUCKET', 'reports'):
+            html, stats = render_report_digest(
+                (make_entity(i) for i in range(200)), 'reports/Stanford/run.html.gz', max_bytes=20 * 1024
+            )
+
+        assert stats['full_report_url'] in html.replace('&amp;', '&')
+        full_report = gzip.decompress(s3.get_object(Bucket='reports', Key='reports/Stanford/run.html.gz')['Body'].read())
+        assert full_report.decode('utf-8').count('class="entity-box"') == 200
+
+    @patch('shared.email_helpers.get_ses_client')
+    def test_send_email_report_serializes_once(self, mock_get_ses):
+        """The MIME message is built once and sent as bytes."""
+        mock_get_ses.return_value.send_raw_email.return_value = {'MessageId': 'id'}
+
+        with patch('shared.email_helpers.MIMEMultipart.as_bytes', autospec=True,
+                   side_effect=lambda msg: b'raw-message') as mock_as_bytes:
+            assert send_email_report('<html></html>', recipient='a@example.com') is True
+
+        mock_as_bytes.assert_called_once()
+        sent = mock_get_ses.return_value.send_raw_email.call_args[1]
+        assert sent['RawMessage'] == {'Data': b'To: a@example.com\nraw-message'}
+
+
+    def test_recipient_header_encoded(self):
+        """Display names and domains are encoded so the To header stays ASCII."""
+        raw = email_helpers.with_recipient(b'body', 'Zo\u00eb M\u00fcller <zoe@b\u00fccher.de>')
+
+        header, body = raw.split(b'\n', 1)
+        assert header == b'To: =?utf-8?b?Wm/DqyBNw7xsbGVy?= <zoe@xn--bcher-kva.de>'
+        assert body == b'body'
+
+    @patch('shared.email_helpers.get_ses_client')
+    def test_header_injection_rejected(self, mock_get_ses):
+        """Recipients with line breaks or several addresses fail without being sent."""
+        mock_get_ses.return_value.get_send_quota.return_value = {'MaxSendRate': 1000.0}
+        recipients = ['a@example.com\r\nBcc: victim@example.com', 'a@example.com, b@example.com']
+
+        summary = email_helpers.deliver_report('<html></html>', 'Subject', recipients)
+
+        assert summary['failed'] == 2
+        mock_get_ses.return_value.send_raw_email.assert_not_called()
+
+
+class TestReportFragments:
+    """Test class for fragment-cached per-recipient report views."""
+
+    @pytest.fixture(autouse=True)
+    def clear_fragments(self):
+        """Start every test with an empty fragment cache."""
+        email_helpers._fragment_cache.invalidate()
+        yield
+        email_helpers._fragment_cache.invalidate()
+
+    def test_normalize_report_view(self):
+        """Views are order- and case-insensitive; empty views are the default view."""
+        assert normalize_report_view(None) == email_helpers.DEFAULT_REPORT_VIEW
+        assert normalize_report_view({'entities': ['b', 'A'], 'sentiments': ['Negative']}) == (('A', 'B'), ('negative',))
+        assert normalize_report_view({'entities': ['A', 'B']}) == normalize_report_view({'entities': ['b', 'a']})
+
+    def test_sections_rendered_once_across_views_and_runs(self):
+        """Each entity is rendered once per filter, however many views and runs use it."""
+        views = [email_helpers.DEFAULT_REPORT_VIEW, (('ENTITY 1',), None), (None, ('negative',))]
+
+        with patch('shared.email_helpers.render_entity_section', wraps=email_helpers.render_entity_section) as mock_render:
+            digests, stats = render_report_digests([make_entity(i) for i in range(3)], views)
+            render_report_digests([make_entity(i) for i in range(3)], views)
+
+        # Unfiltered section per entity, plus a negative-only variant per entity
+        assert mock_render.call_count == 6
+        assert stats['entities_rendered'] == 3
+        assert digests[email_helpers.DEFAULT_REPORT_VIEW][1]['entities_rendered'] == 3
+        assert digests[(('ENTITY 1',), None)][1]['entities_rendered'] == 1
+        assert 'Entity 2' not in digests[(('ENTITY 1',), None)][0]
+
+    def test_changed_analysis_is_rerendered(self):
+        """Fragments are keyed by the analysis digest, so updates are never served stale."""
+        entity = make_entity(1)
+        render_report_digest([entity])
+        entity['analysis']['articles'][0]['title'] = 'Updated Headline'
+
+        html, _ = render_report_digest([entity])
+
+        assert 'Updated Headline' in html
+
+    def test_filtered_out_view_gets_placeholder(self):
+        """A view with nothing matching gets the no-updates section."""
+        digests, _ = render_report_digests([make_entity(1)], [(None, ('positive',))])
+
+        assert 'No Important Updates' in digests[(None, ('positive',))][0]
+
+
+class TestReportDelivery:
+    """Test class for parallel multi-recipient report delivery."""
+
+    @pytest.fixture
+    def mock_ses(self):
+        """Pooled SES client mock with a generous send rate."""
+        with patch('shared.email_helpers.get_ses_client') as mock_get_ses:
+            ses = mock_get_ses.return_value
+            ses.get_send_quota.return_value = {'MaxSendRate': 1000.0}
+            ses.send_raw_email.return_value = {'MessageId': 'id'}
+            yield ses
+
+    def test_renders_once_and_fans_out(self, mock_ses):
+        """Every unique recipient gets one addressed copy of the same message."""
+        recipients = [f'user{i}@example.com' for i in range(20)] + ['user0@example.com']
+
+        with patch('shared.email_helpers.MIMEMultipart.as_bytes', autospec=True,
+                   side_effect=lambda msg: b'body') as mock_as_bytes:
+            summary = email_helpers.deliver_report('<html></html>', 'Subject', recipients)
+
+        mock_as_bytes.assert_called_once()
+        assert summary['sent'] == 20
+        assert summary['failed'] == 0
+        destinations = sorted(call[1]['Destinations'][0] for call in mock_ses.send_raw_email.call_args_list)
+        assert destinations == sorted(set(recipients))
+
+    def test_retries_throttled_recipient(self, mock_ses):
+        """Throttled sends are retried per recipient; rejections are not."""
+        from botocore.exceptions import ClientError
+
+        def send(**kwargs):
+            recipient = kwargs['Destinations'][0]
+            if recipient == 'rejected@example.com':
+                raise ClientError({'Error': {'Code': 'MessageRejected', 'Message': 'no'}}, 'SendRawEmail')
+            if recipient == 'throttled@example.com' and not send.throttled:
+                send.throttled = True
+                raise ClientError({'Error': {'Code': 'Throttling', 'Message': 'slow down'}}, 'SendRawEmail')
+            return {'MessageId': 'id'}
+        send.throttled = False
+        mock_ses.send_raw_email.side_effect = send
+
+        with patch('shared.email_helpers.time.sleep'):
+            summary = email_helpers.deliver_report('<html></html>', 'Subject', ['throttled@example.com', 'rejected@example.com'])
+
+        results = {result['recipient']: result for result in summary['results']}
+        assert results['throttled@example.com']['status'] == 'sent'
+        assert results['throttled@example.com']['attempts'] == 2
+        assert results['rejected@example.com']['status'] == 'failed'
+        assert results['rejected@example.com']['attempts'] == 1
+
+
+if __name__ == "__main__":
+    # Run tests
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,125 @@
+"""
+Test suite for the shared stage metrics.
+
+This module contains unit tests for EMF metric records, local collection and
+aggregation, and the cost of instrumentation when metrics are disabled.
+"""
+
+import pytest
+import json
+import time
+from unittest.mock import patch
+import sys
+import os
+
+# Add the src directory to the path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../src'))
+
+from shared import metrics
+
+
+class TestStageMetrics:
+    """Test class for stage timing and EMF records."""
+
+    def test_disabled_is_noop(self, capsys):
+        """Without METRICS_ENABLED or a collector, stages record and print nothing."""
+        with patch('shared.metrics.METRICS_ENABLED', False):
+            with metrics.stage('search') as search:
+                search.add('Results', 10)
+
+        assert search is metrics._NULL_STAGE
+        assert capsys.readouterr().out == ''
+
+    def test_disabled_overhead_negligible(self):
+        """A disabled stage costs about a function call."""
+        with patch('shared.metrics.METRICS_ENABLED', False):
+            start = time.perf_counter()
+            for _ in range(100000):
+                with metrics.stage('llm', entity='Nordstrom') as llm:
+                    llm.add('PromptTokens', 1)
+            elapsed = time.perf_counter() - start
+
+        # Well under 5 microseconds per instrumented block
+        assert elapsed < 0.5
+
+    def test_collected_record_is_emf(self):
+        """Records carry EMF metadata naming every metric, with Function and Stage dimensions."""
+        with metrics.collect() as records:
+            with metrics.stage('llm', entity='Nordstrom') as llm:
+                llm.add('PromptTokens', 120)
+                llm.add('CompletionTokens', 30)
+                llm.add('PromptTokens', 80)
+
+        record = records[0]
+        directive = record['_aws']['CloudWatchMetrics'][0]
+        assert directive['Dimensions'] == [['Function', 'Stage']]
+        assert {metric['Name'] for metric in directive['Metrics']} == {'PromptTokens', 'CompletionTokens', 'Duration'}
+        assert record['Stage'] == 'llm'
+        assert record['entity'] == 'Nordstrom'
+        assert record['PromptTokens'] == 200
+        assert record['Duration'] >= 0
+
+    def test_errors_recorded_and_raised(self):
+        """A failing stage is recorded with Errors and the exception propagates."""
+        with metrics.collect() as records:
+            with pytest.raises(ValueError):
+                with metrics.stage('search'):
+                    raise ValueError('boom')
+
+        assert records[0]['Errors'] == 1
+
+    def test_enabled_prints_json_lines(self, capsys):
+        """With METRICS_ENABLED each record is one JSON log line for CloudWatch."""
+        with patch('shared.metrics.METRICS_ENABLED', True):
+            with metrics.stage('dynamodb_write') as write:
+                write.add('ConsumedWriteCapacity', 1.0)
+
+        record = json.loads(capsys.readouterr().out.strip())
+        assert record['Stage'] == 'dynamodb_write'
+        assert record['ConsumedWriteCapacity'] == 1.0
+
+    def test_collect_is_per_thread(self):
+        """Concurrent invocations in one process each collect only their own stages."""
+        import threading
+
+        def invocation(name, results):
+            with metrics.collect() as records:
+                barrier.wait()
+                with metrics.stage(name):
+                    pass
+                barrier.wait()
+            results[name] = [record['Stage'] for record in records]
+
+        barrier = threading.Barrier(2)
+        results = {}
+        with metrics.collect(all_threads=True) as everything:
+            threads = [threading.Thread(target=invocation, args=(name, results)) for name in ('search', 'llm')]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        assert results == {'search': ['search'], 'llm': ['llm']}
+        assert sorted(record['Stage'] for record in everything) == ['llm', 'search']
+        assert metrics._collectors == []
+
+    def test_aggregate_by_stage(self):
+        """Records are summed per stage for local analysis."""
+        with metrics.collect() as records:
+            for tokens in (100, 50):
+                with metrics.stage('llm') as llm:
+                    llm.add('PromptTokens', tokens)
+            with metrics.stage('search'):
+                pass
+
+        totals = metrics.aggregate(records)
+
+        assert totals['llm']['count'] == 2
+        assert totals['llm']['PromptTokens'] == 150
+        assert totals['search']['count'] == 1
+        assert 'Duration' in totals['search']
+
+
+if __name__ == "__main__":
+    # Run tests
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,103 @@
+"""
+Test suite for the shared profiling hook.
+
+This module contains unit tests for sampling, and for the cProfile and
+tracemalloc output written for profiled handler invocations.
+"""
+
+import pytest
+import json
+import pstats
+from unittest.mock import Mock, patch
+import sys
+import os
+
+# Add the src directory to the path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../src'))
+
+from shared import profiling
+
+
+# Grows on every call, like a cache a warm container keeps between invocations
+retained = []
+
+
+def busy_handler(event, context):
+    """Handler that spends measurable time and keeps memory."""
+    retained.extend(bytearray(1024) for _ in range(2000))
+    return {'statusCode': 200, 'body': str(len(retained))}
+
+
+class TestSampling:
+    """Test class for deciding which invocations are profiled."""
+
+    def test_event_flag_overrides_rate(self):
+        """The event flag forces profiling on or off regardless of the sample rate."""
+        with patch('shared.profiling.PROFILE_SAMPLE_RATE', 0.0):
+            assert profiling.should_profile({'profile': True})
+            assert profiling.should_profile({'profile': 'true'})
+        with patch('shared.profiling.PROFILE_SAMPLE_RATE', 1.0):
+            assert not profiling.should_profile({'profile': False})
+
+    def test_sample_rate(self):
+        """Without a flag, invocations are sampled at the configured rate."""
+        with patch('shared.profiling.PROFILE_SAMPLE_RATE', 0.0):
+            assert not any(profiling.should_profile({}) for _ in range(100))
+        with patch('shared.profiling.PROFILE_SAMPLE_RATE', 0.25), patch('shared.profiling.random.random', side_effect=[0.1, 0.9]):
+            assert [profiling.should_profile({}), profiling.should_profile({})] == [True, False]
+
+
+class TestProfiledHandler:
+    """Test class for the profiling wrapper."""
+
+    def test_unsampled_invocation_untouched(self, tmp_path):
+        """Invocations that are not sampled write nothing."""
+        with patch('shared.profiling.PROFILE_DIR', str(tmp_path)):
+            result = profiling.profiled(busy_handler)({}, Mock(aws_request_id='req-1'))
+
+        assert result['statusCode'] == 200
+        assert list(tmp_path.iterdir()) == []
+
+    def test_profile_written_to_tmp(self, tmp_path):
+        """A flagged invocation writes a loadable pstats file and a JSON summary."""
+        with patch('shared.profiling.PROFILE_DIR', str(tmp_path)), patch('shared.profiling.PROFILE_BUCKET', None):
+            result = profiling.profiled(busy_handler)({'profile': True}, Mock(aws_request_id='req-1'))
+
+        assert result['statusCode'] == 200
+        pstats_path, = tmp_path.rglob('req-1.pstats')
+        assert any(name == 'busy_handler' for _, _, name in pstats.Stats(str(pstats_path)).stats)
+
+        summary = json.loads(pstats_path.with_suffix('.json').read_text())
+        assert summary['request_id'] == 'req-1'
+        assert any('busy_handler' in row['function'] for row in summary['top_functions'])
+        assert summary['top_allocations'][0]['location'].split(':')[0].endswith('test_profiling.py')
+        assert summary['peak_traced_memory_kb'] >= 2000
+
+    def test_profile_uploaded_to_s3(self, moto_aws):
+        """With PROFILE_BUCKET set the files go to S3 under the function and date."""
+        import boto3
+
+        s3 = boto3.client('s3', region_name='us-west-1')
+        s3.create_bucket(Bucket='profiles', CreateBucketConfiguration={'LocationConstraint': 'us-west-1'})
+        with patch('shared.profiling.PROFILE_BUCKET', 'profiles'), patch('shared.profiling.PROFILE_MEMORY', False):
+            profiling.profiled(busy_handler)({'profile': True}, Mock(aws_request_id='req-2'))
+
+        keys = sorted(item['Key'] for item in s3.list_objects_v2(Bucket='profiles')['Contents'])
+        assert [key.rsplit('/', 1)[-1] for key in keys] == ['req-2.json', 'req-2.pstats']
+        assert all(key.startswith('profiles/local/') for key in keys)
+
+    def test_handler_errors_propagate(self, tmp_path):
+        """A failing handler still raises, and its profile is still written."""
+        def failing(event, context):
+            raise ValueError('boom')
+
+        with patch('shared.profiling.PROFILE_DIR', str(tmp_path)), patch('shared.profiling.PROFILE_BUCKET', None):
+            with pytest.raises(ValueError):
+                profiling.profiled(failing)({'profile': True}, Mock(aws_request_id='req-3'))
+
+        assert len(list(tmp_path.rglob('req-3.pstats'))) == 1
+
+
+if __name__ == "__main__":
+    # Run tests
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,169 @@
+"""
+Test suite for streaming table export and import.
+
+This module contains unit tests for moving a tracking table to and from S3
+as gzip-compressed NDJSON, including resuming interrupted transfers.
+"""
+
+import pytest
+import gzip
+import json
+import boto3
+from decimal import Decimal
+from unittest.mock import Mock, patch
+import sys
+import os
+
+# Add the src directory to the path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../src'))
+
+from shared import database
+from shared.table_transfer import export_table, import_table
+
+
+@pytest.fixture
+def populated_table(tracked_entities_table):
+    """Stanford table with 120 entities, some with analyses; yields the bucket name."""
+    boto3.client('s3', region_name='us-west-1').create_bucket(
+        Bucket='exports', CreateBucketConfiguration={'LocationConstraint': 'us-west-1'}
+    )
+    database.bulk_add_entities('Stanford', [f'Entity {i}' for i in range(100)])
+    database.bulk_add_entities('Stanford', [f'Scored {i}' for i in range(20)],
+                               analysis={'score': Decimal('0.75'), 'articles': []}, completed=True)
+    yield 'exports'
+
+
+def scan_all(table_name: str) -> dict:
+    """All items of a table keyed by entity name."""
+    return {item['entity_name']: item for item in database.get_table(table_name).scan()['Items']}
+
+
+def expiring_context(calls_left: int):
+    """Lambda context that runs out of time after a number of checks."""
+    context = Mock()
+    remaining = iter([60000] * calls_left)
+    context.get_remaining_time_in_millis.side_effect = lambda: next(remaining, 0)
+    return context
+
+
+class TestTableExport:
+    """Test class for segmented, checkpointed exports."""
+
+    def test_export_writes_compressed_parts(self, populated_table):
+        """Every item lands in exactly one gzip NDJSON part, recorded in the manifest."""
+        manifest = export_table('Stanford', 'exports', 'exports/run', segments=3, chunk_items=10)
+
+        assert manifest['complete'] is True
+        assert manifest['item_count'] == 120
+
+        s3 = boto3.client('s3', region_name='us-west-1')
+        names = []
+        for state in manifest['segments']:
+            for key in state['parts']:
+                body = gzip.decompress(s3.get_object(Bucket='exports', Key=key)['Body'].read())
+                names.extend(json.loads(line)['entity_name'] for line in body.splitlines())
+        assert sorted(names) == sorted(scan_all('Stanford_TrackedEntities'))
+
+        stored = json.loads(s3.get_object(Bucket='exports', Key='exports/run/manifest.json')['Body'].read())
+        assert stored['complete'] is True
+
+    def test_export_resumes_after_timeout(self, populated_table):
+        """An export stopped near the timeout picks up from its checkpoint without duplicates."""
+        with patch('shared.table_transfer.TRANSFER_TIME_MARGIN_MS', 30000):
+            first = export_table('Stanford', 'exports', 'exports/run', segments=1, chunk_items=10,
+                                 context=expiring_context(2))
+        assert first['complete'] is False
+        assert 0 < first['item_count'] < 120
+
+        second = export_table('Stanford', 'exports', 'exports/run')
+
+        assert second['complete'] is True
+        assert second['item_count'] == 120
+        parts = second['segments'][0]['parts']
+        assert len(parts) == len(set(parts))
+
+    def test_margin_scales_with_timeout(self, populated_table):
+        """A short timeout still leaves time for work instead of stopping before the first part."""
+        context = Mock()
+        context.get_remaining_time_in_millis.return_value = 20000
+
+        manifest = export_table('Stanford', 'exports', 'exports/run', segments=1, chunk_items=10, context=context)
+
+        assert manifest['complete'] is True
+
+    def test_export_requires_bucket(self, populated_table):
+        """Exports need somewhere to go."""
+        with patch('shared.table_transfer.EXPORT_BUCKET', None):
+            with pytest.raises(Exception, match='bucket is required'):
+                export_table('Stanford')
+
+
+class TestTableImport:
+    """Test class for streaming, checkpointed imports."""
+
+    @pytest.fixture
+    def exported(self, populated_table):
+        """Complete export of the Stanford table and an empty Harvard table to load it into."""
+        export_table('Stanford', 'exports', 'exports/run', segments=2, chunk_items=15)
+        database.create_tracked_entities_table('Harvard')
+        yield 'exports/run'
+        database._active_parents.invalidate('Harvard')
+
+    def test_round_trip(self, exported):
+        """An import reproduces the exported items, numbers included."""
+        result = import_table('Harvard', 'exports', exported)
+
+        assert result['complete'] is True
+        assert result['item_count'] == 120
+        assert scan_all('Harvard_TrackedEntities') == scan_all('Stanford_TrackedEntities')
+        assert scan_all('Harvard_TrackedEntities')['Scored 0']['analysis']['score'] == Decimal('0.75')
+
+    def test_import_resumes_with_remaining_parts(self, exported):
+        """Finished parts are skipped when an interrupted import is called again."""
+        with patch('shared.table_transfer.TRANSFER_TIME_MARGIN_MS', 30000):
+            first = import_table('Harvard', 'exports', exported, max_workers=1, context=expiring_context(2))
+        assert first['complete'] is False
+
+        with patch('shared.table_transfer.batch_put_items', wraps=database.batch_put_items) as mock_put:
+            second = import_table('Harvard', 'exports', exported)
+
+        assert second['complete'] is True
+        assert second['item_count'] == 120
+        assert mock_put.call_count == len(second['parts_done']) - len(first['parts_done'])
+        assert len(scan_all('Harvard_TrackedEntities')) == 120
+
+    def test_failed_items_retried_on_resume(self, exported):
+        """Items that failed to write keep their part open; only they are written again."""
+        failing = {'Entity 3', 'Scored 5'}
+
+        def flaky_put(table_name, items, **kwargs):
+            items = list(items)
+            result = database.batch_put_items(table_name, [item for item in items if item['entity_name'] not in failing], **kwargs)
+            result['failed_entities'] += [{'entity': item['entity_name'], 'error': 'Unprocessed after retries'}
+                                          for item in items if item['entity_name'] in failing]
+            return result
+
+        with patch('shared.table_transfer.batch_put_items', side_effect=flaky_put):
+            first = import_table('Harvard', 'exports', exported)
+
+        assert first['complete'] is False
+        assert first['failed_count'] == 2
+        assert sorted(name for names in first['failed_keys'].values() for name in names) == sorted(failing)
+        assert len(scan_all('Harvard_TrackedEntities')) == 118
+
+        second = import_table('Harvard', 'exports', exported)
+
+        assert second['complete'] is True
+        assert (second['failed_count'], second['failed_keys'], second['failed_entities']) == (0, {}, [])
+        assert second['item_count'] == 120
+        assert scan_all('Harvard_TrackedEntities') == scan_all('Stanford_TrackedEntities')
+
+    def test_import_requires_complete_export(self, populated_table):
+        """Half-finished exports are not imported."""
+        with pytest.raises(Exception, match='No complete export'):
+            import_table('Stanford', 'exports', 'exports/missing')
+
+
+if __name__ == "__main__":
+    # Run tests
+    pytest.main([__file__, "-v"])
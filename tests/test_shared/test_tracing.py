@@ -0,0 +1,105 @@
+"""
+Test suite for the shared trace propagation.
+
+This module contains unit tests for traceparent propagation, span parenting,
+and the memory and file span exporters.
+"""
+
+import pytest
+import json
+from unittest.mock import patch
+import sys
+import os
+
+# Add the src directory to the path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../src'))
+
+from shared import tracing
+
+
+@pytest.fixture
+def memory_exporter():
+    """Keep finished spans in memory for the test."""
+    tracing.clear_spans()
+    with patch('shared.tracing.TRACE_EXPORTER', 'memory'):
+        yield tracing
+    tracing.clear_spans()
+
+
+class TestPropagation:
+    """Test class for traceparent parsing and injection."""
+
+    def test_round_trip(self):
+        """A span's context survives being carried in a payload."""
+        span = tracing.start_span('dispatch')
+        payload = tracing.inject({'entity': 'Nordstrom'}, span)
+        remote = tracing.extract(payload)
+
+        assert payload['traceparent'] == f"00-{span.trace_id}-{span.span_id}-01"
+        assert (remote.trace_id, remote.span_id) == (span.trace_id, span.span_id)
+
+    @pytest.mark.parametrize('value', [None, '', 'garbage', '00-abc-def-01', '00-' + '0' * 32 + '-' + '1' * 16 + '-01'])
+    def test_malformed_is_ignored(self, value):
+        """Missing or invalid traceparents start a new trace instead of failing."""
+        assert tracing.extract({'traceparent': value}) is None
+
+    def test_inject_without_span_is_noop(self):
+        """Outside any span nothing is added to headers."""
+        assert tracing.inject({}) == {}
+
+
+class TestSpans:
+    """Test class for span parenting and export."""
+
+    def test_children_share_trace(self, memory_exporter):
+        """Spans started inside a span are its children, across a remote hop."""
+        with tracing.start_span('run', kind='SERVER') as run:
+            with tracing.start_span('dispatch', kind='PRODUCER') as dispatch:
+                payload = tracing.inject({})
+        with tracing.start_span('process', parent=tracing.extract(payload), kind='CONSUMER') as process:
+            pass
+
+        assert [span.name for span in tracing.finished_spans()] == ['dispatch', 'run', 'process']
+        assert dispatch.parent_span_id == run.span_id
+        assert process.parent_span_id == dispatch.span_id
+        assert process.trace_id == run.trace_id
+        assert tracing.current_span() is None
+
+    def test_error_status(self, memory_exporter):
+        """A span whose block raises ends with an error status."""
+        with pytest.raises(ValueError):
+            with tracing.start_span('search'):
+                raise ValueError('boom')
+
+        span = tracing.finished_spans()[0]
+        assert span.status == tracing.STATUS_ERROR
+        assert span.to_otlp()['status'] == {'code': 2, 'message': 'boom'}
+
+    def test_file_exporter_writes_otlp_json(self, tmp_path):
+        """The file exporter appends one OTLP/JSON export request per span."""
+        trace_file = tmp_path / 'traces.jsonl'
+        with patch('shared.tracing.TRACE_EXPORTER', 'file'), patch('shared.tracing.TRACE_FILE', str(trace_file)):
+            with tracing.start_span('llm', kind='CLIENT', entity='Nordstrom', tokens=120, cached=False):
+                pass
+
+        request = json.loads(trace_file.read_text().strip())
+        span = request['resourceSpans'][0]['scopeSpans'][0]['spans'][0]
+        assert span['name'] == 'llm'
+        assert span['kind'] == 3
+        assert len(span['traceId']) == 32 and len(span['spanId']) == 16
+        assert int(span['endTimeUnixNano']) >= int(span['startTimeUnixNano'])
+        assert {'key': 'tokens', 'value': {'intValue': '120'}} in span['attributes']
+        assert {'key': 'cached', 'value': {'boolValue': False}} in span['attributes']
+
+    def test_no_exporter_records_nothing(self):
+        """By default context is propagated but no span is kept."""
+        tracing.clear_spans()
+        with tracing.start_span('run'):
+            pass
+
+        assert tracing.finished_spans() == []
+
+
+if __name__ == "__main__":
+    # Run tests
+    pytest.main([__file__, "-v"])